@@ -1,24 +1,24 @@
 from getpass import getuser
 from os import path
-from sys import argv, exit
+from sys import exit
 from time import ctime
 
+from numpy import array, clip
+
 from arcpy import CheckExtension, CheckOutExtension, Describe, env, Exists, GetInstallInfo, GetParameterAsText, \
-    ListFields, SetParameterAsText, SetProgressorLabel
-from arcpy.analysis import Buffer, GenerateNearTable
+    SetParameterAsText
 from arcpy.conversion import TableToTable
-from arcpy.da import SearchCursor, UpdateCursor
-from arcpy.lr import CreateRoutes, MakeRouteEventLayer
-from arcpy.management import AddField, AddJoin, AddXY, Append, CalculateField, Compact, CopyFeatures, CopyRows, \
-    Delete, DeleteField, GetCount, MakeFeatureLayer, RemoveJoin, Sort
+from arcpy.da import SearchCursor
+from arcpy.management import Compact, GetCount
 from arcpy.mp import ArcGISProject
-from arcpy.sa import ZonalStatisticsAsTable
 
-from utils import AddMsgAndPrint, deleteESRIAddedFields, emptyScratchGDB, errorMsg
+from profile_engine import SegmentIndex
+from profile_io import demSampler, mergeStations, readLines
+from utils import AddMsgAndPrint, deleteESRIAddedFields, errorMsg, projectLog, stageTimer
 
 
 def logBasicSettings(log_file_path, station_points):
-    with open (log_file_path, 'a+') as f:
+    with projectLog(log_file_path) as f:
         f.write('\n######################################################################\n')
         f.write('Executing Tool: Add Points To Tile Profile\n')
         f.write(f"Pro Version: {GetInstallInfo()['Version']}\n")
@@ -62,8 +62,6 @@ else:
     exit()
 
 ### Set Paths and Variables ###
-support_dir = path.dirname(argv[0])
-scratch_gdb = path.join(support_dir, 'Scratch.gdb')
 project_workspace = path.dirname(wascob_gdb)
 project_name = path.basename(project_workspace)
 log_file_path = path.join(project_workspace, f"{project_name}_log.txt")
@@ -73,17 +71,6 @@ station_points_name = f"{basins_name}_Station_Points"
 tile_lines_path = path.join(wascob_fd, f"{basins_name}_Tile_Lines")
 tables_dir = path.join(project_workspace, 'GIS_Output', 'Tables')
 stations_dbf = path.join(tables_dir, f"{basins_name}_Stations.dbf")
-stations_lyr = 'Stations_Lyr'
-stations_lyr_2 = 'Stations_Lyr_2'
-stations_temp = r'memory\Stations_Temp'
-stations_temp_2 = r'memory\Stations_Temp_2'
-station_table_temp = r'memory\Station_Table_Temp'
-lines_near = r'memory\Lines_Near'
-points_near = r'memory\Points_Near'
-routes_temp = r'memory\Routes_Temp'
-events_temp = 'Events_Temp_Lyr'
-buffer_temp = r'memory\Buffer_Temp'
-station_stats_temp = r'memory\Station_Stats_Temp'
 
 ### Validate Required Datasets Exist ###
 if not Exists(wascob_dem_path):
@@ -104,95 +91,38 @@ env.pyramid = 'PYRAMIDS -1 BILINEAR DEFAULT 75 NO_SKIP'
 env.parallelProcessingFactor = '75%'
 env.overwriteOutput = True
 
+perf = stageTimer('Add Points To Tile Profile', project_workspace)
+
 try:
     logBasicSettings(log_file_path, station_points)
 
-    # Copy points input and add fields if not present
-    CopyFeatures(input_points, stations_temp)
-    field_list = [field.name for field in ListFields(stations_temp)]
-    if 'ID' not in field_list:
-        AddField(stations_temp, 'ID', 'LONG')
-    if 'STATION' not in field_list:
-        AddField(stations_temp, 'STATION', 'LONG')
-    if 'POINT_X' not in field_list:
-        AddField(stations_temp, 'POINT_X', 'DOUBLE')
-    if 'POINT_Y' not in field_list:
-        AddField(stations_temp, 'POINT_Y', 'DOUBLE')
-    if 'POINT_Z' not in field_list:
-        AddField(stations_temp, 'POINT_Z', 'DOUBLE')
-
-    # Find nearest Tile Line
-    SetProgressorLabel('Finding nearest tile lines to input points...')
-    AddMsgAndPrint('\nFinding nearest tile lines to input points...', log_file_path=log_file_path)
-    GenerateNearTable(stations_temp, tile_lines_path, lines_near, '', 'NO_LOCATION', 'NO_ANGLE', 'ALL', '1')
-
-    with SearchCursor(lines_near, ['OID@','NEAR_FID']) as cursor:
-        for row in cursor:
-            pointID = row[0]
-            tileID = row[1]
-
-            with UpdateCursor(stations_temp, ['ID'], where_clause=f"OBJECTID={pointID}") as cursor:
-                for row2 in cursor:
-                    row2[0] = tileID
-                    cursor.updateRow(row2)
-
-    # Find Distance from point "0" along each tile line
-    SetProgressorLabel('Calculating station distances...')
-    AddMsgAndPrint('\nCalculating station distances...', log_file_path=log_file_path)
-
-    MakeFeatureLayer(station_points, stations_lyr, 'STATION=0')
-    GenerateNearTable(stations_temp, stations_lyr, points_near, '', 'NO_LOCATION', 'NO_ANGLE', 'ALL', '1')
-
-    # Calculate stations in new points
-    with SearchCursor(points_near, ['OID@', 'NEAR_DIST']) as cursor:
-        for row in cursor:
-            pointID = row[0]
-            distance = row[1]
-            station = int(distance * 3.280839896) # XY in Meters
-
-            with UpdateCursor(stations_temp, ['STATION'], where_clause=f"OBJECTID={pointID}") as cursor:
-                for row2 in cursor:
-                    row2[0] = station
-                    cursor.updateRow(row2)
-
-    # Append to existing stations and copy to temp table
-    Append(stations_temp, station_points, 'NO_TEST')
-    CopyRows(station_points, station_table_temp)
-
-    SetProgressorLabel('Creating new stations along tile line...')
-    AddMsgAndPrint('\nCreating new stations along tile line...', log_file_path=log_file_path)
-    CreateRoutes(tile_lines_path, 'ID', routes_temp, 'TWO_FIELDS', 'FROM_PT', 'LENGTH_FT', 'UPPER_LEFT', '1', '0', 'IGNORE', 'INDEX')
+    # Read added points in the tile lines' coordinate system
+    with SearchCursor(input_points, ['SHAPE@X', 'SHAPE@Y'], spatial_reference=Describe(tile_lines_path).spatialReference) as cursor:
+        points = [row for row in cursor]
+    point_x = array([point[0] for point in points], float)
+    point_y = array([point[1] for point in points], float)
 
-    MakeRouteEventLayer(routes_temp, 'ID', station_table_temp, 'ID POINT STATION', events_temp, '', 'NO_ERROR_FIELD', 'NO_ANGLE_FIELD', 'NORMAL', 'ANGLE', 'LEFT', 'POINT')
-    AddField(events_temp, 'STATIONID', 'TEXT', field_length='25')
-    CalculateField(events_temp, 'STATIONID', "str(!STATION!) + '_' + str(!ID!)", 'PYTHON3')
-
-    CopyFeatures(events_temp, stations_temp_2)
+    # Find nearest Tile Line and the distance along it for every point in one query
+    perf.stage('Finding nearest tile lines to input points...')
+    AddMsgAndPrint('\nFinding nearest tile lines to input points...', log_file_path=log_file_path)
+    lines = readLines(tile_lines_path)
+    line_ids, measures, _ = SegmentIndex(lines).query(point_x, point_y)
 
-    AddXY(stations_temp_2)
-    AddField(stations_temp_2, 'POINT_Z', 'DOUBLE')
+    # Place new stations on the affected lines only
+    perf.stage('Creating new stations along tile line...')
+    AddMsgAndPrint('\nCreating new stations along tile line...', log_file_path=log_file_path)
+    affected_lines = [line for line in lines if line[0] in set(line_ids.tolist())]
 
-    MakeFeatureLayer(stations_temp_2, stations_lyr_2)
+    new_stations = {}
+    for line_id, length, parts in affected_lines:
+        new_stations[line_id] = clip(measures[line_ids == line_id], 0, length).astype(int)
+        AddMsgAndPrint(f"\tLine ID {line_id}: added station(s) {', '.join(str(station) for station in sorted(new_stations[line_id].tolist()))}", log_file_path=log_file_path)
 
-    # Retrieve Elevation values
-    SetProgressorLabel('Retrieving station elevations...')
+    # Re-place and re-sample every station of the affected lines from the current DEM
+    perf.stage('Retrieving station elevations...')
     AddMsgAndPrint('\nRetrieving station elevations...', log_file_path=log_file_path)
-
-    Buffer(stations_temp_2, buffer_temp, f"{dem_cell_size} Meters", 'FULL', 'ROUND', 'NONE')
-
-    ZonalStatisticsAsTable(buffer_temp, 'STATIONID', wascob_dem_path, station_stats_temp, 'NODATA', 'ALL')
-
-    AddJoin(stations_lyr_2, 'StationID', station_stats_temp, 'StationID', 'KEEP_ALL')
-
-    expression = f"round(!station_stats_temp.MEAN! * {z_factor},1)"
-    CalculateField(stations_lyr_2, 'POINT_Z', expression, 'PYTHON3')
-
-    RemoveJoin(stations_lyr_2, 'station_stats_temp')
-    DeleteField(stations_temp_2, 'STATIONID; POINT_M')
-
-    # Copy Station Points
-    Sort(stations_temp_2, stations_path, [['ID', 'ASCENDING'],['STATION', 'ASCENDING']])
-    DeleteField(stations_path, 'ORIG_FID')
+    sampler, cell_size = demSampler(wascob_dem_path, affected_lines, z_factor)
+    mergeStations(stations_path, affected_lines, new_stations, sampler)
 
     ### Delete Fields Added if Digitized ###
     deleteESRIAddedFields(stations_path)
@@ -211,7 +141,7 @@ try:
 
     ### Compact Project GDB ###
     try:
-        SetProgressorLabel('Compacting project geodatabase...')
+        perf.stage('Compacting project geodatabase...')
         AddMsgAndPrint('\nCompacting project geodatabase...', log_file_path=log_file_path)
         Compact(wascob_gdb)
     except:
@@ -229,23 +159,4 @@ except:
         AddMsgAndPrint(errorMsg('Add Points To Tile Profile'), 2)
 
 finally:
-    # Clean up memory intermediates
-    memory_datasets = [
-        stations_temp,
-        stations_temp_2,
-        station_table_temp,
-        lines_near,
-        points_near,
-        routes_temp,
-        events_temp,
-        buffer_temp,
-        station_stats_temp
-    ]
-
-    for ds in memory_datasets:
-        try:
-            if Exists(ds):
-                Delete(ds)
-        except:
-            pass
-    emptyScratchGDB(scratch_gdb)
+    perf.finish()
@@ -0,0 +1,45 @@
+from os import path
+from sys import argv, exit
+
+from arcpy import Describe, env, GetParameterAsText, ListFields, SetParameterAsText, SetProgressorLabel
+
+from soils_io import buildSoilsStore
+from soils_store import STORE_NAME
+from utils import AddMsgAndPrint, errorMsg
+
+
+### Input Parameters ###
+input_soils = GetParameterAsText(0)
+soils_hydro_field = GetParameterAsText(1)
+output_store = GetParameterAsText(2)
+
+### Set Paths and Variables ###
+support_dir = path.dirname(argv[0])
+store_path = output_store if output_store else path.join(support_dir, STORE_NAME)
+
+### Validate Soils Layer ###
+if Describe(input_soils).shapeType != 'Polygon':
+    AddMsgAndPrint('\nThe Soils layer must be a polygon layer. Exiting...', 2)
+    exit()
+for field in ['MUKEY', soils_hydro_field]:
+    if not len(ListFields(input_soils, field)) > 0:
+        AddMsgAndPrint(f"\n{field} field was not found in the Soils layer. Exiting...", 2)
+        exit()
+
+### ESRI Environment Settings ###
+env.overwriteOutput = True
+
+try:
+    SetProgressorLabel('Building soils store...')
+    AddMsgAndPrint(f"\nBuilding soils store {store_path}...")
+    polygon_count = buildSoilsStore(input_soils, store_path, soils_hydro_field)
+    AddMsgAndPrint(f"\tStored {polygon_count} soil polygons with a spatial index")
+
+    SetParameterAsText(3, store_path)
+    AddMsgAndPrint('\nBuild Soils Store completed successfully')
+
+except SystemExit:
+    pass
+
+except:
+    AddMsgAndPrint(errorMsg('Build Soils Store'), 2)
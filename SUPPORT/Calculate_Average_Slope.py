@@ -3,18 +3,20 @@ from os import path
 from sys import argv, exit
 from time import ctime
 
-from arcpy import CheckExtension, CheckOutExtension, Describe, env, Exists, GetInstallInfo, GetParameterAsText, ListFields, \
-    SetParameterAsText, SetProgressorLabel
+from arcpy import CheckExtension, CheckOutExtension, Describe, env, GetInstallInfo, GetParameterAsText, ListFields, \
+    SetParameterAsText
 from arcpy.da import SearchCursor, UpdateCursor
-from arcpy.management import AddField, CalculateField, Compact, CopyFeatures, Delete, GetCount
+from arcpy.management import AddField, CalculateField, Compact, CopyFeatures, GetCount
 from arcpy.mp import ArcGISProject
 from arcpy.sa import Slope, ZonalStatisticsAsTable
 
-from utils import AddMsgAndPrint, emptyScratchGDB, errorMsg
+from provenance_io import provenanceStore
+from scratch_manager import ScratchManager
+from utils import AddMsgAndPrint, errorMsg, projectLog, stageTimer
 
 
 def logBasicSettings(log_file_path, project_dem, input_polygons):
-    with open (log_file_path, 'a+') as f:
+    with projectLog(log_file_path) as f:
         f.write('\n######################################################################\n')
         f.write('Executing Tool: Calculate Average Slope\n')
         f.write(f"Pro Version: {GetInstallInfo()['Version']}\n")
@@ -60,12 +62,14 @@ if not int(GetCount(input_polygons).getOutput(0)) > 0:
 ### Set Paths and Variables ###
 support_dir = path.dirname(argv[0])
 scratch_gdb = path.join(support_dir, 'Scratch.gdb')
+scratch = ScratchManager(scratch_gdb)
 project_workspace = path.dirname(project_gdb)
 project_name = path.basename(project_workspace)
 log_file_path = path.join(project_workspace, f"{project_name}_log.txt")
+provenance = provenanceStore(project_workspace)
 project_slope_name = f"{project_name}_Slope"
 project_slope_path = path.join(project_gdb, project_slope_name)
-slope_stats_temp = r"memory\Slope_Stats"
+slope_stats_temp = scratch.name('Slope_Stats')
 output_slope_path = path.join(project_gdb, 'Layers', output_name)
 
 ### ESRI Environment Settings ###
@@ -73,15 +77,21 @@ env.overwriteOutput = True
 env.resamplingMethod = 'BILINEAR'
 env.pyramid = 'PYRAMIDS -1 BILINEAR DEFAULT 75 NO_SKIP'
 
+perf = stageTimer('Calculate Average Slope', project_workspace, project_dem_path)
+
 try:
     logBasicSettings(log_file_path, project_dem, input_polygons)
 
-    ### Create Slope Raster from DEM if Needed ###
-    if not Exists(project_slope_path):
-        SetProgressorLabel('Creating slope raster from project DEM...')
+    ### Create Slope Raster from DEM if Missing or Made From a Different DEM ###
+    perf.stage('Checking for current slope raster...')
+    slope_key = provenance.key({'dem': project_dem_path}, {'measurement': 'PERCENT_RISE', 'z_factor': 0.3048})
+    if not provenance.current([project_slope_path], slope_key):
+        provenance.forget([project_slope_path])
+        perf.stage('Creating slope raster from project DEM...')
         AddMsgAndPrint('\nCreating slope raster from project DEM...')
         slope = Slope(project_dem, 'PERCENT_RISE', 0.3048)
         slope.save(project_slope_path)
+        provenance.record([project_slope_path], slope_key, 'Calculate Average Slope')
 
     ### Copy Input Polygon Features and Add Fields ###
     CopyFeatures(input_polygons, output_slope_path)
@@ -104,7 +114,7 @@ try:
     CalculateField(output_slope_path, 'UID', f"!{Describe(output_slope_path).OIDFieldName}!", 'PYTHON3')
 
     ### Find Average Slope in Input Polygons ###
-    SetProgressorLabel('Running Zonal Statistics to find average slope...')
+    perf.stage('Running Zonal Statistics to find average slope...')
     AddMsgAndPrint('\nRunning Zonal Statistics to find average slope...')
     ZonalStatisticsAsTable(output_slope_path, 'UID', project_slope_path, slope_stats_temp, 'DATA')
 
@@ -128,7 +138,7 @@ try:
 
     ### Compact Project GDB ###
     try:
-        SetProgressorLabel('Compacting project geodatabase...')
+        perf.stage('Compacting project geodatabase...')
         AddMsgAndPrint('\nCompacting project geodatabase...', log_file_path=log_file_path)
         Compact(project_gdb)
     except:
@@ -146,8 +156,5 @@ except:
         AddMsgAndPrint(errorMsg('Calculate Average Slope'), 2)
 
 finally:
-    try:
-        Delete(slope_stats_temp)
-    except:
-        pass
-    emptyScratchGDB(scratch_gdb)
+    perf.finish()
+    scratch.cleanup()
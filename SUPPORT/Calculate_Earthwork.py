@@ -0,0 +1,271 @@
+from getpass import getuser
+from math import ceil
+from os import path
+from sys import argv, exit
+from time import ctime
+
+from numpy import array, float32, nan, unique
+
+from arcpy import Describe, env, Exists, GetInstallInfo, GetParameter, GetParameterAsText, Raster, SetParameterAsText
+from arcpy.conversion import TableToTable
+from arcpy.da import InsertCursor, SearchCursor
+from arcpy.management import AddField, CalculateStatistics, Clip, Compact, CreateTable
+from arcpy.mp import ArcGISProject
+
+from dem_processing import blockCoordinates
+from earthwork import averageEndAreaVolumes, cutFillBlock, fitGrade, gradeElevations, sectionAreas, sectionOffsets, \
+    sectionPoints, sectionReach, stationNormals
+from profile_engine import generateStations, linesExtent, SegmentIndex
+from profile_io import demSampler, readLines
+from raster_io import processRasterInBlocks
+from scratch_manager import ScratchManager
+from utils import AddMsgAndPrint, errorMsg, projectLog, removeMapLayers, stageTimer
+
+
+def logBasicSettings(log_file_path, input_lines, design_elevation, design_grade, top_width, side_slope, interval, create_grid):
+    with projectLog(log_file_path) as f:
+        f.write('\n######################################################################\n')
+        f.write('Executing Tool: Calculate Earthwork\n')
+        f.write(f"Pro Version: {GetInstallInfo()['Version']}\n")
+        f.write(f"User Name: {getuser()}\n")
+        f.write(f"Date Executed: {ctime()}\n")
+        f.write('User Parameters:\n')
+        f.write(f"\tInput Lines Layer: {input_lines}\n")
+        f.write(f"\tDesign Top Elevation: {design_elevation if design_elevation is not None else 'From Stakeout Points or Ground Profile'}\n")
+        f.write(f"\tDesign Grade (%): {design_grade if design_grade is not None else 'From Ground Profile'}\n")
+        f.write(f"\tTop Width (ft): {top_width}\n")
+        f.write(f"\tSide Slope (H:V): {side_slope}\n")
+        f.write(f"\tStation Interval (ft): {interval}\n")
+        f.write(f"\tCreate Cut/Fill Grid: {create_grid}\n")
+
+
+### Initial Tool Validation ###
+try:
+    aprx = ArcGISProject('CURRENT')
+    map = aprx.listMaps('Engineering')[0]
+except:
+    AddMsgAndPrint('\nThis tool must be run from an ArcGIS Pro project template distributed with the Engineering Tools. Exiting!', 2)
+    exit()
+
+### Input Parameters ###
+input_lines = GetParameterAsText(0)
+design_elevation = GetParameterAsText(1)
+design_grade = GetParameterAsText(2)
+top_width = GetParameterAsText(3)
+side_slope = GetParameterAsText(4)
+interval = GetParameterAsText(5)
+create_grid = GetParameter(6)
+
+### Locate Project GDB ###
+lines_path = Describe(input_lines).catalogPath
+lines_name = path.basename(lines_path)
+if '_WASCOB.gdb' in lines_path and lines_name.endswith('_Embankments'):
+    id_field, length_field = 'Subbasin', 'LengthFt'
+    basins_name = lines_name.replace('_Embankments', '')
+elif '_WASCOB.gdb' in lines_path and lines_name.endswith('_Tile_Lines'):
+    id_field, length_field = 'ID', 'LENGTH_FT'
+    basins_name = lines_name.replace('_Tile_Lines', '')
+else:
+    AddMsgAndPrint('\nThe selected layer is not a WASCOB Embankments or Tile Lines layer from an Engineering Tools project. Exiting...', 2)
+    exit()
+wascob_gdb = lines_path[:lines_path.find('.gdb')+4]
+
+### Validate Numeric Inputs ###
+try:
+    top_width = float(top_width)
+    side_slope = float(side_slope)
+    interval = float(interval)
+    design_elevation = float(design_elevation) if design_elevation else None
+    design_grade = float(design_grade) if design_grade else None
+except:
+    AddMsgAndPrint('\nInvalid design elevation, design grade, top width, side slope or station interval. Exiting...', 2)
+    exit()
+if side_slope <= 0 or interval <= 0 or top_width < 0:
+    AddMsgAndPrint('\nSide slope and station interval must be greater than 0 and top width cannot be negative. Exiting...', 2)
+    exit()
+
+### Set Paths and Variables ###
+support_dir = path.dirname(argv[0])
+scratch_gdb = path.join(support_dir, 'Scratch.gdb')
+scratch = ScratchManager(scratch_gdb)
+project_workspace = path.dirname(wascob_gdb)
+project_name = path.basename(project_workspace)
+log_file_path = path.join(project_workspace, f"{project_name}_log.txt")
+wascob_dem_path = path.join(wascob_gdb, f"{project_name}_DEM_WASCOB")
+wascob_fd = path.join(wascob_gdb, 'Layers')
+stakeout_points_path = path.join(wascob_fd, f"{basins_name}_Stakeout_Points")
+tables_dir = path.join(project_workspace, 'GIS_Output', 'Tables')
+earthwork_table_name = f"{lines_name}_Earthwork"
+earthwork_table_path = path.join(wascob_gdb, earthwork_table_name)
+cut_fill_name = f"{lines_name}_CutFill"
+cut_fill_path = path.join(wascob_gdb, cut_fill_name)
+dem_clip_temp = scratch.name('Earthwork_DEM', in_gdb=True)
+
+### Validate Required Datasets Exist ###
+if not Exists(wascob_dem_path):
+    AddMsgAndPrint('\nThe WASCOB project DEM was not found. Exiting...', 2)
+    exit()
+if design_elevation is None and id_field == 'Subbasin' and not Exists(stakeout_points_path):
+    AddMsgAndPrint('\nNo design top elevation was entered and the Stakeout Points layer was not found. Run Design Height and Intake Location first. Exiting...', 2)
+    exit()
+
+### DEM Properties ###
+dem_desc = Describe(wascob_dem_path)
+dem_cell_size = dem_desc.meanCellWidth
+dem_linear_units = dem_desc.spatialReference.linearUnitName
+
+### Validate DEM XY Units ###
+if dem_linear_units in ['Meter', 'Meters']:
+    feet_per_unit = 1 / 0.3048
+elif dem_linear_units in ['Foot', 'Foot_US']:
+    feet_per_unit = 1
+else:
+    AddMsgAndPrint(f"\nUnsupported DEM linear units {dem_linear_units}. Exiting...", 2)
+    exit()
+
+### ESRI Environment Settings ###
+env.pyramid = 'PYRAMIDS -1 BILINEAR DEFAULT 75 NO_SKIP'
+env.parallelProcessingFactor = '75%'
+env.overwriteOutput = True
+
+perf = stageTimer('Calculate Earthwork', project_workspace)
+
+try:
+    removeMapLayers(map, [earthwork_table_name, cut_fill_name])
+    logBasicSettings(log_file_path, input_lines, design_elevation, design_grade, top_width, side_slope, interval, create_grid)
+
+    ### Design Grades ###
+    # (elevation at station 0, rise per foot) of each line. Embankment tops are level; a Tile Line without a design
+    # elevation (None) gets the grade line fitted to the ground along it, at the design grade when one is given.
+    lines = readLines(lines_path, id_field, length_field)
+    rise = design_grade / 100 if design_grade is not None else None
+    if id_field == 'Subbasin' and design_elevation is None:
+        with SearchCursor(stakeout_points_path, ['Subbasin', 'Elev'], where_clause="Notes = 'Embankment'") as cursor:
+            designs = {row[0]: (row[1], 0.0) for row in cursor if row[1] is not None}
+    elif id_field == 'Subbasin':
+        designs = {line[0]: (design_elevation, 0.0) for line in lines}
+    elif design_elevation is not None:
+        designs = {line[0]: (design_elevation, rise or 0.0) for line in lines}
+    else:
+        designs = {line[0]: None for line in lines}
+
+    for line_id in [line[0] for line in lines if line[0] not in designs]:
+        AddMsgAndPrint(f"\nNo design elevation found for {id_field} {line_id}. It will be skipped...", 1, log_file_path)
+    lines = [line for line in lines if line[0] in designs]
+    if not lines:
+        AddMsgAndPrint('\nNo lines have a design elevation. Exiting...', 2, log_file_path)
+        exit()
+
+    ### Read DEM Once for All Sections ###
+    perf.stage('Reading DEM for cross sections...')
+    AddMsgAndPrint('\nReading DEM for cross sections...', log_file_path=log_file_path)
+    dem = Raster(wascob_dem_path)
+    if dem.minimum is None:
+        CalculateStatistics(wascob_dem_path)
+        dem = Raster(wascob_dem_path)
+    # Grades fitted to the ground stay within the DEM range
+    relief = dem.maximum - dem.minimum if None in designs.values() else 0
+    for line_id, length, parts in lines:
+        if designs[line_id] is not None:
+            for top in gradeElevations(designs[line_id], [0, length]).tolist():
+                relief = max(relief, abs(top - dem.minimum), abs(dem.maximum - top))
+    reach = sectionReach(top_width, side_slope, relief)
+    sampler, cell_size = demSampler(wascob_dem_path, lines, margin=ceil(reach / feet_per_unit / dem_cell_size) + 2)
+    offsets = sectionOffsets(reach, cell_size * feet_per_unit)
+
+    ### Cut/Fill Areas and Volumes by Station ###
+    perf.stage('Calculating cut and fill by station...')
+    AddMsgAndPrint('\nCalculating cut and fill by station...', log_file_path=log_file_path)
+    parts_by_id = {line[0]: line[2] for line in lines}
+    earthwork_records = []
+    total_cut = total_fill = 0
+    for line_id, length, stations, x, y in generateStations(lines, interval):
+        if designs[line_id] is None:
+            designs[line_id] = fitGrade(stations, sampler(x, y), rise)
+            if designs[line_id] is None:
+                AddMsgAndPrint(f"\t{id_field} {line_id}: No DEM values along the line. It will be skipped...", 1, log_file_path)
+                del designs[line_id]
+                continue
+        top = gradeElevations(designs[line_id], stations)
+        normal_x, normal_y = stationNormals(parts_by_id[line_id], stations, length)
+        section_x, section_y = sectionPoints(x, y, normal_x, normal_y, offsets / feet_per_unit)
+        ground = sampler(section_x.ravel(), section_y.ravel()).reshape(section_x.shape)
+        cut_area, fill_area = sectionAreas(ground, top, offsets, top_width, side_slope)
+        cut_volume, fill_volume = averageEndAreaVolumes(stations, cut_area, fill_area)
+        earthwork_records.append((line_id, stations, top, cut_area, fill_area, cut_volume, fill_volume))
+
+        AddMsgAndPrint(f"\t{id_field} {line_id}: Top Elevation {round(top[0], 2)} to {round(top[-1], 2)} Feet ({round(designs[line_id][1] * 100, 2)}%), Cut {round(cut_volume[-1], 1)} CY, Fill {round(fill_volume[-1], 1)} CY", log_file_path=log_file_path)
+        total_cut += cut_volume[-1]
+        total_fill += fill_volume[-1]
+
+    AddMsgAndPrint(f"\n\tTotal Cut: {round(total_cut, 1)} CY", log_file_path=log_file_path)
+    AddMsgAndPrint(f"\tTotal Fill: {round(total_fill, 1)} CY", log_file_path=log_file_path)
+
+    ### Write Earthwork Table ###
+    perf.stage('Writing earthwork table...')
+    AddMsgAndPrint('\nWriting earthwork table...', log_file_path=log_file_path)
+    CreateTable(wascob_gdb, earthwork_table_name)
+    AddField(earthwork_table_path, 'ID', 'LONG')
+    AddField(earthwork_table_path, 'STATION', 'LONG')
+    AddField(earthwork_table_path, 'DESIGN_ELEV', 'DOUBLE')
+    AddField(earthwork_table_path, 'CUT_AREA', 'DOUBLE')
+    AddField(earthwork_table_path, 'FILL_AREA', 'DOUBLE')
+    AddField(earthwork_table_path, 'CUT_CY', 'DOUBLE')
+    AddField(earthwork_table_path, 'FILL_CY', 'DOUBLE')
+
+    with InsertCursor(earthwork_table_path, ['ID', 'STATION', 'DESIGN_ELEV', 'CUT_AREA', 'FILL_AREA', 'CUT_CY', 'FILL_CY']) as cursor:
+        for line_id, stations, top, cut_area, fill_area, cut_volume, fill_volume in earthwork_records:
+            for row in zip(stations.tolist(), top.tolist(), cut_area.tolist(), fill_area.tolist(), cut_volume.tolist(), fill_volume.tolist()):
+                cursor.insertRow([line_id, row[0], round(row[1], 2)] + [round(value, 1) for value in row[2:]])
+
+    TableToTable(earthwork_table_path, tables_dir, f"{earthwork_table_name}.dbf")
+
+    ### Optional Cut/Fill Grid ###
+    if create_grid:
+        perf.stage('Creating cut/fill grid...')
+        AddMsgAndPrint('\nCreating cut/fill grid...', log_file_path=log_file_path)
+
+        reach_units = reach / feet_per_unit
+        xmin, ymin, xmax, ymax = linesExtent(lines)
+        Clip(wascob_dem_path, f"{xmin - reach_units} {ymin - reach_units} {xmax + reach_units} {ymax + reach_units}", dem_clip_temp,
+             '', '', '', 'NO_MAINTAIN_EXTENT')
+        clip_desc = Describe(dem_clip_temp)
+        index = SegmentIndex(lines, cell_size=2 * reach_units)
+
+        def cutFillGrid(block, start):
+            x, y = blockCoordinates(start, block.shape, clip_desc.extent.XMin, clip_desc.extent.YMax,
+                                    clip_desc.meanCellWidth, clip_desc.meanCellHeight)
+            line_ids, measures, distance = index.query(x.ravel(), y.ravel(), reach_units)
+            ids, inverse = unique(line_ids, return_inverse=True)
+            grades = array([designs.get(line_id, (nan, 0.0)) for line_id in ids.tolist()]).reshape(-1, 2)[inverse]
+            top = grades[:, 0] + grades[:, 1] * measures
+            return cutFillBlock(block.ravel(), distance * feet_per_unit, top, top_width, side_slope).reshape(block.shape).astype(float32)
+
+        processRasterInBlocks(dem_clip_temp, cut_fill_path, cutFillGrid, halo=0, block_rows=512)
+        SetParameterAsText(8, cut_fill_path)
+
+    ### Add Output to Map ###
+    SetParameterAsText(7, earthwork_table_path)
+
+    ### Compact Project GDB ###
+    try:
+        perf.stage('Compacting project geodatabase...')
+        AddMsgAndPrint('\nCompacting project geodatabase...', log_file_path=log_file_path)
+        Compact(wascob_gdb)
+    except:
+        pass
+
+    AddMsgAndPrint('\nCalculate Earthwork completed successfully', log_file_path=log_file_path)
+
+except SystemExit:
+    pass
+
+except:
+    try:
+        AddMsgAndPrint(errorMsg('Calculate Earthwork'), 2, log_file_path)
+    except:
+        AddMsgAndPrint(errorMsg('Calculate Earthwork'), 2)
+
+finally:
+    perf.finish()
+    scratch.cleanup()
@@ -0,0 +1,179 @@
+from getpass import getuser
+from os import path
+from sys import exit
+from time import ctime
+
+from numpy import array, float32, isnan, nan
+
+from arcpy import Describe, env, Exists, GetInstallInfo, GetParameter, GetParameterAsText, ListFields, Point, Raster, \
+    RasterToNumPyArray, SetParameterAsText
+from arcpy.conversion import TableToTable
+from arcpy.da import InsertCursor, SearchCursor
+from arcpy.management import AddField, Compact, CreateTable
+from arcpy.mp import ArcGISProject
+
+from rcn_io import saveArray
+from runoff_engine import AMC_CLASSES, parseStormDepths, stormRunoff
+from utils import AddMsgAndPrint, errorMsg, projectLog, removeMapLayers, stageTimer
+
+
+def logBasicSettings(log_file_path, input_watershed, storm_depths, create_grid):
+    with projectLog(log_file_path) as f:
+        f.write('\n######################################################################\n')
+        f.write('Executing Tool: Calculate Runoff\n')
+        f.write(f"Pro Version: {GetInstallInfo()['Version']}\n")
+        f.write(f"User Name: {getuser()}\n")
+        f.write(f"Date Executed: {ctime()}\n")
+        f.write('User Parameters:\n')
+        f.write(f"\tWatershed Layer: {input_watershed}\n")
+        f.write(f"\tStorm Depths (in): {storm_depths}\n")
+        f.write(f"\tCreate Runoff Grid: {create_grid}\n")
+
+
+### Initial Tool Validation ###
+try:
+    aprx = ArcGISProject('CURRENT')
+    map = aprx.listMaps('Engineering')[0]
+except:
+    AddMsgAndPrint('\nThis tool must be run from an ArcGIS Pro project template distributed with the Engineering Tools. Exiting!', 2)
+    exit()
+
+### Input Parameters ###
+input_watershed = GetParameterAsText(0)
+storm_depths = GetParameterAsText(1)
+create_grid = GetParameter(2)
+
+### Locate Project GDB ###
+watershed_path = Describe(input_watershed).catalogPath
+watershed_name = path.basename(watershed_path)
+if '.gdb' in watershed_path:
+    watershed_gdb = watershed_path[:watershed_path.find('.gdb')+4]
+else:
+    AddMsgAndPrint('\nThe selected Watershed layer must be stored in a file geodatabase. Exiting...', 2)
+    exit()
+
+### Validate Storm Depths ###
+try:
+    storm_depths = parseStormDepths(storm_depths)
+except:
+    AddMsgAndPrint('\nStorm depths must be one or more positive numbers (inches). Exiting...', 2)
+    exit()
+
+### Set Paths and Variables ###
+project_workspace = path.dirname(watershed_gdb)
+project_name = path.basename(project_workspace)
+log_file_path = path.join(project_workspace, f"{project_name}_log.txt")
+tables_dir = path.join(project_workspace, 'GIS_Output', 'Tables')
+grid_suffix = '_WASCOB' if '_WASCOB.gdb' in watershed_path else ''
+rcn_grid_path = path.join(watershed_gdb, f"{watershed_name}_RCN_Grid{grid_suffix}")
+runoff_table_name = f"{watershed_name}_Runoff"
+runoff_table_path = path.join(watershed_gdb, runoff_table_name)
+runoff_grid_name = f"{watershed_name}_Runoff_Grid"
+runoff_grid_path = path.join(watershed_gdb, runoff_grid_name)
+
+### Validate Required Datasets Exist ###
+for field in ['Subbasin', 'RCN', 'Acres']:
+    if not len(ListFields(input_watershed, field)) > 0:
+        AddMsgAndPrint(f"\n{field} field was not found in the input Watershed layer. Please run a Calculate Runoff Curve Number tool before running this tool. Exiting...", 2)
+        exit()
+if create_grid and not Exists(rcn_grid_path):
+    AddMsgAndPrint(f"\n{path.basename(rcn_grid_path)} was not found. Run Calculate Runoff Curve Number with the RASTER RCN method or create the RCN grid from NLCD. Exiting...", 2)
+    exit()
+
+### ESRI Environment Settings ###
+env.overwriteOutput = True
+env.parallelProcessingFactor = '75%'
+
+perf = stageTimer('Calculate Runoff', project_workspace)
+
+try:
+    removeMapLayers(map, [runoff_table_name, runoff_grid_name])
+    logBasicSettings(log_file_path, input_watershed, storm_depths, create_grid)
+
+    ### Subbasin Runoff ###
+    perf.stage('Calculating runoff by subbasin...')
+    AddMsgAndPrint('\nCalculating runoff by subbasin...', log_file_path=log_file_path)
+
+    with SearchCursor(input_watershed, ['Subbasin', 'RCN', 'Acres'], sql_clause=(None, 'ORDER BY Subbasin')) as cursor:
+        subbasins = [row for row in cursor]
+    if any(row[0] is None or row[1] is None for row in subbasins):
+        AddMsgAndPrint('\nOne or more Subbasins are missing an ID number or RCN value. Exiting...', 2, log_file_path)
+        exit()
+
+    subbasin_rcn = array([row[1] for row in subbasins], float)
+    acres = array([row[2] or 0 for row in subbasins], float)
+    cn, retention, initial_abstraction, q = stormRunoff(subbasin_rcn, storm_depths)
+
+    for index, (subbasin, rcn, area) in enumerate(subbasins):
+        AddMsgAndPrint(f"\n\tSubbasin ID: {subbasin}, RCN: {rcn}", 0, log_file_path)
+        for storm, depth in enumerate(storm_depths):
+            runoff = ', '.join(f"AMC {amc} {round(float(q[amc_index, storm, index]), 2)}" for amc_index, amc in enumerate(AMC_CLASSES))
+            AddMsgAndPrint(f"\t\t{depth} in Storm Runoff (in): {runoff}", 0, log_file_path)
+
+    ### Write Runoff Table ###
+    perf.stage('Writing runoff table...')
+    AddMsgAndPrint('\nWriting runoff table...', log_file_path=log_file_path)
+    CreateTable(watershed_gdb, runoff_table_name)
+    AddField(runoff_table_path, 'Subbasin', 'LONG')
+    AddField(runoff_table_path, 'AMC', 'TEXT', field_length=3)
+    AddField(runoff_table_path, 'RCN', 'DOUBLE')
+    AddField(runoff_table_path, 'STORM_IN', 'DOUBLE')
+    AddField(runoff_table_path, 'S_IN', 'DOUBLE')
+    AddField(runoff_table_path, 'IA_IN', 'DOUBLE')
+    AddField(runoff_table_path, 'Q_IN', 'DOUBLE')
+    AddField(runoff_table_path, 'Q_AC_FT', 'DOUBLE')
+
+    fields = ['Subbasin', 'AMC', 'RCN', 'STORM_IN', 'S_IN', 'IA_IN', 'Q_IN', 'Q_AC_FT']
+    with InsertCursor(runoff_table_path, fields) as cursor:
+        for index, subbasin in enumerate(row[0] for row in subbasins):
+            for amc_index, amc in enumerate(AMC_CLASSES):
+                for storm, depth in enumerate(storm_depths):
+                    runoff = float(q[amc_index, storm, index])
+                    cursor.insertRow([subbasin, amc, round(float(cn[amc_index, index]), 1), depth, round(float(retention[amc_index, index]), 3),
+                                      round(float(initial_abstraction[amc_index, index]), 3), round(runoff, 3), round(runoff / 12 * acres[index], 2)])
+
+    if path.isdir(tables_dir):
+        TableToTable(runoff_table_path, tables_dir, f"{runoff_table_name}.dbf")
+
+    ### Optional Multiband Runoff Grid ###
+    if create_grid:
+        perf.stage('Creating runoff grid...')
+        AddMsgAndPrint('\nCreating runoff grid...', log_file_path=log_file_path)
+
+        rcn_grid = Raster(rcn_grid_path)
+        extent = rcn_grid.extent
+        rcn_cells = RasterToNumPyArray(rcn_grid, nodata_to_value=nan).astype(float32)
+        cell_q = stormRunoff(rcn_cells, storm_depths)[3].astype(float32)
+        bands = cell_q.reshape((-1,) + rcn_cells.shape)
+        saveArray(bands, Point(extent.XMin, extent.YMin), rcn_grid.meanCellWidth, rcn_grid.meanCellHeight, nan,
+                  runoff_grid_path, rcn_grid.spatialReference)
+
+        AddMsgAndPrint(f"\tRunoff depth (in) for {int((~isnan(rcn_cells)).sum())} cells in {bands.shape[0]} bands:", log_file_path=log_file_path)
+        for band, (amc, depth) in enumerate((amc, depth) for amc in AMC_CLASSES for depth in storm_depths):
+            AddMsgAndPrint(f"\t\tBand {band + 1}: AMC {amc}, {depth} in storm", log_file_path=log_file_path)
+        SetParameterAsText(4, runoff_grid_path)
+
+    ### Add Output to Map ###
+    SetParameterAsText(3, runoff_table_path)
+
+    ### Compact Project GDB ###
+    try:
+        perf.stage('Compacting project geodatabase...')
+        AddMsgAndPrint('\nCompacting project geodatabase...', log_file_path=log_file_path)
+        Compact(watershed_gdb)
+    except:
+        pass
+
+    AddMsgAndPrint('\nCalculate Runoff completed successfully', log_file_path=log_file_path)
+
+except SystemExit:
+    pass
+
+except:
+    try:
+        AddMsgAndPrint(errorMsg('Calculate Runoff'), 2, log_file_path)
+    except:
+        AddMsgAndPrint(errorMsg('Calculate Runoff'), 2)
+
+finally:
+    perf.finish()
@@ -30,6 +30,8 @@
 # - Need to add functionality to get Soils data directly from SDA instead of locally.
 # - 3 raster datasets could not be used as in_memory raster datasets b/c of Joins.  The
 #   soilsGrid, landuse and LU_PLUS_SOILS are still being written out.
+#   (Replaced by encoding each cell as (NLCD * 100) + HYD_CODE on arrays; the Combine, joins
+#   and the three GDB rasters are no longer needed.)
 #
 # - Updated and Tested for ArcGIS Pro 2.4.2 and python 3.6
 # - Added functionality to utilize a DEM image service or a DEM in GCS.  Added 2 new
@@ -60,16 +62,13 @@ def print_exception():
 
     try:
 
-        exc_type, exc_value, exc_traceback = sys.exc_info()
-        theMsg = "\t" + traceback.format_exception(exc_type, exc_value, exc_traceback)[1] + "\n\t" + traceback.format_exception(exc_type, exc_value, exc_traceback)[-1]
+        theMsg = errorMsg("Calculate Runoff Curve Number from NLCD")
 
-        if theMsg.find("exit") > -1:
+        if theMsg is None:
             AddMsgAndPrint("\n\n")
             pass
         else:
-            AddMsgAndPrint("\n----------------------------------- ERROR Start -----------------------------------",2)
             AddMsgAndPrint(theMsg,2)
-            AddMsgAndPrint("------------------------------------- ERROR End -----------------------------------\n",2)
 
     except:
         AddMsgAndPrint("Unhandled error in print_exception method", 2)
@@ -79,15 +78,15 @@ def print_exception():
 def AddMsgAndPrint(msg, severity=0):
     # prints message to screen if run as a python script
     # Adds tool message to the geoprocessor
-    # Split the message on  \n first, so that if it's multiple lines, a GPMessage will be added for each line
+    # Writes message to the buffered project log
 
     print(msg)
 
     try:
-        f = open(textFilePath,'a+')
-        f.write(msg + " \n")
-        f.close
-        del f
+        log = projectLog(textFilePath)
+        log.write(msg + " \n")
+        if severity == 2:
+            log.flush()
 
     except:
         pass
@@ -108,7 +107,7 @@ def logBasicSettings():
     import getpass, time
     arcInfo = arcpy.GetInstallInfo()  # dict of ArcGIS Pro information
 
-    f = open(textFilePath,'a+')
+    f = projectLog(textFilePath)
     f.write("\n################################################################################################################\n")
     f.write("Executing \"Calculate Runoff Curve Number from NLCD\" Tool\n")
     f.write("User Name: " + getpass.getuser() + "\n")
@@ -135,8 +134,24 @@ def logBasicSettings():
 
 ## ================================================================================================================
 # Import system modules
-import arcpy, sys, os, string, traceback
+import arcpy, sys, os
 from arcpy.sa import *
+from numpy import isin
+
+from rcn_engine import extentTiles, PAIR_BASE, pairCounts, weightedRCN
+from rcn_io import extractNLCD, nlcdGrid, nlcdTileIndex, readNLCDLookup, readPairCodes, savePairRCN, tiledPairCounts
+from soils_engine import drainedGroups, normalizeHydroGroups
+from soils_io import readTextColumns, updateRows
+from utils import closeProjectLogs, errorMsg, projectLog
+
+# ---------------------------------------------------------------------- Processing Options
+# Watersheds larger than chunkedAcres are processed in tiles of tileCells x tileCells NLCD cells,
+# counted on tileWorkers threads
+chunkedAcres = 200000
+tileCells = 4096
+tileWorkers = 2
+# Folder of pre-split NLCD tiles on one grid; when set NLCD is read from its tiles instead of the input NLCD raster
+nlcdTileFolder = ""
 
 if __name__ == '__main__':
 
@@ -218,10 +233,11 @@ if __name__ == '__main__':
         logBasicSettings()
 
         # --------------------------------------------------- Temporary Datasets
-        # These layers wouldn't work using in_memory rasters, specifically the combine
-        landuse = watershedGDB_path + os.sep + "NLCD"
-        soilsGrid = watershedGDB_path + os.sep + "SOILS"
-        LU_PLUS_SOILS = watershedGDB_path + os.sep + "LU_PLUS_SOILS"
+        soilsGrid = "memory" + os.sep + "SOILS"
+        rcnGridTemp = arcpy.env.scratchGDB + os.sep + "RCN_GRID"
+
+        # Left in the FGDB by earlier versions of this tool
+        oldDatasets = [watershedGDB_path + os.sep + name for name in ("NLCD","SOILS","LU_PLUS_SOILS")]
 
         # --------------------------------------------------- Permanent Datasets
         wsSoils = watershedFD + os.sep + wsName + "_Soils"
@@ -299,10 +315,7 @@ if __name__ == '__main__':
         if bFGDBexists:
             x = 0
 
-            # These had to be added b/c in_memory layers didn't work
-            datasetsToRemove.append(soilsGrid)
-            datasetsToRemove.append(landuse)
-            datasetsToRemove.append(LU_PLUS_SOILS)
+            datasetsToRemove.extend(oldDatasets)
 
             for layer in datasetsToRemove:
                 if arcpy.Exists(layer):
@@ -364,10 +377,10 @@ if __name__ == '__main__':
         acreConversionDict = {'Meters':4046.8564224,'Meter':4046.8564224,'Foot':43560,'Foot_US':43560,'Feet':43560, 'Centimeter':40470000,'Inch':6273000}
 
         # ----------------------------------- Describe input NLCD Properties
-        nlcdDesc = arcpy.da.Describe(inNLCD)
-        nlcdDescSR = nlcdDesc['spatialReference']
+        # NLCD is read in windows covering the watershed from the input raster or the pre-split tiles
+        nlcdSource = nlcdTileIndex(nlcdTileFolder) if len(nlcdTileFolder) > 0 else inNLCD
+        nlcdOriginX, nlcdOriginY, nlcdCellSize, nlcdDescSR, nlcdSnapRaster = nlcdGrid(nlcdSource)
         nlcdUnits = nlcdDescSR.linearUnitName
-        nlcdCellSize = nlcdDesc['meanCellWidth']
         cellArea = nlcdCellSize ** 2
 
         arcpy.env.extent = "MINOF"
@@ -381,20 +394,29 @@ if __name__ == '__main__':
             AddMsgAndPrint("\nCould not determine resolution of NLCD layer....EXiting",2)
             exit()
 
-        # ---------------------------------------------------------------------- Clip NLCD to watershed boundary
-        AddMsgAndPrint("\nClipping " + str(os.path.basename(inNLCD)) + " to " + str(wsName) + " boundary..")
+        # Large watersheds are processed in tiles of the NLCD grid
+        wsAcres = sum(row[0].getArea("PLANAR","ACRES") for row in arcpy.da.SearchCursor(watershed,["SHAPE@"]))
+        bChunked = wsAcres > chunkedAcres
+        landuse = cultivatedGrid = cultivatedPoly = ""
+
+        if bChunked:
+            wsExtent = arcpy.da.Describe(watershed)['extent']
+            tiles = extentTiles(wsExtent.XMin, wsExtent.YMin, wsExtent.XMax, wsExtent.YMax, nlcdOriginX, nlcdOriginY, nlcdCellSize, tileCells)
+            AddMsgAndPrint("\nWatershed is " + str(int(wsAcres)) + " acres; NLCD and soils will be processed in " + str(len(tiles)) + " tiles")
+
+        else:
+            # ---------------------------------------------------------------------- Clip NLCD to watershed boundary
+            AddMsgAndPrint("\nClipping " + str(os.path.basename(inNLCD)) + " to " + str(wsName) + " boundary..")
 
-        #landuse = arcpy.CreateScratchName("NLCD",data_type="RasterDataset",workspace="in_memory")
-        outMask = ExtractByMask(inNLCD, inWatershed)
-        outMask.save(landuse)
+            landuse = extractNLCD(nlcdSource, inWatershed, "memory" + os.sep + "NLCD")
 
-        AddMsgAndPrint("\nSuccessully Clipped NLCD...")
+            AddMsgAndPrint("\nSuccessully Clipped NLCD...")
 
-        # Isolate Cultivated Cropland and export to poly for soils processing
-        cultivatedGrid = Con(landuse,landuse,"","\"VALUE\" = 81 OR \"VALUE\" = 82 OR \"VALUE\" = 83 OR \"VALUE\" = 84 OR \"VALUE\" = 85")
+            # Isolate Cultivated Cropland and export to poly for soils processing
+            cultivatedGrid = Con(landuse,landuse,"","\"VALUE\" = 81 OR \"VALUE\" = 82 OR \"VALUE\" = 83 OR \"VALUE\" = 84 OR \"VALUE\" = 85")
 
-        cultivatedPoly = arcpy.CreateScratchName("cultivated_poly",data_type="FeatureClass",workspace="in_memory")
-        arcpy.RasterToPolygon_conversion(cultivatedGrid,cultivatedPoly,"SIMPLIFY","VALUE")
+            cultivatedPoly = arcpy.CreateScratchName("cultivated_poly",data_type="FeatureClass",workspace="in_memory")
+            arcpy.RasterToPolygon_conversion(cultivatedGrid,cultivatedPoly,"SIMPLIFY","VALUE")
 
         # -------------------------------------------------------------------------------------- Clip and Process Soils Data
         # Clip the soils to the watershed
@@ -403,155 +425,125 @@ if __name__ == '__main__':
         AddMsgAndPrint("\nSuccessfully clipped " + str(os.path.basename(inSoils)) + " soils layer")
         AddMsgAndPrint(str(wsSoils))
 
-        # If Input field name other than ssurgo default, add and calc proper field
+        # If Input field name other than ssurgo default, add proper field
         if inputField.upper() != "HYDGROUP":
             arcpy.AddField_management(wsSoils, "HYDGROUP", "TEXT", "", "", "20", "", "NULLABLE", "NON_REQUIRED")
-        arcpy.CalculateField_management(wsSoils, "HYDGROUP", "!" + str(inputField) + "!", "PYTHON3")
+        else:
+            inputField = "HYDGROUP"
+
+        # ADD HYD_CODE Field for lookup, and NAT_CODE for the natural state of combined groups when tiled
+        codeFields = ["HYD_CODE","NAT_CODE"] if bChunked else ["HYD_CODE"]
+        for codeField in codeFields:
+            if len(arcpy.ListFields(wsSoils,codeField)) < 1:
+                arcpy.AddField_management(wsSoils, codeField, "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED")
 
-        # ADD HYD_CODE Field for lookup
-        if len(arcpy.ListFields(wsSoils,"HYD_CODE")) < 1:
-            arcpy.AddField_management(wsSoils, "HYD_CODE", "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED")
+        # Read NLCD_RCN_TABLE once; Join_ values are (NLCD * 100) + hydro group ID
+        pairLookup, soilCodes = readNLCDLookup(NLCD_RCN_TABLE)
 
         # ---------------------------------------------------------------------------------- update muname and hydrgoup values
+        # Soils are read once into arrays; Water, Pit and Urban map units and NULL groups are assigned in memory
         AddMsgAndPrint("\n\tProcessing soils data...")
 
-        nullValues = 0
-
-        if len(arcpy.ListFields(wsSoils,"MUNAME")) > 0:
-
-            with arcpy.da.UpdateCursor(wsSoils,['MUNAME','HYDGROUP']) as cursor:
-                for row in cursor:
-                    updateRecord = False
+        soilFields = list(dict.fromkeys([inputField,"HYDGROUP"] + (["MUNAME"] if len(arcpy.ListFields(wsSoils,"MUNAME")) > 0 else [])))
+        soilOIDs, soilColumns = readTextColumns(wsSoils, soilFields)
 
-                    # Update HYDGROUP if conditions are met
-                    if any(row[0] in s for s in ['Water', 'Pit', 'Urban']):
-
-                        # assign "W" value to any water type map units
-                        if row[0].find('Water') > -1:
-                            row[1] = "W"
-                            updateRecord = True
-
-                        # assign "P" value to any pit-like map units
-                        elif row[0].find('Pit') > -1:
-                            row[1] = "P"
-                            updateRecord = True
-
-                        # "D" value to any unpopulated Urban mapunits
-                        elif row[0].find('Urban') > -1:
-                            row[1] = "D"
-                            updateRecord = True
-
-                    # assign null HYDRGROUP values to "W" (RCN value of 99)
-                    if row[1] is None or len(row[1]) == 0 or row[1] == '':
-                        row[1] = "W"
-                        nullValues += 1
-                        updateRecord = True
-
-                    if updateRecord:
-                        cursor.updateRow(row)
-                    else:
-                        continue
-            del cursor
+        # assign null HYDRGROUP values to "W" (RCN value of 99)
+        hydGroups, soilReport = normalizeHydroGroups(soilColumns[inputField], soilCodes.keys(), soilColumns.get("MUNAME"), "W")
+        nullValues = int(soilReport['empty'].sum())
 
         if nullValues:
             AddMsgAndPrint("\n\tThere are " + str(nullValues) + " null hydro group(s) remaining",1)
             AddMsgAndPrint("\t\tA RCN value of 99 will be applied to these areas",1)
 
+        invalidValues = sorted(set(hydGroups[soilReport['invalid'] & ~soilReport['dual']].tolist()))
+        if invalidValues:
+            AddMsgAndPrint("\n\tThe following hydro groups are not in the NLCD RCN lookup table: " + str(invalidValues),1)
+
         # ---------------------------------------------------------------------------------- update combined hydrgoup values
         AddMsgAndPrint("\n\tChecking for combined hydrologic groups...")
+        combClasses = int(soilReport['dual'].sum())
 
-        soilsLyr = "soilsLyr"
-        arcpy.MakeFeatureLayer_management(wsSoils, soilsLyr)
-
-        query = "\"HYDGROUP\" LIKE '%/%'"
-        arcpy.SelectLayerByAttribute_management(soilsLyr, "NEW_SELECTION", query)
-        combClasses = int(arcpy.GetCount_management(soilsLyr).getOutput(0))
+        if combClasses > 0 and bChunked:
+            AddMsgAndPrint("\n\tThere are " + str(combClasses) + " soil map unit(s) with combined hydro groups",0)
+            AddMsgAndPrint("\t\tCultivated cells will use the drained state and all other cells the natural state",0)
 
-        if combClasses > 0:
+        elif combClasses > 0:
             AddMsgAndPrint("\n\tThere are " + str(combClasses) + " soil map unit(s) with combined hydro groups",0)
 
-            # Select Combined Classes that intersect cultivated cropland
-            arcpy.SelectLayerByLocation(soilsLyr, "INTERSECT", cultivatedPoly, 0, "NEW_SELECTION")
-            combClassesIntCultPoly = int(arcpy.GetCount_management(soilsLyr).getOutput(0))
+            # Select soils that intersect cultivated cropland
+            soilsLyr = "soilsLyr"
+            arcpy.MakeFeatureLayer_management(wsSoils, soilsLyr)
+            arcpy.SelectLayerByLocation_management(soilsLyr, "INTERSECT", cultivatedPoly, 0, "NEW_SELECTION")
+            cultivatedOIDs = [int(oid) for oid in arcpy.Describe(soilsLyr).FIDSet.split(";") if oid.strip()]
+            arcpy.Delete_management(soilsLyr)
 
+            drained = isin(soilOIDs, cultivatedOIDs)
+            combClassesIntCultPoly = int((soilReport['dual'] & drained).sum())
+            remainingPolys = combClasses - combClassesIntCultPoly
+
+            # Set combined groups on cultivated land to drained state and the remaining to natural state
             if combClassesIntCultPoly > 0:
                 AddMsgAndPrint("\n\t\tSetting " + str(combClassesIntCultPoly) + " combined group(s) on cultivated land to drained state",0)
-                # Set selected polygons to drained state
-                arcpy.CalculateField_management(soilsLyr, "HYDGROUP", "!HYDGROUP![0]", "PYTHON3")
-
-            # Set remaining combined groups to natural state
-            arcpy.SelectLayerByAttribute_management(soilsLyr, "SWITCH_SELECTION")
-            remainingPolys = int(arcpy.GetCount_management(soilsLyr).getOutput(0))
-
             if remainingPolys > 0:
                 AddMsgAndPrint("\tSetting "  + str(remainingPolys) + " non-cultivated combined group(s) to natural state",0)
-                arcpy.CalculateField_management(soilsLyr,"HYDGROUP", "\"D\"", "PYTHON3")
-
-        # Clear any remaining selections
-        arcpy.SelectLayerByAttribute_management(soilsLyr, "CLEAR_SELECTION")
-
-        # Join NLCD Lookup table to populate HYD_CODE field
-        arcpy.AddJoin_management(soilsLyr, "HYDGROUP", NLCD_RCN_TABLE, "Soil", "KEEP_ALL")
-        calcFld = ''.join((os.path.basename(wsSoils),'.HYD_CODE'))
-        arcpy.CalculateField_management(soilsLyr, calcFld, "!NLCD_RCN_TABLE.ID!", "PYTHON3")
-        arcpy.RemoveJoin_management(soilsLyr, "NLCD_RCN_TABLE")
-
-        # ----------------------------------------------------------------------------------------------  Create Soils Raster
-        # Set snap raster to clipped NLCD
-        arcpy.env.snapRaster = landuse
-
-        # Convert soils to raster using preset cellsize
-        AddMsgAndPrint("\nCreating Hydro Groups Raster")
-        arcpy.PolygonToRaster_conversion(soilsLyr,"HYD_CODE",soilsGrid,"MAXIMUM_AREA","NONE",arcpy.env.cellSize)
-
-        # ----------------------------------------------------------------------------------------------- Create Curve Number Grid
-        # Combine Landuse and Soils
-        outCombine = Combine([landuse,soilsGrid])
-        outCombine.save(LU_PLUS_SOILS)
-
-        arcpy.BuildRasterAttributeTable_management(LU_PLUS_SOILS)
-
-        # Add RCN field to raster attributes
-        arcpy.AddField_management(LU_PLUS_SOILS, "HYD_CODE", "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED")
-        arcpy.AddField_management(LU_PLUS_SOILS, "LANDUSE", "TEXT", "", "", "255", "", "NULLABLE", "NON_REQUIRED", "")
-        arcpy.AddField_management(LU_PLUS_SOILS, "HYD_GROUP", "TEXT", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
-        arcpy.AddField_management(LU_PLUS_SOILS, "RCN", "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
-        arcpy.AddField_management(LU_PLUS_SOILS, "ACRES", "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
-        arcpy.AddField_management(LU_PLUS_SOILS, "WGT_RCN", "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
-
-        arcpy.CalculateField_management(LU_PLUS_SOILS, "HYD_CODE", "(!NLCD! * 100) + !SOILS!", "PYTHON3")
-        arcpy.CalculateField_management(LU_PLUS_SOILS, "ACRES", "!COUNT! * (" + str(cellArea) + " / " + str(acreConversionDict.get(nlcdUnits)) + ")", "PYTHON3")
-
-        # Sum the count (equivalent to area) for each CN in watershed
-        rcn_stats = arcpy.CreateScratchName("rcn_stats",data_type="ArcInfoTable",workspace="in_memory")
-        arcpy.Statistics_analysis(LU_PLUS_SOILS, rcn_stats,[["COUNT", "SUM"]])
-
-        # Join NLCD Lookup table to retrieve RCN and desc values
-        arcpy.MakeRasterLayer_management(LU_PLUS_SOILS, "LU_PLUS_SOILS_LYR")
-        arcpy.AddJoin_management("LU_PLUS_SOILS_LYR", "HYD_CODE", NLCD_RCN_TABLE, "Join_", "KEEP_ALL")
-        arcpy.CalculateField_management("LU_PLUS_SOILS_LYR", "VAT_LU_PLUS_SOILS.RCN", "!NLCD_RCN_TABLE.CN!", "PYTHON3")
-        arcpy.CalculateField_management("LU_PLUS_SOILS_LYR", "VAT_LU_PLUS_SOILS.LANDUSE", "!NLCD_RCN_TABLE.NRCS_LANDUSE!","PYTHON3")
-        arcpy.CalculateField_management("LU_PLUS_SOILS_LYR", "VAT_LU_PLUS_SOILS.HYD_GROUP", "!NLCD_RCN_TABLE.Soil!", "PYTHON3")
+            hydGroups = drainedGroups(hydGroups, drained)
+
+        # Write HYDGROUP and the hydro group ID(s) in one pass
+        soilUpdates = {}
+        for oid, group in zip(soilOIDs, hydGroups.tolist()):
+            if bChunked and group.find('/') > -1:
+                soilUpdates[oid] = [group, soilCodes.get(group[0]), soilCodes.get("D")]
+            elif bChunked:
+                soilUpdates[oid] = [group, soilCodes.get(group), soilCodes.get(group)]
+            else:
+                soilUpdates[oid] = [group, soilCodes.get(group)]
+        updateRows(wsSoils, ["HYDGROUP"] + codeFields, soilUpdates)
 
-        # -------------------------------------------------------------------------------- Weight Curve Number
-        # Retrieve the total area (Watershed Area)
-        wsArea = [row[0] for row in arcpy.da.SearchCursor(rcn_stats,["SUM_COUNT"])][0]
+        pairRCN = {code: values[0] for code, values in pairLookup.items()}
+        rcnGridSource = rcnGridTemp if len(snapRaster) > 0 else RCN_GRID
+
+        if bChunked:
+            # ------------------------------------------------------------------------------------------- Combine Landuse and Soils by Tile
+            # Each tile's cells are encoded as (NLCD * 100) + hydro group ID and added to a running count
+            AddMsgAndPrint("\nCombining NLCD and Hydro Groups by tile")
+            pairCells = tiledPairCounts(nlcdSource, watershed, wsSoils, tiles, pairRCN, rcnGridSource if bCreateRCNgrid else None, arcpy.env.scratchGDB, tileWorkers)
+
+        else:
+            # ------------------------------------------------------------------------------------------  Create Soils Raster
+            # Set snap raster to clipped NLCD
+            arcpy.env.snapRaster = landuse
 
-        # Multiply CN by percent of area to weight
-        arcpy.CalculateField_management(LU_PLUS_SOILS, "WGT_RCN", "!RCN! * (!COUNT! / " + str(float(wsArea)) + ")", "PYTHON")
+            # Convert soils to raster using preset cellsize
+            AddMsgAndPrint("\nCreating Hydro Groups Raster")
+            arcpy.PolygonToRaster_conversion(wsSoils,"HYD_CODE",soilsGrid,"MAXIMUM_AREA","NONE",arcpy.env.cellSize)
 
-        # Sum the weights to create weighted RCN
-        rcn_stats2 = arcpy.CreateScratchName("rcn_stats2",data_type="ArcInfoTable",workspace="in_memory")
-        arcpy.Statistics_analysis(LU_PLUS_SOILS, rcn_stats2, [["WGT_RCN","SUM"]])
-        wgtRCN = [row[0] for row in arcpy.da.SearchCursor(rcn_stats2,["SUM_WGT_RCN"])][0]
+            # ------------------------------------------------------------------------------------------- Combine Landuse and Soils
+            # Encode each cell as (NLCD * 100) + HYD_CODE and count the cells of each combination
+            codes, lowerLeft, cellWidth, cellHeight = readPairCodes(landuse, soilsGrid)
+            pairCells = pairCounts(codes)
+
+        # -------------------------------------------------------------------------------- Weight Curve Number
+        wgtRCN, missingPairs = weightedRCN(pairCells, pairRCN)
+
+        if missingPairs:
+            AddMsgAndPrint("\n\t" + str(len(missingPairs)) + " NLCD and hydro group combination(s) were not found in NLCD_RCN_TABLE",1)
+            AddMsgAndPrint("\t\tThese areas are not included in the weighted RCN",1)
 
         AddMsgAndPrint("\n\tWeighted Average Runoff Curve No. for " + str(wsName) + " is " + str(int(wgtRCN)),0)
 
         # Export RCN Summary Table
-        arcpy.CopyRows_management(LU_PLUS_SOILS, RCN_TABLE)
-
-        # Delete un-necessary fields from summary table
-        arcpy.DeleteField_management(RCN_TABLE, ["VALUE","COUNT","SOILS","HYD_CODE","HYD_CODE","WGT_RCN"])
+        arcpy.CreateTable_management(watershedGDB_path, os.path.basename(RCN_TABLE))
+        arcpy.AddField_management(RCN_TABLE, "NLCD", "LONG", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
+        arcpy.AddField_management(RCN_TABLE, "LANDUSE", "TEXT", "", "", "255", "", "NULLABLE", "NON_REQUIRED", "")
+        arcpy.AddField_management(RCN_TABLE, "HYD_GROUP", "TEXT", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
+        arcpy.AddField_management(RCN_TABLE, "RCN", "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
+        arcpy.AddField_management(RCN_TABLE, "ACRES", "DOUBLE", "", "", "", "", "NULLABLE", "NON_REQUIRED", "")
+
+        cellAcres = cellArea / acreConversionDict.get(nlcdUnits)
+        with arcpy.da.InsertCursor(RCN_TABLE, ["NLCD","LANDUSE","HYD_GROUP","RCN","ACRES"]) as cursor:
+            for code, cells in sorted(pairCells.items()):
+                rcn, landuseName, hydGroup = pairLookup.get(code, (None, None, None))
+                cursor.insertRow((code // PAIR_BASE, landuseName, hydGroup, rcn, cells * cellAcres))
 
         # ------------------------------------------------------------------ Pass results to user watershed
         AddMsgAndPrint("\nAdding RCN results to " + str(wsName) + "'s attributes")
@@ -570,15 +562,19 @@ if __name__ == '__main__':
                 arcpy.env.outputCoordinateSystem = outCoordSys
                 arcpy.env.cellSize = outCellSize
 
-            # Convert Combined Raster to Curve Number grid
-            outLookup = Lookup(LU_PLUS_SOILS, "RCN")
-            outLookup.save(RCN_GRID)
+            # Convert combination codes to Curve Number grid (tiles were mosaicked as they were combined)
+            if not bChunked:
+                savePairRCN(codes, pairRCN, lowerLeft, cellWidth, cellHeight, rcnGridSource, nlcdDescSR)
+
+            # Resample to the snap raster's cell size, grid and coordinate system if provided
+            if len(snapRaster) > 0:
+                arcpy.Resample_management(rcnGridTemp, RCN_GRID, outCellSize, "NEAREST")
 
             AddMsgAndPrint("\nSuccessfully Created Runoff Curve Number Grid")
 
         # ----------------------------------------------------- Delete Intermediate data
         AddMsgAndPrint("\nDeleting intermediate data")
-        for layer in [LU_PLUS_SOILS,cultivatedGrid,cultivatedPoly,soilsGrid,rcn_stats,rcn_stats2,landuse]:
+        for layer in [cultivatedGrid,cultivatedPoly,soilsGrid,rcnGridTemp,landuse]:
 
             if arcpy.Exists(layer):
                 arcpy.Delete_management(layer)
@@ -597,4 +593,7 @@ if __name__ == '__main__':
         AddMsgAndPrint("\nAdding Output to ArcGIS Pro")
 
     except:
-        print_exception()
\ No newline at end of file
+        print_exception()
+
+    finally:
+        closeProjectLogs()
@@ -3,17 +3,18 @@ from os import path
 from sys import argv, exit
 from time import ctime
 
-from arcpy import Describe, env, Exists, GetInstallInfo, GetParameterAsText, ListFields, SetParameterAsText, SetProgressorLabel
+from arcpy import Describe, env, Exists, GetInstallInfo, GetParameterAsText, ListFields, SetParameterAsText
 from arcpy.analysis import Intersect, Statistics
 from arcpy.da import SearchCursor, UpdateCursor
-from arcpy.management import AddField, AlterField, CalculateField, Compact, Delete, DeleteField, Dissolve
-from arcpy.mp import ArcGISProject
+from arcpy.management import AddField, AlterField, CalculateField, Compact, DeleteField, Dissolve
 
-from utils import AddMsgAndPrint, emptyScratchGDB, errorMsg, removeMapLayers
+from rcn_io import MissingRCNError, rasterRCN, readRCNLookup
+from scratch_manager import ScratchManager
+from utils import AddMsgAndPrint, engineeringProject, errorMsg, projectLog, removeMapLayers, stageTimer
 
 
-def logBasicSettings(log_file_path, input_watershed):
-    with open (log_file_path, 'a+') as f:
+def logBasicSettings(log_file_path, input_watershed, rcn_method):
+    with projectLog(log_file_path) as f:
         f.write('\n######################################################################\n')
         f.write('Executing Tool: Calculate Runoff Curve Number\n')
         f.write(f"Pro Version: {GetInstallInfo()['Version']}\n")
@@ -21,18 +22,20 @@ def logBasicSettings(log_file_path, input_watershed):
         f.write(f"Date Executed: {ctime()}\n")
         f.write('User Parameters:\n')
         f.write(f"\tWatershed Layer: {input_watershed}\n")
+        f.write(f"\tRCN Method: {rcn_method}\n")
 
 
 ### Initial Tool Validation ###
 try:
-    aprx = ArcGISProject('CURRENT')
-    map = aprx.listMaps('Engineering')[0]
+    aprx, map = engineeringProject()
 except:
     AddMsgAndPrint('\nThis tool must be run from an ArcGIS Pro project template distributed with the Engineering Tools. Exiting!', 2)
     exit()
 
 ### Input Parameters ###
 input_watershed = GetParameterAsText(0)
+# 'VECTOR' intersects the polygons for exact areas, 'RASTER' rasterizes land use and soils to the DEM grid
+rcn_method = GetParameterAsText(1) or 'VECTOR'
 
 ### Locate Project GDB ###
 watershed_path = Describe(input_watershed).catalogPath
@@ -46,6 +49,7 @@ else:
 support_dir = path.dirname(argv[0])
 support_gdb = path.join(support_dir, 'Support.gdb')
 scratch_gdb = path.join(support_dir, 'Scratch.gdb')
+scratch = ScratchManager(scratch_gdb)
 project_workspace = path.dirname(project_gdb)
 project_name = path.basename(project_workspace)
 log_file_path = path.join(project_workspace, f"{project_name}_log.txt")
@@ -55,9 +59,11 @@ land_use_path = path.join(project_fd, f"{watershed_name}_Land_Use")
 soils_path = path.join(project_fd, f"{watershed_name}_Soils")
 output_rcn_name = f"{watershed_name}_RCN"
 output_rcn_path = path.join(project_fd, output_rcn_name)
+output_rcn_grid_path = path.join(project_gdb, f"{watershed_name}_RCN_Grid")
+dem_path = path.join(project_gdb, f"{project_name}_DEM")
 tr_55_rcn_lookup_table = path.join(support_gdb, 'TR_55_RCN_Lookup')
-watershed_landuse_soils_temp = r"memory\watershed_landuse_soils"
-rcn_stats_temp = r"memory\rcn_stats"
+watershed_landuse_soils_temp = scratch.name('watershed_landuse_soils')
+rcn_stats_temp = scratch.name('rcn_stats')
 
 ### Validate Required Datasets Exist ###
 if '_Land_Use' in input_watershed or '_Soils' in input_watershed:
@@ -75,17 +81,22 @@ if not Exists(soils_path):
 if not Exists(tr_55_rcn_lookup_table):
     AddMsgAndPrint('\nTR_55_RCN_Lookup table was not found in Support.gdb. Exiting...', 2)
     exit()
+if rcn_method == 'RASTER' and not Exists(dem_path):
+    AddMsgAndPrint('\nProject DEM was not found to set the RCN grid. Exiting...', 2)
+    exit()
 
 ### ESRI Environment Settings ###
 env.overwriteOutput = True
 env.parallelProcessingFactor = '75%'
 
+perf = stageTimer('Calculate Runoff Curve Number', project_workspace)
+
 try:
-    removeMapLayers(map, [output_rcn_name])
-    logBasicSettings(log_file_path, input_watershed)
+    removeMapLayers(map, [output_rcn_name, path.basename(output_rcn_grid_path)])
+    logBasicSettings(log_file_path, input_watershed, rcn_method)
 
     ### Validate LANDUSE Field Values ###
-    SetProgressorLabel('Validating LANDUSE field values...')
+    perf.stage('Validating LANDUSE field values...')
     AddMsgAndPrint('\nValidating LANDUSE field values...', log_file_path=log_file_path)
 
     expression = "LANDUSE LIKE '%not assigned%' OR LANDUSE IS NULL"
@@ -96,7 +107,7 @@ try:
         exit()
 
     ### Validate HYDGROUP Field Values ###
-    SetProgressorLabel('Validating HYDGROUP field values...')
+    perf.stage('Validating HYDGROUP field values...')
     AddMsgAndPrint('\nValidating HYDGROUP field values...')
 
     expression = "HYDGROUP LIKE '%/%' OR HYDGROUP IS NULL"
@@ -113,34 +124,62 @@ try:
         AddField(input_watershed, 'Acres', 'DOUBLE')
     CalculateField(input_watershed, 'Acres', "!shape!.getArea('PLANAR', 'ACRES')", 'PYTHON3')
 
-    ### Intersect Watershed, Land Use, Soils and Add Fields ###
-    SetProgressorLabel('Intersecting Watershed, Land Use, Soils layers...')
-    AddMsgAndPrint('\nIntersecting Watershed, Land Use, Soils layers...', log_file_path=log_file_path)
-
-    Intersect([input_watershed, land_use_path, soils_path], watershed_landuse_soils_temp, 'NO_FID')
-
-    AddField(watershed_landuse_soils_temp, 'RCN_ACRES', 'DOUBLE')
-    AddField(watershed_landuse_soils_temp, 'WGTRCN', 'DOUBLE')
-
     ### RCN Lookup ###
-    rcn_lookup = {}
-    rcn_fields = ['LANDUSE', 'HYDGROUP', 'RCN']
-    with SearchCursor(tr_55_rcn_lookup_table, rcn_fields) as cursor:
-        for row in cursor:
-            rcn_lookup[(row[0], row[1])] = row[2]
-
-    with UpdateCursor(watershed_landuse_soils_temp, rcn_fields) as cursor:
-        for row in cursor:
-            row[2] = rcn_lookup[row[0], row[1]]
-            cursor.updateRow(row)
-
-    ### RCN_ACRES and WGTRCN ###
-    CalculateField(watershed_landuse_soils_temp, 'RCN_ACRES', "!shape!.getArea('PLANAR', 'ACRES')", 'PYTHON3')
-    CalculateField(watershed_landuse_soils_temp, 'WGTRCN', '(!RCN_ACRES! / !ACRES!) * !RCN!', 'PYTHON3')
-    Statistics(watershed_landuse_soils_temp, rcn_stats_temp, 'WGTRCN SUM', 'Subbasin')
+    rcn_lookup = readRCNLookup(tr_55_rcn_lookup_table)
+
+    if rcn_method == 'RASTER':
+        ### Rasterize Watershed, Land Use, Soils and Summarize RCN ###
+        perf.stage('Calculating RCN from rasterized Watershed, Land Use, Soils layers...')
+        AddMsgAndPrint('\nCalculating RCN from rasterized Watershed, Land Use, Soils layers...', log_file_path=log_file_path)
+
+        try:
+            subbasin_rcn = rasterRCN(input_watershed, land_use_path, soils_path, rcn_lookup, dem_path, output_rcn_path, output_rcn_grid_path, scratch)
+        except MissingRCNError as e:
+            for land_use, hyd_group in e.pairs:
+                AddMsgAndPrint(f"\nNo RCN found for LANDUSE {land_use} and HYDGROUP {hyd_group}.", 2, log_file_path)
+            AddMsgAndPrint('Every land use and hydrologic group combination must be in the RCN lookup table. Exiting...', 2, log_file_path)
+            exit()
+
+    else:
+        ### Intersect Watershed, Land Use, Soils and Add Fields ###
+        perf.stage('Intersecting Watershed, Land Use, Soils layers...')
+        AddMsgAndPrint('\nIntersecting Watershed, Land Use, Soils layers...', log_file_path=log_file_path)
+
+        Intersect([input_watershed, land_use_path, soils_path], watershed_landuse_soils_temp, 'NO_FID')
+
+        AddField(watershed_landuse_soils_temp, 'RCN_ACRES', 'DOUBLE')
+        AddField(watershed_landuse_soils_temp, 'WGTRCN', 'DOUBLE')
+
+        with UpdateCursor(watershed_landuse_soils_temp, ['LANDUSE', 'HYDGROUP', 'RCN']) as cursor:
+            for row in cursor:
+                row[2] = rcn_lookup[row[0], row[1]]
+                cursor.updateRow(row)
+
+        ### RCN_ACRES and WGTRCN ###
+        CalculateField(watershed_landuse_soils_temp, 'RCN_ACRES', "!shape!.getArea('PLANAR', 'ACRES')", 'PYTHON3')
+        CalculateField(watershed_landuse_soils_temp, 'WGTRCN', '(!RCN_ACRES! / !ACRES!) * !RCN!', 'PYTHON3')
+        Statistics(watershed_landuse_soils_temp, rcn_stats_temp, 'WGTRCN SUM', 'Subbasin')
+        subbasin_rcn = {row[0]: row[1] for row in SearchCursor(rcn_stats_temp, ['Subbasin', 'SUM_WGTRCN'])}
+
+        ### Finalize RCN Layer ###
+        perf.stage('Creating RCN Layer...')
+        AddMsgAndPrint('\nCreating RCN Layer...', log_file_path=log_file_path)
+
+        # Dissolve by Subbasin, LANDUSE, HYDGROUP to produce RCN layer
+        stats_fields = [['LANDUSE','FIRST'], ['HYDGROUP','FIRST'], ['RCN','FIRST'], ['Acres','FIRST']]
+        Dissolve(watershed_landuse_soils_temp, output_rcn_path, ['Subbasin', 'LANDUSE', 'HYDGROUP'], stats_fields, 'MULTI_PART', 'DISSOLVE_LINES')
+
+        # Remove 'FIRST' from field names and aliases
+        DeleteField(output_rcn_path, ['FIRST_LANDUSE','FIRST_HYDGROUP'])
+        for field in ListFields(output_rcn_path):
+            if field.name.startswith('FIRST'):
+                AlterField(output_rcn_path, field.name, field.name[6:], field.name[6:])
+
+        # Update Acres
+        CalculateField(output_rcn_path, 'Acres', "!shape!.getArea('PLANAR', 'ACRES')", 'PYTHON3')
 
     ### Transfer RCN to Watershed ###
-    SetProgressorLabel('Updating Watershed with RCN values...')
+    perf.stage('Updating Watershed with RCN values...')
     AddMsgAndPrint('\nUpdating Watershed with RCN values...', log_file_path=log_file_path)
     with UpdateCursor(input_watershed, ['Subbasin','RCN']) as cursor:
         for row in cursor:
@@ -148,36 +187,21 @@ try:
             if subbasin_number is None or len(str(subbasin_number)) < 1:
                 AddMsgAndPrint('\nOne or more Subbasins in the Watershed are missing an ID number. Exiting...', 2, log_file_path)
                 exit()
-            expression = f"Subbasin = {subbasin_number}"
-            rcn_value = [row[0] for row in SearchCursor(rcn_stats_temp, ['SUM_WGTRCN'], where_clause=expression)][0]
+            if subbasin_number not in subbasin_rcn:
+                AddMsgAndPrint(f"\nSubbasin {subbasin_number} is smaller than one DEM cell. Use the VECTOR RCN method to calculate its RCN. Exiting...", 2, log_file_path)
+                exit()
+            rcn_value = subbasin_rcn[subbasin_number]
             row[1] = rcn_value
             cursor.updateRow(row)
             AddMsgAndPrint(f"\n\tSubbasin ID: {subbasin_number}", 0, log_file_path)
             AddMsgAndPrint(f"\t\tWeighted Average RCN Value: {round(rcn_value,0)}", 0, log_file_path)
 
-    ### Finalize RCN Layer ###
-    SetProgressorLabel('Creating RCN Layer...')
-    AddMsgAndPrint('\nCreating RCN Layer...', log_file_path=log_file_path)
-
-    # Dissolve by Subbasin, LANDUSE, HYDGROUP to produce RCN layer
-    stats_fields = [['LANDUSE','FIRST'], ['HYDGROUP','FIRST'], ['RCN','FIRST'], ['Acres','FIRST']]
-    Dissolve(watershed_landuse_soils_temp, output_rcn_path, ['Subbasin', 'LANDUSE', 'HYDGROUP'], stats_fields, 'MULTI_PART', 'DISSOLVE_LINES')
-
-    # Remove 'FIRST' from field names and aliases
-    DeleteField(output_rcn_path, ['FIRST_LANDUSE','FIRST_HYDGROUP'])
-    for field in ListFields(output_rcn_path):
-        if field.name.startswith('FIRST'):
-            AlterField(output_rcn_path, field.name, field.name[6:], field.name[6:])
-
-    # Update Acres
-    CalculateField(output_rcn_path, 'Acres', "!shape!.getArea('PLANAR', 'ACRES')", 'PYTHON3')
-
     ### Add Output to Map ###
-    SetParameterAsText(1, output_rcn_path)
+    SetParameterAsText(2, output_rcn_path)
 
     ### Compact Project GDB ###
     try:
-        SetProgressorLabel('Compacting project geodatabase...')
+        perf.stage('Compacting project geodatabase...')
         AddMsgAndPrint('\nCompacting project geodatabase...', log_file_path=log_file_path)
         Compact(project_gdb)
     except:
@@ -195,12 +219,5 @@ except:
         AddMsgAndPrint(errorMsg('Calculate Runoff Curve Number'), 2)
 
 finally:
-    try:
-        Delete(rcn_stats_temp)
-    except:
-        pass
-    try:
-        Delete(watershed_landuse_soils_temp)
-    except:
-        pass
-    emptyScratchGDB(scratch_gdb)
+    perf.finish()
+    scratch.cleanup()
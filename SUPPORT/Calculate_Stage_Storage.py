@@ -4,19 +4,19 @@ from sys import argv, exit
 from time import ctime
 
 from arcpy import AlterAliasName, Describe, CheckExtension, CheckOutExtension, env, Exists, GetInstallInfo, GetParameterAsText, \
-    GetParameter, SetParameterAsText, SetProgressorLabel
+    GetParameter, SetParameterAsText
 from arcpy.conversion import RasterToPolygon
 from arcpy.da import SearchCursor
 from arcpy.ddd import SurfaceVolume
 from arcpy.management import AddField, CalculateField, Compact, CopyRows, Delete, Dissolve, GetCount, GetRasterProperties, Merge, TruncateTable
-from arcpy.mp import ArcGISProject
 from arcpy.sa import ExtractByMask, Int, SetNull, Times
 
-from utils import AddMsgAndPrint, emptyScratchGDB, errorMsg, removeMapLayers
+from scratch_manager import ScratchManager
+from utils import AddMsgAndPrint, engineeringProject, errorMsg, projectLog, removeMapLayers, stageTimer
 
 
 def logBasicSettings(log_file_path, project_dem, input_pool, max_elevation, increment, create_pools_layer):
-    with open (log_file_path, 'a+') as f:
+    with projectLog(log_file_path) as f:
         f.write('\n######################################################################\n')
         f.write('Executing Tool: Calculate State Storage\n')
         f.write(f"Pro Version: {GetInstallInfo()['Version']}\n")
@@ -32,8 +32,7 @@ def logBasicSettings(log_file_path, project_dem, input_pool, max_elevation, incr
 
 ### Initial Tool Validation ###
 try:
-    aprx = ArcGISProject('CURRENT')
-    map = aprx.listMaps('Engineering')[0]
+    aprx, map = engineeringProject()
 except:
     AddMsgAndPrint('\nThis tool must be run from an ArcGIS Pro project template distributed with the Engineering Tools. Exiting!', 2)
     exit()
@@ -72,13 +71,14 @@ if int(GetCount(input_pool).getOutput(0)) > 1:
 ### Set Paths and Variables ###
 support_dir = path.dirname(argv[0])
 scratch_gdb = path.join(support_dir, 'Scratch.gdb')
+scratch = ScratchManager(scratch_gdb)
 project_workspace = path.dirname(project_gdb)
 project_name = path.basename(project_workspace)
 log_file_path = path.join(project_workspace, f"{project_name}_log.txt")
 project_fd = path.join(project_gdb, 'Layers')
 input_pool_name = path.splitext(path.basename(input_pool))[0]
 storage_table_temp = path.join(project_workspace, f"{input_pool_name}_StorageCSV.txt")
-temp_pool = r'memory\Temp_Pool'
+temp_pool = scratch.name('Temp_Pool')
 
 # Include Subbasin number in output names if input polygon is Watershed layer
 try:
@@ -110,12 +110,14 @@ to_acre_foot = 1233.48184
 to_cubic_meters = 1
 to_cubic_feet = 35.3147
 
+perf = stageTimer('Calculate Stage Storage', project_workspace, project_dem_path)
+
 try:
     removeMapLayers(map, [output_pool_name, storage_table_name])
     logBasicSettings(log_file_path, project_dem, input_pool, max_elevation, analysis_increment, create_pools_layer)
 
     ### Clip DEM to Input Polygon and get Min/Max ###
-    SetProgressorLabel('Clipping DEM to input pool polygon...')
+    perf.stage('Clipping DEM to input pool polygon...')
     AddMsgAndPrint('\nClipping DEM to input pool polygon...', log_file_path=log_file_path)
     temp_dem = ExtractByMask(project_dem, input_pool)
     temp_dem_min = round(float(GetRasterProperties(temp_dem, 'MINIMUM').getOutput(0)),1)
@@ -125,7 +127,7 @@ try:
         exit()
 
     ### Calculate Volume and Surface Area Incrementally ###
-    SetProgressorLabel(f"Calulating volume and surface area every {analysis_increment} ft...")
+    perf.stage(f"Calulating volume and surface area every {analysis_increment} ft...")
     AddMsgAndPrint(f"\nCalulating volume and surface area every {analysis_increment} ft between {temp_dem_min} and {round(max_elevation)} ft...", log_file_path=log_file_path)
     AddMsgAndPrint(f"\n{round(((max_elevation-temp_dem_min)//analysis_increment)+1)} pools will be created...")
 
@@ -142,7 +144,7 @@ try:
     pool_fcs = []
 
     while elevation_to_process > temp_dem_meters_min:
-        SetProgressorLabel(f"Processing elevation {elevation_to_process}...")
+        perf.stage(f"Processing elevation {elevation_to_process}...")
         AddMsgAndPrint(f"\nProcessing elevation {elevation_to_process}...", log_file_path=log_file_path)
 
         SurfaceVolume(temp_dem_meters, storage_table_temp, 'BELOW', elevation_to_process, '1')
@@ -150,7 +152,7 @@ try:
         if create_pools_layer:
             try:
                 increment_pool_name = f"Pool_{str(round(elevation_to_process,1)).replace('.','_')}"
-                increment_pool_path = fr'memory\{increment_pool_name}'
+                increment_pool_path = scratch.name(increment_pool_name)
 
                 # Create new raster of only values below an elevation value by nullifying cells above the desired elevation value
                 above_elevation = SetNull(temp_dem_meters, temp_dem_meters, f"Value > {elevation_to_process}")
@@ -211,7 +213,7 @@ try:
         elevation_to_process = elevation_to_process - increment_meters
 
     ### Finalize Storage Table ###
-    SetProgressorLabel('Finalizing storage table...')
+    perf.stage('Finalizing storage table...')
     AddMsgAndPrint('\nFinalizing storage table...', log_file_path=log_file_path)
 
     if Exists(storage_table_path):
@@ -252,7 +254,7 @@ try:
 
     ### Create Pools Feature Class ###
     if create_pools_layer:
-        SetProgressorLabel('Finalizing pools feature class...')
+        perf.stage('Finalizing pools feature class...')
         AddMsgAndPrint('\nFinalizing pools feature class...', log_file_path=log_file_path)
         if pool_fcs:
             Merge(pool_fcs, output_pool_path)
@@ -265,7 +267,7 @@ try:
 
     ### Compact Project GDB ###
     try:
-        SetProgressorLabel('Compacting project geodatabase...')
+        perf.stage('Compacting project geodatabase...')
         AddMsgAndPrint('\nCompacting project geodatabase...', log_file_path=log_file_path)
         Compact(project_gdb)
     except:
@@ -283,15 +285,5 @@ except:
         AddMsgAndPrint(errorMsg('Calculate Stage Storage'), 2)
 
 finally:
-    memory_datasets = [temp_pool]
-    memory_datasets.extend(locals().get('pool_fcs', []))
-
-    for ds in memory_datasets:
-        try:
-            if Exists(ds):
-                Delete(ds)
-        except:
-            pass
-
-    emptyScratchGDB(scratch_gdb)
-
+    perf.finish()
+    scratch.cleanup()
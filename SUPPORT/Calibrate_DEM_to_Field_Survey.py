@@ -3,17 +3,23 @@ from os import path
 from sys import argv, exit
 from time import ctime
 
-from arcpy import CheckExtension, CheckOutExtension, Describe, env, GetInstallInfo, GetParameter, GetParameterAsText, SetProgressorLabel
+from numpy import array, isnan, nan
+
+from arcpy import CheckExtension, CheckOutExtension, Describe, env, GetInstallInfo, GetParameter, GetParameterAsText
 from arcpy.da import SearchCursor, UpdateCursor
-from arcpy.management import AddField, CalculateField, Compact, CopyFeatures, GetCount, Delete
+from arcpy.management import AddField, Compact, CopyFeatures, GetCount
 from arcpy.mp import ArcGISProject
-from arcpy.sa import Plus, ZonalStatisticsAsTable
+from arcpy.sa import Plus
 
-from utils import AddMsgAndPrint, emptyScratchGDB, errorMsg, removeMapLayers
+from dem_processing import applyCorrectionBlock, fitThinPlateSpline, idwSurface, rejectSurfaceOutliers, thinPlateSurface
+from point_sampler import samplePoints
+from raster_io import processRasterInBlocks, readRasterWindow
+from scratch_manager import ScratchManager
+from utils import AddMsgAndPrint, errorMsg, projectLog, removeMapLayers, stageTimer
 
 
-def logBasicSettings(log_file_path, project_dem):
-    with open (log_file_path, 'a+') as f:
+def logBasicSettings(log_file_path, project_dem, correction_surface):
+    with projectLog(log_file_path) as f:
         f.write('\n######################################################################\n')
         f.write('Executing Tool: Calibrate DEM to Field Survey\n')
         f.write(f"Pro Version: {GetInstallInfo()['Version']}\n")
@@ -21,6 +27,7 @@ def logBasicSettings(log_file_path, project_dem):
         f.write(f"Date Executed: {ctime()}\n")
         f.write('User Parameters:\n')
         f.write(f"\tProject DEM: {project_dem}\n")
+        f.write(f"\tCorrection Surface: {correction_surface or 'AVERAGE'}\n")
 
 
 ### Initial Tool Validation ###
@@ -42,6 +49,10 @@ project_dem = GetParameterAsText(0)
 input_points = GetParameterAsText(1)  
 input_field = GetParameterAsText(2)
 input_value = GetParameter(3)
+# AVERAGE applies the average survey difference to the whole DEM; IDW or TPS fit a correction surface to the differences
+correction_surface = GetParameterAsText(4).upper()
+if correction_surface in ('', 'AVERAGE'):
+    correction_surface = None
 
 ### Locate Project GDB ###
 project_dem_path = Describe(project_dem).CatalogPath
@@ -54,6 +65,7 @@ else:
 ### Set Paths and Variables ###
 support_dir = path.dirname(argv[0])
 scratch_gdb = path.join(support_dir, 'Scratch.gdb')
+scratch = ScratchManager(scratch_gdb)
 project_workspace = path.dirname(project_gdb)
 project_name = path.basename(project_workspace)
 log_file_path = path.join(project_workspace, f"{project_name}_log.txt")
@@ -61,9 +73,13 @@ project_fd = path.join(project_gdb, 'Layers')
 survey_points = path.join(project_fd, 'DEM_Calibration_Points')
 adjusted_dem_name = f"{project_name}_DEM_adjusted"
 adjusted_dem_path = path.join(project_gdb, adjusted_dem_name)
-temp_points = r"memory\temp_points"
-temp_stats = r"memory\temp_stats"
+temp_points = scratch.name('temp_points')
 elevation_adjustment = 0
+used = None
+
+### Processing Options ###
+idw_power = 2.0
+tps_smoothing = 0.0
 
 ### ESRI Environment Settings ###
 dem_desc = Describe(project_dem_path)
@@ -77,40 +93,56 @@ env.parallelProcessingFactor = '75%'
 env.extent = 'MINOF'
 env.overwriteOutput = True
 
+perf = stageTimer('Calibrate DEM to Field Survey', project_workspace, project_dem_path)
+
 try:
     removeMapLayers(map, [adjusted_dem_name])
-    logBasicSettings(log_file_path, project_dem)
+    logBasicSettings(log_file_path, project_dem, correction_surface)
 
     ### Survey Points Layer Provided ###
     if input_points and int(GetCount(input_points).getOutput(0)) > 0:
-        SetProgressorLabel('Processing survey points...')
+        perf.stage('Processing survey points...')
         AddMsgAndPrint('\nProcessing survey points...', log_file_path=log_file_path)
         
-        number_of_points = int(GetCount(input_points).getOutput(0))
-        elevation_difference = 0
-
         CopyFeatures(input_points, temp_points)
-        AddField(temp_points, 'POINTID', 'LONG')
         AddField(temp_points, 'DEM_ELEV', 'DOUBLE')
         AddField(temp_points, 'DIFF', 'DOUBLE')
-        CalculateField(temp_points, 'POINTID', '!OBJECTID!', 'PYTHON3')
-
-        # Use Zonal Statistics to get elevations at point locations from DEM
-        ZonalStatisticsAsTable(temp_points, 'POINTID', project_dem, temp_stats, 'DATA')
-
-        with SearchCursor(temp_stats, ['POINTID', 'MEAN']) as s_cur:
-            for s_row in s_cur:
-                point_id = s_row[0]
-                dem_elevation = s_row[1]
-
-                with UpdateCursor(temp_points, ['DEM_ELEV', 'DIFF', input_field], f"POINTID={point_id}") as u_cur:
-                    for u_row in u_cur:
-                        u_row[0] = round(dem_elevation, 1)
-                        u_row[1] = round(u_row[2]-dem_elevation, 1)
-                        u_cur.updateRow(u_row)
-                        elevation_difference += u_row[1]
-
-        elevation_adjustment = round(elevation_difference/number_of_points, 1)
+        if correction_surface:
+            AddField(temp_points, 'USED', 'SHORT')
+
+        # Sample DEM elevations at all point locations from one DEM window
+        with SearchCursor(temp_points, ['OID@', 'SHAPE@X', 'SHAPE@Y', input_field]) as cursor:
+            point_rows = [row for row in cursor]
+        point_ids = [row[0] for row in point_rows]
+        point_x = array([row[1] for row in point_rows], float)
+        point_y = array([row[2] for row in point_rows], float)
+        survey_elevations = array([row[3] if row[3] is not None else nan for row in point_rows], float)
+
+        dem_window, window_xmin, window_ymax, cell_width, cell_height = readRasterWindow(project_dem_path, point_x.min(), point_y.min(), point_x.max(), point_y.max())
+        dem_elevations = samplePoints(dem_window, point_x, point_y, window_xmin, window_ymax, cell_width, cell_height)
+        differences = survey_elevations - dem_elevations
+        valid = ~isnan(differences)
+        if not valid.any():
+            AddMsgAndPrint('\nNone of the survey points fall on DEM cells with data or have elevation values. Exiting...', 2, log_file_path)
+            exit()
+        # Outliers are judged on their residuals from a plane fit to the differences, so a tilt between the DEM and the survey is not mistaken for error
+        used = rejectSurfaceOutliers(point_x, point_y, differences) if correction_surface else valid
+
+        updates = dict(zip(point_ids, zip(dem_elevations, differences, used)))
+        fields = ['OID@', 'DEM_ELEV', 'DIFF', 'USED'] if correction_surface else ['OID@', 'DEM_ELEV', 'DIFF']
+        with UpdateCursor(temp_points, fields) as cursor:
+            for row in cursor:
+                dem_elevation, difference, point_used = updates[row[0]]
+                row[1] = None if isnan(dem_elevation) else round(float(dem_elevation), 1)
+                row[2] = None if isnan(difference) else round(float(difference), 1)
+                if correction_surface:
+                    row[3] = int(point_used)
+                cursor.updateRow(row)
+
+        AddMsgAndPrint(f"\tSampled {int(valid.sum())} of {len(point_ids)} survey points", log_file_path=log_file_path)
+        if correction_surface:
+            AddMsgAndPrint(f"\tRejected {int(valid.sum() - used.sum())} outlier point(s)", log_file_path=log_file_path)
+        elevation_adjustment = round(float(differences[used].mean()), 1)
 
         CopyFeatures(temp_points, survey_points)
 
@@ -123,17 +155,33 @@ try:
         exit()
 
     ### Adjust and Finalize DEM ###
-    if elevation_adjustment == 0:
+    if correction_surface and used is not None and used.sum() < 3:
+        AddMsgAndPrint(f"\nOnly {int(used.sum())} survey point(s) remain after outlier rejection; a {correction_surface} correction surface needs at least 3. Skipping the correction surface and applying the average difference instead.", 1, log_file_path)
+
+    if correction_surface and used is not None and used.sum() >= 3:
+        perf.stage(f"Adjusting DEM with {correction_surface} correction surface...")
+        AddMsgAndPrint(f"\nAdjusting DEM with {correction_surface} correction surface from {int(used.sum())} points...", log_file_path=log_file_path)
+        residual_x, residual_y, residuals = point_x[used], point_y[used], differences[used]
+        if correction_surface == 'TPS':
+            spline = fitThinPlateSpline(residual_x, residual_y, residuals, tps_smoothing)
+            surface_function = lambda x, y: thinPlateSurface(spline, x, y)
+        else:
+            surface_function = lambda x, y: idwSurface(residual_x, residual_y, residuals, x, y, idw_power)
+        dem_extent = dem_desc.extent
+        processRasterInBlocks(project_dem_path, adjusted_dem_path, lambda block, start: applyCorrectionBlock(
+            block, start, surface_function, dem_extent.XMin, dem_extent.YMax, dem_cell_size, dem_desc.meanCellHeight), halo=0)
+
+    elif elevation_adjustment == 0:
         AddMsgAndPrint('\nAverage elevation difference not greater than 0.1 feet. DEM will not be adjusted. Exiting...', 2, log_file_path)
         exit()
     else:
-        SetProgressorLabel(f"\nAdjusting DEM elevation by {elevation_adjustment} feet...")
+        perf.stage(f"Adjusting DEM elevation by {elevation_adjustment} feet...")
         AddMsgAndPrint(f"\nAdjusting DEM elevation by {elevation_adjustment} feet...", log_file_path=log_file_path)
         dem_plus = Plus(project_dem, elevation_adjustment)
         dem_plus.save(adjusted_dem_path)
 
     ### Add Output DEM to Map and Symbolize ###
-    SetProgressorLabel('Adding adjusted DEM to map...')
+    perf.stage('Adding adjusted DEM to map...')
     AddMsgAndPrint('\nAdding adjusted DEM to map...', log_file_path=log_file_path)
     map.addDataFromPath(adjusted_dem_path)
     dem_layer = map.listLayers(adjusted_dem_name)[0]
@@ -154,7 +202,7 @@ try:
 
     ### Compact Project GDB ###
     try:
-        SetProgressorLabel('Compacting project geodatabase...')
+        perf.stage('Compacting project geodatabase...')
         AddMsgAndPrint('\nCompacting project geodatabase...', log_file_path=log_file_path)
         Compact(project_gdb)
     except:
@@ -172,12 +220,5 @@ except:
         AddMsgAndPrint(errorMsg('Calibrate DEM to Field Survey'), 2)
 
 finally:
-    try:
-        Delete(temp_points)
-    except:
-        pass
-    try:
-        Delete(temp_stats)
-    except:
-        pass
-    emptyScratchGDB(scratch_gdb)
+    perf.finish()
+    scratch.cleanup()
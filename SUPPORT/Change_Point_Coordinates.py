@@ -4,17 +4,18 @@ from sys import argv, exit
 from time import ctime
 
 from arcpy import CheckExtension, CheckOutExtension, Describe, env, Exists, GetInstallInfo, GetParameter, \
-    GetParameterAsText, SetParameterAsText, SetProgressorLabel
+    GetParameterAsText, SetParameterAsText
 from arcpy.da import SearchCursor
 from arcpy.ddd import AddSurfaceInformation
-from arcpy.management import AddXY, CalculateField, Compact, CopyFeatures, CreateFolder, Delete, DeleteField, Project
+from arcpy.management import AddXY, CalculateField, Compact, CopyFeatures, CreateFolder, DeleteField, Project
 from arcpy.mp import ArcGISProject
 
-from utils import AddMsgAndPrint, emptyScratchGDB, errorMsg, removeMapLayers
+from scratch_manager import ScratchManager
+from utils import AddMsgAndPrint, errorMsg, projectLog, removeMapLayers, stageTimer
 
 
 def logBasicSettings(log_file_path, input_points, input_dem, elevation_units, output_sr, transformation, output_points_name, output_text):
-    with open (log_file_path, 'a+') as f:
+    with projectLog(log_file_path) as f:
         f.write('\n######################################################################\n')
         f.write('Executing Tool: Change Point Coordinates\n')
         f.write(f"Pro Version: {GetInstallInfo()['Version']}\n")
@@ -69,6 +70,7 @@ else:
 ### Set Paths and Variables ###
 support_dir = path.dirname(argv[0])
 scratch_gdb = path.join(support_dir, 'Scratch.gdb')
+scratch = ScratchManager(scratch_gdb)
 project_workspace = path.dirname(project_gdb)
 project_name = path.basename(project_workspace)
 log_file_path = path.join(project_workspace, f"{project_name}_log.txt")
@@ -76,7 +78,7 @@ gis_output_dir = path.join(project_workspace, 'GIS_Output')
 output_points_path = path.join(project_gdb, output_points_name)
 output_points_shp = path.join(gis_output_dir, f"{output_points_name}.shp")
 output_text_file = path.join(project_workspace, f"{output_points_name}.txt")
-points_temp = r"memory\Points_Temp"
+points_temp = scratch.name('Points_Temp')
 
 if Exists(output_points_path):
     AddMsgAndPrint(f"\nOutput Points name: {output_points_path} already exists in project geodatabase and will be overwritten...", 1)
@@ -93,13 +95,15 @@ if elevation_units == 'Meters':
 else:
     z_factor = 1
 
+perf = stageTimer('Change Point Coordinates', project_workspace)
+
 try:
     removeMapLayers(map, [output_points_name])
     logBasicSettings(log_file_path, input_points, input_dem, elevation_units, output_sr, transformation, output_points_name, output_text)
 
     ### Create GIS_Output Folder ###
     if not Exists(gis_output_dir):
-        SetProgressorLabel('Creating GIS_Output folder...')
+        perf.stage('Creating GIS_Output folder...')
         AddMsgAndPrint('\nCreating GIS_Output folder...', log_file_path=log_file_path)
         CreateFolder(project_workspace, 'GIS_Output')
 
@@ -124,7 +128,7 @@ try:
 
     ### Create Text File ###
     if output_text:
-        SetProgressorLabel('Creating output text file...')
+        perf.stage('Creating output text file...')
         AddMsgAndPrint('\nCreating output text file...', log_file_path=log_file_path)
 
         with open(output_text_file, 'w') as f:
@@ -139,7 +143,7 @@ try:
 
     ### Compact Project GDB ###
     try:
-        SetProgressorLabel('Compacting project geodatabase...')
+        perf.stage('Compacting project geodatabase...')
         AddMsgAndPrint('\nCompacting project geodatabase...', log_file_path=log_file_path)
         Compact(project_gdb)
     except:
@@ -157,8 +161,5 @@ except:
         AddMsgAndPrint(errorMsg('Change Point Coordinates'), 2)
 
 finally:
-    try:
-        Delete(points_temp)
-    except:
-        pass
-    emptyScratchGDB(scratch_gdb)
+    perf.finish()
+    scratch.cleanup()
@@ -3,16 +3,17 @@ from os import path
 from sys import argv, exit
 from time import ctime
 
-from arcpy import Describe, env, Exists, GetInstallInfo, GetParameterAsText, SetParameterAsText, SetProgressorLabel
+from arcpy import Describe, env, Exists, GetInstallInfo, GetParameterAsText, SetParameterAsText
 from arcpy.analysis import Clip
-from arcpy.management import Compact, Delete, Merge
+from arcpy.management import Compact, Merge
 from arcpy.mp import ArcGISProject
 
-from utils import AddMsgAndPrint, emptyScratchGDB, errorMsg, removeMapLayers
+from scratch_manager import ScratchManager
+from utils import AddMsgAndPrint, errorMsg, projectLog, removeMapLayers, stageTimer
 
 
 def logBasicSettings(log_file_path, project_aoi, input_datasets, output_name):
-    with open (log_file_path, 'a+') as f:
+    with projectLog(log_file_path) as f:
         f.write('\n######################################################################\n')
         f.write('Executing Tool: Combine Adjacent Datasets By AOI\n')
         f.write(f"Pro Version: {GetInstallInfo()['Version']}\n")
@@ -49,6 +50,7 @@ else:
 support_dir = path.dirname(argv[0])
 support_gdb = path.join(support_dir, 'Support.gdb')
 scratch_gdb = path.join(support_dir, 'Scratch.gdb')
+scratch = ScratchManager(scratch_gdb)
 project_workspace = path.dirname(project_gdb)
 project_name = path.basename(project_workspace)
 log_file_path = path.join(project_workspace, f"{project_name}_log.txt")
@@ -61,18 +63,20 @@ if Exists(output_merge_path):
 ### ESRI Environment Settings ###
 env.overwriteOutput = True
 
+perf = stageTimer('Combine Adjacent Datasets By AOI', project_workspace)
+
 try:
     removeMapLayers(map, [output_name])
     logBasicSettings(log_file_path, project_aoi, input_datasets, output_name)
 
     ### Clip Input Datasets ###
-    SetProgressorLabel('Clipping input data...')
+    perf.stage('Clipping input data...')
     AddMsgAndPrint('\nClipping input data...', log_file_path=log_file_path)
     dataset_count = len(input_datasets)
     x = 0
     while x < dataset_count:
         dataset = input_datasets[x].replace("'",'')
-        temp_clip = fr"memory\Clip_{x}"
+        temp_clip = scratch.name(f"Clip_{x}")
         Clip(dataset, project_aoi, temp_clip)
         if x == 0:
             merge_list = f"{temp_clip}"
@@ -81,18 +85,18 @@ try:
         x+=1
 
     ### Merge Clipped Datasets ###
-    SetProgressorLabel('Merging clipped data...')
+    perf.stage('Merging clipped data...')
     AddMsgAndPrint('\nMerging clipped data...', log_file_path=log_file_path)
     Merge(merge_list, output_merge_path)
 
     ### Add Outputs to Map ###
-    SetProgressorLabel('Adding output layers to map...')
+    perf.stage('Adding output layers to map...')
     AddMsgAndPrint('\nAdding output layers to map...', log_file_path=log_file_path)
     SetParameterAsText(3, output_merge_path)
 
     ### Compact Project GDB ###
     try:
-        SetProgressorLabel('Compacting project geodatabase...')
+        perf.stage('Compacting project geodatabase...')
         AddMsgAndPrint('\nCompacting project geodatabase...', log_file_path=log_file_path)
         Compact(project_gdb)
     except:
@@ -110,8 +114,5 @@ except:
         AddMsgAndPrint(errorMsg('Combine Adjacent Datasets By AOI'), 2)
 
 finally:
-    try:
-        Delete(temp_clip)
-    except:
-        pass
-    emptyScratchGDB(scratch_gdb)  
+    perf.finish()
+    scratch.cleanup()
@@ -3,16 +3,16 @@ from os import path
 from sys import exit
 from time import ctime
 
-from arcpy import CheckExtension, CheckOutExtension, Describe, env, Exists, GetInstallInfo, GetParameterAsText, SetProgressorLabel
+from arcpy import CheckExtension, CheckOutExtension, Describe, env, Exists, GetInstallInfo, GetParameterAsText
 from arcpy.management import Compact
 from arcpy.mp import ArcGISProject
 from arcpy.sa import Con, Divide, Ln, Plus, Raster, Slope, Tan, Times
 
-from utils import AddMsgAndPrint, errorMsg, removeMapLayers
+from utils import AddMsgAndPrint, errorMsg, projectLog, removeMapLayers, stageTimer
 
 
 def logBasicSettings(log_file_path, project_dem):
-    with open (log_file_path, 'a+') as f:
+    with projectLog(log_file_path) as f:
         f.write('\n######################################################################\n')
         f.write('Executing Tool: Compound Topographic Index (CTI)\n')
         f.write(f"Pro Version: {GetInstallInfo()['Version']}\n")
@@ -72,6 +72,8 @@ env.cellSize = dem_cell_size
 env.snapRaster = project_dem_path
 env.outputCoordinateSystem = dem_desc.spatialReference
 
+perf = stageTimer('Compound Topographic Index (CTI)', project_workspace, project_dem_path)
+
 try:
     removeMapLayers(map, [output_cti_name])
     logBasicSettings(log_file_path, project_dem)
@@ -81,7 +83,7 @@ try:
     # a represents the catchment area per pixel
     # ß refers to the slope, in degrees
     # Final equation is Ln (As / tan ß)
-    SetProgressorLabel('Computing Compound Topographic Index...')
+    perf.stage('Computing Compound Topographic Index...')
     AddMsgAndPrint('\nComputing Compound Topographic Index...', log_file_path=log_file_path)
 
     # In the above equation, a needs to be converted to As so as to account for DEM resolution
@@ -105,7 +107,7 @@ try:
     natural_log.save(output_cti_path)
 
     ### Add Output CTI to Map and Symbolize ###
-    SetProgressorLabel('Adding CTI layer to map...')
+    perf.stage('Adding CTI layer to map...')
     AddMsgAndPrint('\nAdding CTI layer to map...', log_file_path=log_file_path)
     map.addDataFromPath(output_cti_path)
     cti_layer = map.listLayers(output_cti_name)[0]
@@ -118,7 +120,7 @@ try:
 
     ### Compact Project GDB ###
     try:
-        SetProgressorLabel('Compacting project geodatabase...')
+        perf.stage('Compacting project geodatabase...')
         AddMsgAndPrint('\nCompacting project geodatabase...', log_file_path=log_file_path)
         Compact(project_gdb)
     except:
@@ -134,3 +136,6 @@ except:
         AddMsgAndPrint(errorMsg('Compound Topographic Index (CTI)'), 2, log_file_path)
     except:
         AddMsgAndPrint(errorMsg('Compound Topographic Index (CTI)'), 2)
+
+finally:
+    perf.finish()
@@ -3,15 +3,14 @@ from os import path
 from sys import argv, exit
 from time import ctime
 
-from arcpy import Describe, env, Exists, GetInstallInfo, GetParameterAsText, SetParameterAsText, SetProgressorLabel
+from arcpy import Describe, env, Exists, GetInstallInfo, GetParameterAsText, SetParameterAsText
 from arcpy.management import Append, CalculateField, Compact, CreateFeatureclass, GetCount, MakeFeatureLayer
-from arcpy.mp import ArcGISProject
 
-from utils import AddMsgAndPrint, errorMsg, removeMapLayers
+from utils import AddMsgAndPrint, engineeringProject, errorMsg, projectLog, removeMapLayers, stageTimer
 
 
 def logBasicSettings(log_file_path, project_workspace):
-    with open (log_file_path, 'a+') as f:
+    with projectLog(log_file_path) as f:
         f.write('\n######################################################################\n')
         f.write('Executing Tool: Create AOI\n')
         f.write(f"Pro Version: {GetInstallInfo()['Version']}\n")
@@ -23,8 +22,7 @@ def logBasicSettings(log_file_path, project_workspace):
 
 ### Initial Tool Validation ###
 try:
-    aprx = ArcGISProject('CURRENT')
-    map = aprx.listMaps('Engineering')[0]
+    aprx, map = engineeringProject()
 except:
     AddMsgAndPrint('\nThis tool must be run from an ArcGIS Pro project template distributed with the Engineering Tools. Exiting...', 2)
     exit()
@@ -59,6 +57,8 @@ project_sr = Describe(fd_path).spatialReference
 env.outputCoordinateSystem = project_sr
 env.overwriteOutput = True
 
+perf = stageTimer('Create AOI', project_workspace)
+
 try:
     removeMapLayers(map, [output_aoi_name])
     logBasicSettings(log_file_path, project_workspace)
@@ -70,7 +70,7 @@ try:
 
     ### Create New AOI Layer from Input ###
     if input_aoi_path != output_aoi_path:
-        SetProgressorLabel('Creating new project AOI layer...')
+        perf.stage('Creating new project AOI layer...')
         AddMsgAndPrint('\nCreating new project AOI layer...', log_file_path=log_file_path)
         # Create new feature class using template_aoi
         CreateFeatureclass(fd_path, output_aoi_name, 'POLYGON', template_aoi)
@@ -81,12 +81,12 @@ try:
         AddMsgAndPrint('\nExisting project AOI layer used as input...', log_file_path=log_file_path)
 
     ### Calculate Area (Acres Intl) ###
-    SetProgressorLabel('Calculating acres...')
+    perf.stage('Calculating acres...')
     AddMsgAndPrint('\nCalculating acres...', log_file_path=log_file_path)
     CalculateField(output_aoi_path, 'acres_intl', "!shape!.getArea('PLANAR', 'ACRES')", 'Python')
 
     ### Add AOI Layer to Map ###
-    SetProgressorLabel('Adding AOI layer to the map...')
+    perf.stage('Adding AOI layer to the map...')
     AddMsgAndPrint('\nAdding AOI layer to the map...', log_file_path=log_file_path)
     SetParameterAsText(2, output_aoi_path)
 
@@ -98,7 +98,7 @@ try:
 
     ### Compact Project GDB ###
     try:
-        SetProgressorLabel('Compacting project geodatabase...')
+        perf.stage('Compacting project geodatabase...')
         AddMsgAndPrint('\nCompacting project geodatabase...', log_file_path=log_file_path)
         Compact(gdb_path)
     except:
@@ -114,3 +114,6 @@ except:
         AddMsgAndPrint(errorMsg('Create AOI'), 2, log_file_path)
     except:
         AddMsgAndPrint(errorMsg('Create AOI'), 2)
+
+finally:
+    perf.finish()
@@ -3,18 +3,19 @@ from os import path
 from sys import argv
 from time import ctime
 
-from arcpy import CheckExtension, CheckOutExtension, Describe, env, GetInstallInfo, GetParameterAsText, \
-    SetParameterAsText, SetProgressorLabel
-from arcpy.management import AddField, CalculateField, Compact, CopyFeatures, Delete, DeleteField, MakeFeatureLayer, \
-    SelectLayerByAttribute
+from arcpy import Describe, env, GetInstallInfo, GetParameterAsText, \
+    SetParameterAsText
+from arcpy.management import Compact
 from arcpy.mp import ArcGISProject
-from arcpy.sa import Contour
 
-from utils import AddMsgAndPrint, emptyScratchGDB, errorMsg, removeMapLayers
+from provenance_io import provenanceStore
+from raster_io import createContours
+from scratch_manager import ScratchManager
+from utils import AddMsgAndPrint, errorMsg, projectLog, removeMapLayers, stageTimer
 
 
 def logBasicSettings(log_file_path, project_dem, contour_interval):
-    with open (log_file_path, 'a+') as f:
+    with projectLog(log_file_path) as f:
         f.write('\n######################################################################\n')
         f.write('Executing Tool: Create Contours\n')
         f.write(f"Pro Version: {GetInstallInfo()['Version']}\n")
@@ -33,12 +34,6 @@ except:
     AddMsgAndPrint('\nThis tool must be run from an ArcGIS Pro project template distributed with the Engineering Tools. Exiting!', 2)
     exit()
 
-if CheckExtension('Spatial') == 'Available':
-    CheckOutExtension('Spatial')
-else:
-    AddMsgAndPrint('\nSpatial Analyst Extension not enabled. Please enable Spatial Analyst from Project, Licensing, Configure licensing options. Exiting...', 2)
-    exit()
-
 ### ESRI Environment Settings ###
 env.overwriteOutput = True
 env.resamplingMethod = 'BILINEAR'
@@ -64,52 +59,41 @@ if not 0 < float(contour_interval) <= 1000:
 ### Set Paths and Variables ###
 support_dir = path.dirname(argv[0])
 scratch_gdb = path.join(support_dir, 'Scratch.gdb')
+scratch = ScratchManager(scratch_gdb)
 project_workspace = path.dirname(project_gdb)
 project_name = path.basename(project_workspace)
 log_file_path = path.join(project_workspace, f"{project_name}_log.txt")
-temp_contour_path = r"memory\temp_contour"
+provenance = provenanceStore(project_workspace)
 contour_name = f"{project_name}_Contour_{contour_interval.replace('.','_dot_')}"
 contour_path = path.join(project_gdb, 'Layers', contour_name)
 
+perf = stageTimer('Create Contours', project_workspace, project_dem_path)
+
 try:
     removeMapLayers(map, [contour_name])
     logBasicSettings(log_file_path, project_dem, contour_interval)
 
-    ### Create Contours ###
-    SetProgressorLabel('Creating temporary contours layer...')
-    AddMsgAndPrint('\nCreating temporary contours layer...', log_file_path=log_file_path)
-    Contour(project_dem, temp_contour_path, contour_interval)
-
-    ### Add Index Field ###
-    DeleteField(temp_contour_path, 'Id')
-    AddField(temp_contour_path, 'Index', 'DOUBLE')
-
-    ### Update Every 5th Index to 1 ###
-    SetProgressorLabel('Updating contour indexing...')
-    AddMsgAndPrint('\nUpdating contour indexing...', log_file_path=log_file_path)
-    MakeFeatureLayer(temp_contour_path, 'contour_lyr')
-    expression = "MOD( \"CONTOUR\"," + str(float(contour_interval) * 5) + ") = 0"
-    SelectLayerByAttribute('contour_lyr', 'NEW_SELECTION', expression)
-    CalculateField('contour_lyr', 'Index', 1, 'PYTHON3')
-
-    ### Update All Other Indexes to 0 ###
-    SelectLayerByAttribute('contour_lyr', 'SWITCH_SELECTION')
-    CalculateField('contour_lyr', 'Index', 0, 'PYTHON3')
-
-    ### Copy Final Contour Output ###
-    SetProgressorLabel('Finalizing contour layer...')
-    AddMsgAndPrint('\nFinalizing lontour layer...', log_file_path=log_file_path)
-    SelectLayerByAttribute('contour_lyr', 'CLEAR_SELECTION')
-    CopyFeatures('contour_lyr', contour_path)
+    ### Create Contours Unless Current for the DEM ###
+    perf.stage('Checking for current contours...')
+    contour_key = provenance.key({'dem': project_dem_path}, {'interval': float(contour_interval)})
+    if provenance.current([contour_path], contour_key):
+        AddMsgAndPrint('\nDEM is unchanged; using existing contours...', log_file_path=log_file_path)
+    else:
+        provenance.forget([contour_path])
+        perf.stage('Creating contours...')
+        AddMsgAndPrint('\nCreating contours...', log_file_path=log_file_path)
+        contour_count = createContours(project_dem_path, contour_path, float(contour_interval))
+        AddMsgAndPrint(f"\tCreated {contour_count} contour lines", log_file_path=log_file_path)
+        provenance.record([contour_path], contour_key, 'Create Contours')
 
     ### Add Output to Map ###
     AddMsgAndPrint('\nAdding to map...', log_file_path=log_file_path)
-    SetProgressorLabel('Adding to map...')
+    perf.stage('Adding to map...')
     SetParameterAsText(2, contour_path)
 
     ### Compact Project GDB ###
     try:
-        SetProgressorLabel('Compacting project geodatabase...')
+        perf.stage('Compacting project geodatabase...')
         AddMsgAndPrint('\nCompacting project geodatabase...', log_file_path=log_file_path)
         Compact(project_gdb)
     except:
@@ -127,8 +111,5 @@ except:
         AddMsgAndPrint(errorMsg('Create Contours'), 2)
 
 finally:
-    try:
-        Delete(temp_contour_path)
-    except:
-        pass
-    emptyScratchGDB(scratch_gdb)
+    perf.finish()
+    scratch.cleanup()
@@ -3,16 +3,18 @@ from os import path
 from sys import argv
 from time import ctime
 
-from arcpy import CheckExtension, CheckOutExtension, Describe, env, GetInstallInfo, GetParameterAsText, SetProgressorLabel
+from arcpy import CheckExtension, CheckOutExtension, Describe, env, Exists, GetInstallInfo, GetParameterAsText
 from arcpy.management import Clip, Compact, CopyRaster, Delete, MosaicToNewRaster, Project, ProjectRaster
-from arcpy.mp import ArcGISProject
-from arcpy.sa import ExtractByMask, Fill, FocalStatistics, Times
+from arcpy.sa import ExtractByMask, Fill, Times
 
-from utils import AddMsgAndPrint, emptyScratchGDB, errorMsg, removeMapLayers
+from dem_processing import finalizeDEMBlock
+from raster_io import clipServiceWithCache, processRasterInBlocks
+from scratch_manager import ScratchManager
+from utils import AddMsgAndPrint, engineeringProject, errorMsg, isHeadless, projectLog, removeMapLayers, stageTimer
 
 
-def logBasicSettings(log_file_path, project_workspace, dem_format, input_z_units, input_dem_sr, output_sr, cell_size):
-    with open (log_file_path, 'a+') as f:
+def logBasicSettings(log_file_path, project_workspace, dem_format, input_z_units, input_dem_sr, output_sr, cell_size, keep_extracted_dem, use_tile_cache):
+    with projectLog(log_file_path) as f:
         f.write('\n######################################################################\n')
         f.write('Executing Tool: Create DEM\n')
         f.write(f"Pro Version: {GetInstallInfo()['Version']}\n")
@@ -25,12 +27,13 @@ def logBasicSettings(log_file_path, project_workspace, dem_format, input_z_units
         f.write(f"\tInput DEM Spatial Reference: {input_dem_sr}\n")
         f.write(f"\tOutput DEM Spatial Reference: {output_sr}\n")
         f.write(f"\tOutput DEM Cell Size: {cell_size}\n")
+        f.write(f"\tKeep Extracted DEM: {keep_extracted_dem}\n")
+        f.write(f"\tUse Tile Cache: {use_tile_cache}\n")
 
 
 ### Initial Tool Validation ###
 try:
-    aprx = ArcGISProject('CURRENT')
-    map = aprx.listMaps('Engineering')[0]
+    aprx, map = engineeringProject()
 except:
     AddMsgAndPrint('\nThis tool must be run from an ArcGIS Pro project template distributed with the Engineering Tools. Exiting!', 2)
     exit()
@@ -52,6 +55,10 @@ input_z_units = GetParameterAsText(6)
 input_dem_sr = GetParameterAsText(7)
 output_sr = GetParameterAsText(8)
 transformation = GetParameterAsText(9)
+# Keep the non-smoothed DEM (in feet) used by the Topographic Position Index tool; kept unless unchecked
+keep_extracted_dem = GetParameterAsText(10).lower() != 'false'
+# Reuse image service tiles from the local cache (see tile_cache.py) instead of downloading every run; used unless unchecked
+use_tile_cache = GetParameterAsText(11).lower() != 'false'
 
 ### Locate Project GDB ###
 project_aoi_path = Describe(project_aoi).CatalogPath
@@ -64,6 +71,7 @@ else:
 ### Set Paths and Variables ###
 support_dir = path.dirname(argv[0])
 scratch_gdb = path.join(support_dir, 'Scratch.gdb')
+scratch = ScratchManager(scratch_gdb)
 project_workspace = path.dirname(project_gdb)
 project_name = path.basename(project_workspace)
 log_file_path = path.join(project_workspace, f"{project_name}_log.txt")
@@ -71,9 +79,9 @@ extracted_dem_name = f"{project_name}_DEM_extract"
 extracted_dem_path = path.join(project_gdb, extracted_dem_name)
 project_dem_name = f"{project_name}_DEM"
 project_dem_path = path.join(project_gdb, project_dem_name)
-temp_aoi = r"memory\temp_aoi"   # CHANGED: was path.join(scratch_gdb, 'temp_aoi')
-clipped_dem = r"memory\clipped_dem"   # CHANGED: was path.join(scratch_gdb, 'clipped_dem')
-temp_dem = path.join(scratch_gdb, 'temp_dem')
+temp_aoi = scratch.name('temp_aoi')
+clipped_dem = scratch.name('clipped_dem')
+temp_dem = scratch.name('temp_dem', in_gdb=True)
 
 ### ESRI Environment Settings ###
 env.overwriteOutput = True
@@ -108,10 +116,11 @@ elif input_z_units == 'US Survey Feet':
 elif input_z_units == 'US Survey Inches':
     z_factor = 12.000002400
 
+perf = stageTimer('Create DEM', project_workspace, project_dem_path)
+
 try:
-    emptyScratchGDB(scratch_gdb)
     removeMapLayers(map, [project_dem_name])
-    logBasicSettings(log_file_path, project_workspace, dem_format, input_z_units, input_dem_sr, output_sr, cell_size)
+    logBasicSettings(log_file_path, project_workspace, dem_format, input_z_units, input_dem_sr, output_sr, cell_size, keep_extracted_dem, use_tile_cache)
 
     ### Image Service Extract ###
     if dem_format in ['NRCS Image Service', 'External Image Service']:
@@ -119,7 +128,7 @@ try:
             AddMsgAndPrint('\nAn output DEM cell size was not specified. Exiting...', 2, log_file_path)
             exit()
         else:
-            SetProgressorLabel('Projecting project AOI to match input DEM...')
+            perf.stage('Projecting project AOI to match input DEM...')
             AddMsgAndPrint('\nProjecting project AOI to match input DEM...', log_file_path=log_file_path)
 
             try:
@@ -129,18 +138,25 @@ try:
 
             Project(project_aoi, temp_aoi, input_dem_sr)
 
-            SetProgressorLabel('Downloading DEM data...')
+            perf.stage('Downloading DEM data...')
             AddMsgAndPrint('\nDownloading DEM data...', log_file_path=log_file_path)
-            aoi_ext = Describe(temp_aoi).extent
-            clip_ext = f"{str(aoi_ext.XMin)} {str(aoi_ext.YMin)} {str(aoi_ext.XMax)} {str(aoi_ext.YMax)}"
-            Clip(sourceService, clip_ext, clipped_dem, '', '', '', 'NO_MAINTAIN_EXTENT')
+            aoi_desc = Describe(temp_aoi)
+            if use_tile_cache:
+                source_id = nrcs_service if dem_format == 'NRCS Image Service' else external_service
+                downloaded, reused = clipServiceWithCache(sourceService, source_id, aoi_desc.extent, aoi_desc.spatialReference,
+                                                          clipped_dem, scratch)
+                AddMsgAndPrint(f"\tDownloaded {downloaded} tile(s), reused {reused} cached tile(s)", log_file_path=log_file_path)
+            else:
+                aoi_ext = aoi_desc.extent
+                clip_ext = f"{str(aoi_ext.XMin)} {str(aoi_ext.YMin)} {str(aoi_ext.XMax)} {str(aoi_ext.YMax)}"
+                Clip(sourceService, clip_ext, clipped_dem, '', '', '', 'NO_MAINTAIN_EXTENT')
 
             try:
                 Delete(temp_aoi)  # free memory after extent is obtained
             except:
                 pass
 
-            SetProgressorLabel('Projecting downloaded DEM...')
+            perf.stage('Projecting downloaded DEM...')
             AddMsgAndPrint('\nProjecting downloaded DEM...', log_file_path=log_file_path)
             ProjectRaster(clipped_dem, temp_dem, output_sr, 'BILINEAR', cell_size)
 
@@ -151,7 +167,7 @@ try:
         if transformation != '':
             env.geographicTransformations = transformation
 
-        SetProgressorLabel('Extracting input DEM(s)...')
+        perf.stage('Extracting input DEM(s)...')
         AddMsgAndPrint('\nExtracting input DEM(s)...', log_file_path=log_file_path)
         x = 0
         dem_list = []
@@ -170,7 +186,7 @@ try:
             else:
                 AddMsgAndPrint('\nHorizontal units of one or more input DEMs do not appear to be feet or meters! Exiting...', 2, log_file_path)
                 exit()
-            out_clip = fr"memory\temp_dem_{str(x)}"   # CHANGED: was f"{temp_dem}_{str(x)}"
+            out_clip = scratch.name(f"temp_dem_{str(x)}")
             try:
                 extracted_dem = ExtractByMask(raster_path, project_aoi)
                 extracted_dem.save(out_clip)
@@ -195,15 +211,15 @@ try:
 
         # Merge the DEMs
         if dem_count > 1:
-            SetProgressorLabel('Merging multiple input DEM(s)...')
+            perf.stage('Merging multiple input DEM(s)...')
             AddMsgAndPrint('\nMerging multiple input DEM(s)...', log_file_path=log_file_path)
-            MosaicToNewRaster(mosaic_inputs, scratch_gdb, temp_dem, '#', '32_BIT_FLOAT', cellsize, '1', 'MEAN', '#')
+            MosaicToNewRaster(mosaic_inputs, path.dirname(temp_dem), path.basename(temp_dem), '#', '32_BIT_FLOAT', cellsize, '1', 'MEAN', '#')
         else:
             AddMsgAndPrint('\nOnly one input DEM detected. Carrying extract forward for final DEM processing...', log_file_path=log_file_path)
             CopyRaster(dem_list[0], temp_dem)
 
         # Delete clipped DEM files
-        SetProgressorLabel('Deleting temp DEM file(s)...')
+        perf.stage('Deleting temp DEM file(s)...')
         AddMsgAndPrint('\nDeleting temp DEM file(s)...', log_file_path=log_file_path)
         for raster in dem_list:
             Delete(raster)
@@ -221,40 +237,52 @@ try:
         exit()
 
     ### Convert DEM Values to International Feet ###
-    SetProgressorLabel('Converting DEM elevation values to feet...')
-    AddMsgAndPrint('\nConverting DEM elevation values to feet...', log_file_path=log_file_path)
-    output_ft_dem = Times(temp_dem, z_factor)
-    output_ft_dem.save(extracted_dem_path)
+    if keep_extracted_dem:
+        perf.stage('Converting DEM elevation values to feet...')
+        AddMsgAndPrint('\nConverting DEM elevation values to feet...', log_file_path=log_file_path)
+        output_ft_dem = Times(temp_dem, z_factor)
+        output_ft_dem.save(extracted_dem_path)
+        fill_input = extracted_dem_path
+        fill_z_limit = 0.25
+        block_z_factor = 1
+    else:
+        # Remove a stale extract from a previous run so it is not mistaken for this DEM
+        if Exists(extracted_dem_path):
+            Delete(extracted_dem_path)
+        # Fill is scale invariant, so fill in source units with the z-limit scaled and convert while smoothing
+        fill_input = temp_dem
+        fill_z_limit = 0.25 / z_factor
+        block_z_factor = z_factor
 
     ### Finalize DEM ###
-    SetProgressorLabel('Finalizing DEM...')
+    perf.stage('Finalizing DEM...')
     AddMsgAndPrint('\nFinalizing DEM...', log_file_path=log_file_path)
-    output_fill_dem = Fill(extracted_dem_path, 0.25)
-    output_focal_stats = FocalStatistics(output_fill_dem, 'RECTANGLE 3 3 CELL', 'MEAN', 'DATA')
-    output_focal_stats.save(project_dem_path)
+    output_fill_dem = Fill(fill_input, fill_z_limit)
+    processRasterInBlocks(output_fill_dem, project_dem_path, lambda block, start: finalizeDEMBlock(block, block_z_factor))
 
     ### Add Output DEM to Map and Symbolize ###
-    SetProgressorLabel('Adding DEM to map...')
-    AddMsgAndPrint('\nAdding DEM to map...', log_file_path=log_file_path)
-    map.addDataFromPath(project_dem_path)
-    dem_layer = map.listLayers(project_dem_name)[0]
-    sym = dem_layer.symbology
-    sym.colorizer.resamplingType = 'Bilinear' #NOTE: Pro does not seem to honor this
-    sym.colorizer.stretchType = 'StandardDeviation'
-    sym.colorizer.standardDeviation = 2.5
-    sym.colorizer.colorRamp = aprx.listColorRamps('Elevation #1')[0]
-    dem_layer.symbology = sym
-
-    ### Update Layer Order in TOC ###
-    if map.listLayers()[0].supports("NAME"):
-        if map.listLayers()[0].name == project_dem_name:
-            SetProgressorLabel('Updating layer order...')
-            AddMsgAndPrint('\nUpdating layer order...', log_file_path=log_file_path)
-            map.moveLayer(map.listLayers()[1], dem_layer, 'AFTER')
+    if not isHeadless():
+        perf.stage('Adding DEM to map...')
+        AddMsgAndPrint('\nAdding DEM to map...', log_file_path=log_file_path)
+        map.addDataFromPath(project_dem_path)
+        dem_layer = map.listLayers(project_dem_name)[0]
+        sym = dem_layer.symbology
+        sym.colorizer.resamplingType = 'Bilinear' #NOTE: Pro does not seem to honor this
+        sym.colorizer.stretchType = 'StandardDeviation'
+        sym.colorizer.standardDeviation = 2.5
+        sym.colorizer.colorRamp = aprx.listColorRamps('Elevation #1')[0]
+        dem_layer.symbology = sym
+
+        ### Update Layer Order in TOC ###
+        if map.listLayers()[0].supports("NAME"):
+            if map.listLayers()[0].name == project_dem_name:
+                perf.stage('Updating layer order...')
+                AddMsgAndPrint('\nUpdating layer order...', log_file_path=log_file_path)
+                map.moveLayer(map.listLayers()[1], dem_layer, 'AFTER')
 
     ### Compact Project GDB ###
     try:
-        SetProgressorLabel('Compacting project geodatabase...')
+        perf.stage('Compacting project geodatabase...')
         AddMsgAndPrint('\nCompacting project geodatabase...', log_file_path=log_file_path)
         Compact(project_gdb)
     except:
@@ -272,4 +300,5 @@ except:
         AddMsgAndPrint(errorMsg('Create DEM'), 2)
 
 finally:
-    emptyScratchGDB(scratch_gdb)
+    perf.finish()
+    scratch.cleanup()
@@ -4,16 +4,17 @@ from sys import argv, exit
 from time import ctime
 
 from arcpy import CheckExtension, CheckOutExtension, Describe, env, GetInstallInfo, GetParameterAsText, \
-    GetParameter, SetParameterAsText, SetProgressorLabel
+    GetParameter, SetParameterAsText
 from arcpy.management import Compact
 from arcpy.mp import ArcGISProject
 from arcpy.sa import Con, Fill, Hillshade, Minus, Slope
 
-from utils import AddMsgAndPrint, errorMsg, removeMapLayers
+from provenance_io import provenanceStore
+from utils import AddMsgAndPrint, errorMsg, projectLog, removeMapLayers, stageTimer
 
 
 def logBasicSettings(log_file_path, project_dem, create_hillshade, create_slope, create_depth_grid):
-    with open (log_file_path, 'a+') as f:
+    with projectLog(log_file_path) as f:
         f.write('\n######################################################################\n')
         f.write('Executing Tool: Create Hillshade, Slope, Depth Grid\n')
         f.write(f"Pro Version: {GetInstallInfo()['Version']}\n")
@@ -71,6 +72,9 @@ slope_path = path.join(project_gdb, slope_name)
 depth_grid_name = f"{project_name}_DepthGrid"
 depth_grid_path = path.join(project_gdb, depth_grid_name)
 z_factor = 0.3048 # Intl Feet to Meters
+provenance = provenanceStore(project_workspace)
+
+perf = stageTimer('Create Hillshade, Slope, Depth Grid', project_workspace, project_dem_path)
 
 try:
     remove_layers = []
@@ -82,21 +86,28 @@ try:
 
     if create_hillshade:
         ### Create Hillshade ###
-        SetProgressorLabel('Creating Hillshade...')
+        perf.stage('Creating Hillshade...')
         AddMsgAndPrint('\nCreating Hillshade...', log_file_path=log_file_path)
         output_hillshade = Hillshade(project_dem, '315', '45', 'NO_SHADOWS', z_factor)
         output_hillshade.save(hillshade_path)
 
     if create_slope:
-        ### Create Slope ###
-        SetProgressorLabel('Creating Slope...')
-        AddMsgAndPrint('\nCreating Slope...', log_file_path=log_file_path)
-        output_slope = Slope(project_dem, 'PERCENT_RISE', z_factor)
-        output_slope.save(slope_path)
+        ### Create Slope Unless Current for the DEM ###
+        perf.stage('Checking for current Slope...')
+        slope_key = provenance.key({'dem': project_dem_path}, {'measurement': 'PERCENT_RISE', 'z_factor': z_factor})
+        if provenance.current([slope_path], slope_key):
+            AddMsgAndPrint('\nDEM is unchanged; using existing Slope...', log_file_path=log_file_path)
+        else:
+            provenance.forget([slope_path])
+            perf.stage('Creating Slope...')
+            AddMsgAndPrint('\nCreating Slope...', log_file_path=log_file_path)
+            output_slope = Slope(project_dem, 'PERCENT_RISE', z_factor)
+            output_slope.save(slope_path)
+            provenance.record([slope_path], slope_key, 'Create Hillshade, Slope, Depth Grid')
 
     if create_depth_grid:
         ### Create Depth Grid ###
-        SetProgressorLabel('Creating Depth Grid...')
+        perf.stage('Creating Depth Grid...')
         AddMsgAndPrint('\nCreating Depth Grid...', log_file_path=log_file_path)
         output_fill = Fill(project_dem)
         output_minus = Minus(output_fill, project_dem)
@@ -104,7 +115,7 @@ try:
         output_depth_grid.save(depth_grid_path)
 
     ### Add Outputs to Map ###
-    SetProgressorLabel('Adding outputs to map...')
+    perf.stage('Adding outputs to map...')
     AddMsgAndPrint('\nAdding outputs to map...', log_file_path=log_file_path)
     if create_slope: SetParameterAsText(4, slope_path)
     if create_hillshade: SetParameterAsText(5, hillshade_path)
@@ -112,7 +123,7 @@ try:
 
     ### Compact Project GDB ###
     try:
-        SetProgressorLabel('Compacting project geodatabase...')
+        perf.stage('Compacting project geodatabase...')
         AddMsgAndPrint('\nCompacting project geodatabase...', log_file_path=log_file_path)
         Compact(project_gdb)
     except:
@@ -128,3 +139,6 @@ except:
         AddMsgAndPrint(errorMsg('Create Hillshade, Slope, Depth Grid'), 2, log_file_path)
     except:
         AddMsgAndPrint(errorMsg('Create Hillshade, Slope, Depth Grid'), 2)
+
+finally:
+    perf.finish()
@@ -3,7 +3,7 @@ from os import path
 from sys import argv, exit
 from time import ctime
 
-from arcpy import CheckExtension, CheckOutExtension, Describe, env, Exists, GetInstallInfo, GetParameterAsText, SetParameterAsText, SetProgressorLabel
+from arcpy import CheckExtension, CheckOutExtension, Describe, env, Exists, GetInstallInfo, GetParameterAsText, SetParameterAsText
 from arcpy.conversion import RasterToPolygon
 from arcpy.da import SearchCursor
 from arcpy.ddd import SurfaceVolume
@@ -11,11 +11,12 @@ from arcpy.management import AddField, CalculateField, Compact, Delete, Dissolve
 from arcpy.mp import ArcGISProject
 from arcpy.sa import ExtractByMask, Int, SetNull, Times
 
-from utils import AddMsgAndPrint, emptyScratchGDB, errorMsg, removeMapLayers
+from scratch_manager import ScratchManager
+from utils import AddMsgAndPrint, errorMsg, projectLog, removeMapLayers, stageTimer
 
 
 def logBasicSettings(log_file_path, project_dem, input_pool, pool_elevation):
-    with open (log_file_path, 'a+') as f:
+    with projectLog(log_file_path) as f:
         f.write('\n######################################################################\n')
         f.write('Executing Tool: Create Pool at Specified Elevation\n')
         f.write(f"Pro Version: {GetInstallInfo()['Version']}\n")
@@ -67,13 +68,14 @@ if int(GetCount(input_pool).getOutput(0)) > 1:
 ### Set Paths and Variables ###
 support_dir = path.dirname(argv[0])
 scratch_gdb = path.join(support_dir, 'Scratch.gdb')
+scratch = ScratchManager(scratch_gdb)
 project_workspace = path.dirname(project_gdb)
 project_name = path.basename(project_workspace)
 log_file_path = path.join(project_workspace, f"{project_name}_log.txt")
 project_fd = path.join(project_gdb, 'Layers')
 input_pool_name = path.splitext(path.basename(input_pool))[0]
 storage_table_temp = path.join(project_workspace, f"{input_pool_name}_StorageCSV.txt")
-temp_pool = r'memory\Temp_Pool'
+temp_pool = scratch.name('Temp_Pool')
 
 # Include Subbasin number in output names if input polygon is Watershed layer
 try:
@@ -102,12 +104,14 @@ to_acre_foot = 1233.48184
 to_cubic_meters = 1
 to_cubic_feet = 35.3147
 
+perf = stageTimer('Create Pool At Specified Elevation', project_workspace, project_dem_path)
+
 try:
     removeMapLayers(map, [output_pool_name])
     logBasicSettings(log_file_path, project_dem, input_pool, pool_elevation)
 
     ### Clip DEM to Input Polygon and get Min/Max ###
-    SetProgressorLabel('Clipping DEM to input pool polygon...')
+    perf.stage('Clipping DEM to input pool polygon...')
     AddMsgAndPrint('\nClipping DEM to input pool polygon...', log_file_path=log_file_path)
     temp_dem = ExtractByMask(project_dem, input_pool)
     temp_dem_min = round(float(GetRasterProperties(temp_dem, 'MINIMUM').getOutput(0)),1)
@@ -125,7 +129,7 @@ try:
         Delete(storage_table_temp)
 
     ### Calculate Volume and Surface Area ###
-    SetProgressorLabel(f"Processing elevation {pool_elevation_meters}...")
+    perf.stage(f"Processing elevation {pool_elevation_meters}...")
     AddMsgAndPrint(f"\nProcessing elevation {pool_elevation_meters}...", log_file_path=log_file_path)
     SurfaceVolume(temp_dem_meters, storage_table_temp, 'BELOW', pool_elevation_meters, '1')
 
@@ -189,7 +193,7 @@ try:
 
     ### Compact Project GDB ###
     try:
-        SetProgressorLabel('Compacting project geodatabase...')
+        perf.stage('Compacting project geodatabase...')
         AddMsgAndPrint('\nCompacting project geodatabase...', log_file_path=log_file_path)
         Compact(project_gdb)
     except:
@@ -207,11 +211,5 @@ except:
         AddMsgAndPrint(errorMsg('Create Pool At Specified Elevation'), 2)
 
 finally:
-    try:
-        if Exists(temp_pool):
-            Delete(temp_pool)
-    except:
-        pass
-
-    emptyScratchGDB(scratch_gdb)
-
+    perf.finish()
+    scratch.cleanup()
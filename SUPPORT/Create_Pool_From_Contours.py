@@ -4,7 +4,7 @@ from sys import argv, exit
 from time import ctime
 
 from arcpy import CheckExtension, CheckOutExtension, Describe, env, Exists, GetInstallInfo, GetParameterAsText, \
-    SetParameterAsText, SetProgressorLabel
+    SetParameterAsText
 from arcpy.analysis import Buffer, Clip, PairwiseErase
 from arcpy.conversion import RasterToPolygon
 from arcpy.da import SearchCursor, UpdateCursor
@@ -14,11 +14,12 @@ from arcpy.management import AddField, CalculateField, Compact, CopyFeatures, De
 from arcpy.mp import ArcGISProject
 from arcpy.sa import ExtractByMask, Int, SetNull, Times, ZonalStatisticsAsTable
 
-from utils import AddMsgAndPrint, deleteESRIAddedFields, emptyScratchGDB, errorMsg, removeMapLayers
+from scratch_manager import ScratchManager
+from utils import AddMsgAndPrint, deleteESRIAddedFields, errorMsg, projectLog, removeMapLayers, stageTimer
 
 
 def logBasicSettings(log_file_path, project_contours):
-    with open (log_file_path, 'a+') as f:
+    with projectLog(log_file_path) as f:
         f.write('\n######################################################################\n')
         f.write('Executing Tool: Create Pool from Contours\n')
         f.write(f"Pro Version: {GetInstallInfo()['Version']}\n")
@@ -68,6 +69,7 @@ if int(GetCount(input_dam).getOutput(0)) != 1:
 ### Set Paths and Variables ###
 support_dir = path.dirname(argv[0])
 scratch_gdb = path.join(support_dir, 'Scratch.gdb')
+scratch = ScratchManager(scratch_gdb)
 project_workspace = path.dirname(project_gdb)
 project_name = path.basename(project_workspace)
 log_file_path = path.join(project_workspace, f"{project_name}_log.txt")
@@ -86,20 +88,20 @@ dem_cell_area = dem_desc.meanCellWidth * dem_desc.meanCellHeight
 dams_lyr = 'Dams_Lyr'
 contour_lyr = 'Contour_Lyr'
 contour_lyr2 = 'Contour_Lyr2'
-contour_mask = r'memory\Contour_Mask'
-contour_erase = r'memory\Contour_Erase'
-buffer1 = r'memory\Buffer1'
-buffer2 = r'memory\Buffer2'
-buffer3 = r'memory\Buffer3'
-buffer4 = r'memory\Buffer4'
-buffer5 = r'memory\Buffer5'
-buffer6 = r'memory\Buffer6'
-buffer7 = r'memory\Buffer7'
-extent_mask = r'memory\Extent_Mask'
-dams_temp = r'memory\Dams_Temp'
-dams_stats = r'memory\Dams_Stats'
-pool_mask = r'memory\Pool_Mask'
-temp_pool = r'memory\Temp_Pool'
+contour_mask = scratch.name('Contour_Mask')
+contour_erase = scratch.name('Contour_Erase')
+buffer1 = scratch.name('Buffer1')
+buffer2 = scratch.name('Buffer2')
+buffer3 = scratch.name('Buffer3')
+buffer4 = scratch.name('Buffer4')
+buffer5 = scratch.name('Buffer5')
+buffer6 = scratch.name('Buffer6')
+buffer7 = scratch.name('Buffer7')
+extent_mask = scratch.name('Extent_Mask')
+dams_temp = scratch.name('Dams_Temp')
+dams_stats = scratch.name('Dams_Stats')
+pool_mask = scratch.name('Pool_Mask')
+temp_pool = scratch.name('Temp_Pool')
 
 ### ESRI Environment Settings ###
 env.overwriteOutput = True
@@ -114,10 +116,12 @@ to_acre_foot = 1233.48184
 to_cubic_meters = 1
 to_cubic_feet = 35.3147
 
+perf = stageTimer('Create Pool from Contours', project_workspace)
+
 try:
     logBasicSettings(log_file_path, project_contours)
 
-    SetProgressorLabel('Selecting contours by dam...')
+    perf.stage('Selecting contours by dam...')
     AddMsgAndPrint('\nSelecting contours by dam...', log_file_path=log_file_path)
 
     # Copy User input to temp dam layer and add fields
@@ -149,7 +153,7 @@ try:
     PairwiseErase(buffer3, buffer1, buffer4)
     PairwiseErase(buffer4, buffer2, buffer5)
 
-    SetProgressorLabel('Determining highest closed contour...')
+    perf.stage('Determining highest closed contour...')
     AddMsgAndPrint('\nDetermining highest closed contour...', log_file_path=log_file_path)
 
     # Convert intersected contours to polygon mask
@@ -190,7 +194,7 @@ try:
     CopyFeatures(dams_temp, output_dams_path)
     MakeFeatureLayer(output_dams_path, dams_lyr)
 
-    SetProgressorLabel('Calculating pool volume...')
+    perf.stage('Calculating pool volume...')
     AddMsgAndPrint('\nCalculating pool volume...', log_file_path=log_file_path)
 
     # Dissolve and populate with plane elevation for raster processing
@@ -263,7 +267,7 @@ try:
         Delete(temp_dem)
 
     # Retrieve attributes for dam and populate fields
-    SetProgressorLabel('Calculating dam info...')
+    perf.stage('Calculating dam info...')
     AddMsgAndPrint('\nCalculating dam info...', log_file_path=log_file_path)
     Buffer(output_dams_path, buffer7, '3 Meters', 'RIGHT', 'ROUND', 'LIST', 'ID')
     ZonalStatisticsAsTable(buffer7, 'ID', project_dem, dams_stats, 'NODATA', 'ALL')
@@ -335,7 +339,7 @@ try:
 
     ### Compact Project GDB ###
     try:
-        SetProgressorLabel('Compacting project geodatabase...')
+        perf.stage('Compacting project geodatabase...')
         AddMsgAndPrint('\nCompacting project geodatabase...', log_file_path=log_file_path)
         Compact(project_gdb)
     except:
@@ -353,29 +357,5 @@ except:
         AddMsgAndPrint(errorMsg('Create Pool from Contours'), 2)
 
 finally:
-    memory_datasets = [
-        contour_mask,
-        contour_erase,
-        buffer1,
-        buffer2,
-        buffer3,
-        buffer4,
-        buffer5,
-        buffer6,
-        buffer7,
-        extent_mask,
-        dams_temp,
-        dams_stats,
-        pool_mask,
-        temp_pool
-    ]
-
-    for ds in memory_datasets:
-        try:
-            if Exists(ds):
-                Delete(ds)
-        except:
-            pass
-
-    emptyScratchGDB(scratch_gdb)
-
+    perf.finish()
+    scratch.cleanup()
@@ -5,13 +5,12 @@ from time import ctime
 
 from arcpy import Exists, GetInstallInfo, GetParameter, GetParameterAsText, SetProgressorLabel
 from arcpy.management import CreateFeatureDataset, CreateFileGDB
-from arcpy.mp import ArcGISProject
 
-from utils import AddMsgAndPrint
+from utils import AddMsgAndPrint, closeProjectLogs, engineeringProject, isHeadless, projectLog
 
 
 def logBasicSettings(log_file_path, output_folder, project_name, output_sr_name):
-    with open (log_file_path, 'a+') as f:
+    with projectLog(log_file_path) as f:
         f.write('\n######################################################################\n')
         f.write('Executing Tool: Create Project Workspace\n')
         f.write(f"Pro Version: {GetInstallInfo()['Version']}\n")
@@ -25,8 +24,7 @@ def logBasicSettings(log_file_path, output_folder, project_name, output_sr_name)
 
 ### Initial Tool Validation ###
 try:
-    aprx = ArcGISProject('CURRENT')
-    map = aprx.listMaps('Engineering')[0]
+    aprx, map = engineeringProject()
 except:
     AddMsgAndPrint('\nThis tool must be run from an ArcGIS Pro project template distributed with the Engineering Tools. Exiting...', 2)
     exit()
@@ -74,6 +72,7 @@ if not Exists(gdb_path):
         CreateFileGDB(workspace_path, gdb_name)
     except:
         AddMsgAndPrint('\nThe project geodatabase could not be created. Exiting...', 2)
+        closeProjectLogs()
         exit()
 
 ### Create Feature Dataset ###
@@ -84,19 +83,22 @@ if not Exists(fd_path):
         CreateFeatureDataset(gdb_path, 'Layers', output_sr_code)
     except:
         AddMsgAndPrint('\nThe project feature dataset could not be created. Exiting...', 2)
+        closeProjectLogs()
         exit()
 
 ### Update Project Folder Connections ###
-try:
-    connection_list = [item for item in aprx.folderConnections]
-    new_connection = {'alias': '', 'connectionString': workspace_path, 'isHomeFolder': False}
-    if new_connection not in connection_list:
-        SetProgressorLabel('Updating folder connections...')
-        AddMsgAndPrint('\nUpdating folder connections...', log_file_path=log_file_path)
-        connection_list.append(new_connection)
-        aprx.updateFolderConnections(connection_list, validate=True)
-except:
-    AddMsgAndPrint('\nFailed to update project folder connections. End of script...', 1, log_file_path=log_file_path)
+if not isHeadless():
+    try:
+        connection_list = [item for item in aprx.folderConnections]
+        new_connection = {'alias': '', 'connectionString': workspace_path, 'isHomeFolder': False}
+        if new_connection not in connection_list:
+            SetProgressorLabel('Updating folder connections...')
+            AddMsgAndPrint('\nUpdating folder connections...', log_file_path=log_file_path)
+            connection_list.append(new_connection)
+            aprx.updateFolderConnections(connection_list, validate=True)
+    except:
+        AddMsgAndPrint('\nFailed to update project folder connections. End of script...', 1, log_file_path=log_file_path)
 
 
 AddMsgAndPrint('\nCreate Project Workspace completed successfully', log_file_path=log_file_path)
+closeProjectLogs()
@@ -4,17 +4,18 @@ from sys import argv, exit
 from time import ctime
 
 from arcpy import CheckExtension, CheckOutExtension, Describe, env, Exists, GetInstallInfo, GetParameterAsText, \
-    SetParameterAsText, SetProgressorLabel
+    SetParameterAsText
 from arcpy.analysis import Buffer, Clip
-from arcpy.management import AddField, CalculateField, CalculateStatistics, Compact, Delete, GetCount, MosaicToNewRaster
-from arcpy.mp import ArcGISProject
+from arcpy.management import AddField, CalculateField, CalculateStatistics, Compact, GetCount, MosaicToNewRaster
 from arcpy.sa import Con, Fill, FlowAccumulation, FlowDirection, StreamLink, StreamToFeature, ZonalStatistics
 
-from utils import AddMsgAndPrint, deleteESRIAddedFields, emptyScratchGDB, errorMsg, removeMapLayers
+from provenance_io import provenanceStore
+from scratch_manager import ScratchManager
+from utils import AddMsgAndPrint, deleteESRIAddedFields, engineeringProject, errorMsg, projectLog, removeMapLayers, stageTimer
 
 
 def logBasicSettings(log_file_path, project_dem, input_culverts, stream_threshold):
-    with open (log_file_path, 'a+') as f:
+    with projectLog(log_file_path) as f:
         f.write('\n######################################################################\n')
         f.write('Executing Tool: Create Stream Network\n')
         f.write(f"Pro Version: {GetInstallInfo()['Version']}\n")
@@ -28,8 +29,7 @@ def logBasicSettings(log_file_path, project_dem, input_culverts, stream_threshol
 
 ### Initial Tool Validation ###
 try:
-    aprx = ArcGISProject('CURRENT')
-    map = aprx.listMaps('Engineering')[0]
+    aprx, map = engineeringProject()
 except:
     AddMsgAndPrint('\nThis tool must be run from an ArcGIS Pro project template distributed with the Engineering Tools. Exiting!', 2)
     exit()
@@ -57,12 +57,14 @@ else:
 support_dir = path.dirname(argv[0])
 #scratch_gdb = path.join(support_dir, 'Scratch.gdb')
 scratch_gdb = "memory"
+scratch = ScratchManager(scratch_gdb)
 project_workspace = path.dirname(project_gdb)
 project_name = path.basename(project_workspace)
 log_file_path = path.join(project_workspace, f"{project_name}_log.txt")
+provenance = provenanceStore(project_workspace)
 project_aoi_path = path.join(project_gdb, f"{project_name}_AOI")
-culverts_buffer_temp = r"memory\Culverts_Buffer"
-hydro_dem_temp = r"memory\Hydro_DEM"
+culverts_buffer_temp = scratch.name('Culverts_Buffer')
+hydro_dem_temp = scratch.name('Hydro_DEM')
 culverts_name = f"{project_name}_Culverts"
 culverts_path = path.join(project_gdb, 'Layers', culverts_name)
 streams_name = f"{project_name}_Streams"
@@ -89,29 +91,48 @@ env.cellSize = dem_cell_size
 env.snapRaster = project_dem_path
 env.outputCoordinateSystem = dem_desc.spatialReference
 
+perf = stageTimer('Create Stream Network', project_workspace, project_dem_path)
+
 try:
     #removeMapLayers(map, [culverts_name, streams_name, flow_accum_name, flow_dir_name])
     removeMapLayers(map, [streams_name, flow_accum_name, flow_dir_name])
     logBasicSettings(log_file_path, project_dem, input_culverts, stream_threshold)
 
     ### Process Input Culverts ###
+    use_culverts = False
     if input_culverts:
-        SetProgressorLabel('Processing input culverts...')
+        perf.stage('Processing input culverts...')
         AddMsgAndPrint('\nProcessing input culverts...', log_file_path=log_file_path)
 
         input_culverts_path = Describe(input_culverts).catalogPath
         if input_culverts_path != culverts_path:
-            SetProgressorLabel('Clipping input culverts to project AOI layer...')
+            perf.stage('Clipping input culverts to project AOI layer...')
             AddMsgAndPrint('\nClipping input culverts to project AOI layer...', log_file_path=log_file_path)
             Clip(input_culverts, project_aoi_path, culverts_path)
         else:
             AddMsgAndPrint('\nExisting project culverts layer used as input...', log_file_path=log_file_path)
 
         # Ensure output culverts layer has at least one feature in AOI
-        if int(GetCount(culverts_path).getOutput(0)) > 0:
+        use_culverts = int(GetCount(culverts_path).getOutput(0)) > 0
+
+    if not use_culverts:
+        AddMsgAndPrint('\nNo culverts within project AOI...', log_file_path=log_file_path)
+
+    ### Reuse Flow Direction and Accumulation if the DEM and Culverts are Unchanged ###
+    perf.stage('Checking for current Flow Direction and Flow Accumulation...')
+    hydro_outputs = [flow_dir_path, flow_accum_path]
+    hydro_key = provenance.key({'dem': project_dem_path, 'culverts': culverts_path if use_culverts else None},
+                               {'cell_size': dem_cell_size, 'flow_direction': 'NORMAL', 'accumulation': 'INTEGER'})
 
+    if provenance.current(hydro_outputs, hydro_key):
+        AddMsgAndPrint('\nDEM and culverts are unchanged; using existing Flow Direction and Flow Accumulation...', log_file_path=log_file_path)
+
+    else:
+        provenance.forget(hydro_outputs)
+
+        if use_culverts:
             # Buffer the culverts to 1 pixel
-            SetProgressorLabel('Buffering culverts by DEM cell size...')
+            perf.stage('Buffering culverts by DEM cell size...')
             AddMsgAndPrint('\nBuffering culverts by DEM cell size...', log_file_path=log_file_path)
             Buffer(culverts_path, culverts_buffer_temp, f"{str(dem_cell_size)} Meters", 'FULL', 'ROUND', 'NONE')
 
@@ -120,34 +141,34 @@ try:
             CalculateField(culverts_buffer_temp, 'ZONE', f"!{Describe(culverts_buffer_temp).OIDFieldName}!", 'PYTHON3')
 
             # Get the minimum elevation value for each culvert
-            SetProgressorLabel('Finding minimum elevation of culverts...')
+            perf.stage('Finding minimum elevation of culverts...')
             AddMsgAndPrint('\nFinding minimum elevation of culverts...', log_file_path=log_file_path)
             culverts_min_value = ZonalStatistics(culverts_buffer_temp, 'ZONE', project_dem_path, 'MINIMUM', 'NODATA')
 
             # Elevation cells that overlap the culverts will get the minimum elevation value
             mosaic_list = f"{project_dem_path};{culverts_min_value}"
-            MosaicToNewRaster(mosaic_list, scratch_gdb, 'Hydro_DEM', '#', '32_BIT_FLOAT', dem_cell_size, '1', 'LAST')
+            MosaicToNewRaster(mosaic_list, path.dirname(hydro_dem_temp), path.basename(hydro_dem_temp), '#', '32_BIT_FLOAT', dem_cell_size, '1', 'LAST')
 
             hydro_dem_fill = Fill(hydro_dem_temp)
 
-    else:
-        AddMsgAndPrint('\nNo culverts within project AOI...', log_file_path=log_file_path)
-        hydro_dem_fill = Fill(project_dem_path)
-
-    ### Create Flow Direction Grid ###
-    SetProgressorLabel('Creating Flow Direction...')
-    AddMsgAndPrint('\nCreating Flow Direction...', log_file_path=log_file_path)
-    flow_direction = FlowDirection(hydro_dem_fill, 'NORMAL')
-    flow_direction.save(flow_dir_path)
-
-    ### Create Flow Accumulation Grid ###
-    SetProgressorLabel('Creating Flow Accumulation...')
-    AddMsgAndPrint('\nCreating Flow Accumulation...', log_file_path=log_file_path)
-    flow_accumulation = FlowAccumulation(flow_dir_path, data_type='INTEGER')
-    flow_accumulation.save(flow_accum_path)
-    # Compute a histogram for the FlowAccumulation layer so that the full range of values are captured for subsequent stream generation
-    # This tries to fix a bug of the primary channel not generating for large watersheds with high values in flow accumulation grid
-    CalculateStatistics(flow_accum_path)
+        else:
+            hydro_dem_fill = Fill(project_dem_path)
+
+        ### Create Flow Direction Grid ###
+        perf.stage('Creating Flow Direction...')
+        AddMsgAndPrint('\nCreating Flow Direction...', log_file_path=log_file_path)
+        flow_direction = FlowDirection(hydro_dem_fill, 'NORMAL')
+        flow_direction.save(flow_dir_path)
+
+        ### Create Flow Accumulation Grid ###
+        perf.stage('Creating Flow Accumulation...')
+        AddMsgAndPrint('\nCreating Flow Accumulation...', log_file_path=log_file_path)
+        flow_accumulation = FlowAccumulation(flow_dir_path, data_type='INTEGER')
+        flow_accumulation.save(flow_accum_path)
+        # Compute a histogram for the FlowAccumulation layer so that the full range of values are captured for subsequent stream generation
+        # This tries to fix a bug of the primary channel not generating for large watersheds with high values in flow accumulation grid
+        CalculateStatistics(flow_accum_path)
+        provenance.record(hydro_outputs, hydro_key, 'Create Stream Network')
 
     ### Create Stream Link ###
     if stream_threshold > 0:
@@ -158,18 +179,18 @@ try:
         con_flow_accumulation = Con(flow_accum_path, flow_accum_path, where_clause=f"Value >= {str(acre_threshold)}")
 
         # Create Stream Link Works
-        SetProgressorLabel('Creating Stream Link...')
+        perf.stage('Creating Stream Link...')
         AddMsgAndPrint('\nCreating Stream Link...', log_file_path=log_file_path)
         stream_link = StreamLink(con_flow_accumulation, flow_dir_path)
 
     # All values in Flow Accumulation will be used to create stream link
     else:
-        SetProgressorLabel('Creating Stream Link...')
+        perf.stage('Creating Stream Link...')
         AddMsgAndPrint('\nCreating Stream Link...', log_file_path=log_file_path)
         stream_link = StreamLink(flow_accum_path, flow_dir_path)
 
     ### Convert Raster to Stream Network ###
-    SetProgressorLabel('Creating Stream Network...')
+    perf.stage('Creating Stream Network...')
     AddMsgAndPrint('\nCreating Stream Network...', log_file_path=log_file_path)
     StreamToFeature(stream_link, flow_dir_path, streams_path, 'SIMPLIFY')
 
@@ -189,7 +210,7 @@ try:
 
     ### Compact Project GDB ###
     try:
-        SetProgressorLabel('Compacting project geodatabase...')
+        perf.stage('Compacting project geodatabase...')
         AddMsgAndPrint('\nCompacting project geodatabase...', log_file_path=log_file_path)
         Compact(project_gdb)
     except:
@@ -207,12 +228,5 @@ except:
         AddMsgAndPrint(errorMsg('Create Stream Network'), 2)
 
 finally:
-    try:
-        Delete(culverts_buffer_temp)
-    except:
-        pass
-    try:
-        Delete(hydro_dem_temp)
-    except:
-        pass
-    emptyScratchGDB(scratch_gdb)
+    perf.finish()
+    scratch.cleanup()
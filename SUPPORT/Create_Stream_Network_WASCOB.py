@@ -4,17 +4,18 @@ from sys import argv, exit
 from time import ctime
 
 from arcpy import CheckExtension, CheckOutExtension, Describe, env, Exists, GetInstallInfo, GetParameterAsText, \
-    SetParameterAsText, SetProgressorLabel
+    SetParameterAsText
 from arcpy.analysis import Buffer, Clip
 from arcpy.management import AddField, CalculateField, CalculateStatistics, Compact, GetCount, MosaicToNewRaster
 from arcpy.mp import ArcGISProject
 from arcpy.sa import Con, Fill, FlowAccumulation, FlowDirection, StreamLink, StreamToFeature, ZonalStatistics
 
-from utils import AddMsgAndPrint, deleteESRIAddedFields, emptyScratchGDB, errorMsg, removeMapLayers
+from scratch_manager import ScratchManager
+from utils import AddMsgAndPrint, deleteESRIAddedFields, errorMsg, projectLog, removeMapLayers, stageTimer
 
 
 def logBasicSettings(log_file_path, wascob_dem, input_culverts, stream_threshold):
-    with open (log_file_path, 'a+') as f:
+    with projectLog(log_file_path) as f:
         f.write('\n######################################################################\n')
         f.write('Executing Tool: Create Stream Network (WASCOB)\n')
         f.write(f"Pro Version: {GetInstallInfo()['Version']}\n")
@@ -56,13 +57,14 @@ else:
 ### Set Paths and Variables ###
 support_dir = path.dirname(argv[0])
 scratch_gdb = path.join(support_dir, 'Scratch.gdb')
+scratch = ScratchManager(scratch_gdb)
 project_workspace = path.dirname(wascob_gdb)
 project_name = path.basename(project_workspace)
 log_file_path = path.join(project_workspace, f"{project_name}_log.txt")
 project_gdb_path = path.join(project_workspace, f"{project_name}_EngPro.gdb")
 project_aoi_path = path.join(project_gdb_path, f"{project_name}_AOI")
-culverts_buffer_temp = r"memory\Culverts_Buffer"
-hydro_dem_temp = path.join(scratch_gdb, 'Hydro_DEM')
+culverts_buffer_temp = scratch.name('Culverts_Buffer')
+hydro_dem_temp = scratch.name('Hydro_DEM', in_gdb=True)
 
 culverts_name = f"{project_name}_Culverts_WASCOB"
 culverts_path = path.join(wascob_gdb, 'Layers', culverts_name)
@@ -90,18 +92,20 @@ env.cellSize = dem_cell_size
 env.snapRaster = wascob_dem_path
 env.outputCoordinateSystem = dem_desc.spatialReference
 
+perf = stageTimer('Create Stream Network (WASCOB)', project_workspace)
+
 try:
     removeMapLayers(map, [culverts_name, streams_name, flow_accum_name, flow_dir_name])
     logBasicSettings(log_file_path, wascob_dem_path, input_culverts, stream_threshold)
 
     ### Process Input Culverts ###
     if input_culverts:
-        SetProgressorLabel('Processing input culverts...')
+        perf.stage('Processing input culverts...')
         AddMsgAndPrint('\nProcessing input culverts...', log_file_path=log_file_path)
 
         input_culverts_path = Describe(input_culverts).catalogPath
         if input_culverts_path != culverts_path:
-            SetProgressorLabel('Clipping input culverts to project AOI layer...')
+            perf.stage('Clipping input culverts to project AOI layer...')
             AddMsgAndPrint('\nClipping input culverts to project AOI layer...', log_file_path=log_file_path)
             Clip(input_culverts, project_aoi_path, culverts_path)
         else:
@@ -111,7 +115,7 @@ try:
         if int(GetCount(culverts_path).getOutput(0)) > 0:
 
             # Buffer the culverts to 1 pixel
-            SetProgressorLabel('Buffering culverts by DEM cell size...')
+            perf.stage('Buffering culverts by DEM cell size...')
             AddMsgAndPrint('\nBuffering culverts by DEM cell size...', log_file_path=log_file_path)
             Buffer(culverts_path, culverts_buffer_temp, f"{str(dem_cell_size)} Meters", 'FULL', 'ROUND', 'NONE')
 
@@ -120,13 +124,13 @@ try:
             CalculateField(culverts_buffer_temp, 'ZONE', f"!{Describe(culverts_buffer_temp).OIDFieldName}!", 'PYTHON3')
 
             # Get the minimum elevation value for each culvert
-            SetProgressorLabel('Finding minimum elevation of culverts...')
+            perf.stage('Finding minimum elevation of culverts...')
             AddMsgAndPrint('\nFinding minimum elevation of culverts...', log_file_path=log_file_path)
             culverts_min_value = ZonalStatistics(culverts_buffer_temp, 'ZONE', wascob_dem_path, 'MINIMUM', 'NODATA')
 
             # Elevation cells that overlap the culverts will get the minimum elevation value
             mosaic_list = f"{wascob_dem_path};{culverts_min_value}"
-            MosaicToNewRaster(mosaic_list, scratch_gdb, 'Hydro_DEM', '#', '32_BIT_FLOAT', dem_cell_size, '1', 'LAST')
+            MosaicToNewRaster(mosaic_list, path.dirname(hydro_dem_temp), path.basename(hydro_dem_temp), '#', '32_BIT_FLOAT', dem_cell_size, '1', 'LAST')
 
             hydro_dem_fill = Fill(hydro_dem_temp)
         else:
@@ -139,13 +143,13 @@ try:
         hydro_dem_fill = Fill(wascob_dem_path)
 
     ### Create Flow Direction Grid ###
-    SetProgressorLabel('Creating Flow Direction...')
+    perf.stage('Creating Flow Direction...')
     AddMsgAndPrint('\nCreating Flow Direction...', log_file_path=log_file_path)
     flow_direction = FlowDirection(hydro_dem_fill, 'NORMAL')
     flow_direction.save(flow_dir_path)
 
     ### Create Flow Accumulation Grid ###
-    SetProgressorLabel('Creating Flow Accumulation...')
+    perf.stage('Creating Flow Accumulation...')
     AddMsgAndPrint('\nCreating Flow Accumulation...', log_file_path=log_file_path)
     flow_accumulation = FlowAccumulation(flow_dir_path, data_type='INTEGER')
     flow_accumulation.save(flow_accum_path)
@@ -162,18 +166,18 @@ try:
         con_flow_accumulation = Con(flow_accum_path, flow_accum_path, where_clause=f"Value >= {str(acre_threshold)}")
 
         # Create Stream Link Works
-        SetProgressorLabel('Creating Stream Link...')
+        perf.stage('Creating Stream Link...')
         AddMsgAndPrint('\nCreating Stream Link...', log_file_path=log_file_path)
         stream_link = StreamLink(con_flow_accumulation, flow_dir_path)
 
     # All values in Flow Accumulation will be used to create stream link
     else:
-        SetProgressorLabel('Creating Stream Link...')
+        perf.stage('Creating Stream Link...')
         AddMsgAndPrint('\nCreating Stream Link...', log_file_path=log_file_path)
         stream_link = StreamLink(flow_accum_path, flow_dir_path)
 
     ### Convert Raster to Stream Network ###
-    SetProgressorLabel('Creating Stream Network...')
+    perf.stage('Creating Stream Network...')
     AddMsgAndPrint('\nCreating Stream Network...', log_file_path=log_file_path)
     StreamToFeature(stream_link, flow_dir_path, streams_path, 'SIMPLIFY')
 
@@ -193,7 +197,7 @@ try:
 
     ### Compact Project GDB ###
     try:
-        SetProgressorLabel('Compacting project geodatabase...')
+        perf.stage('Compacting project geodatabase...')
         AddMsgAndPrint('\nCompacting project geodatabase...', log_file_path=log_file_path)
         Compact(wascob_gdb)
     except:
@@ -211,4 +215,5 @@ except:
         AddMsgAndPrint(errorMsg('Create Stream Network (WASCOB)'), 2)
 
 finally:
-    emptyScratchGDB(scratch_gdb)
+    perf.finish()
+    scratch.cleanup()
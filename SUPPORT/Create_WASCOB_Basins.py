@@ -4,7 +4,7 @@ from sys import argv, exit
 from time import ctime
 
 from arcpy import AddFieldDelimiters, CheckExtension, CheckOutExtension, Describe, env, Exists, GetInstallInfo, \
-    GetParameterAsText, ListFields, SetParameterAsText, SetProgressorLabel
+    GetParameterAsText, ListFields, SetParameterAsText
 from arcpy.analysis import Buffer, Clip
 from arcpy.conversion import PolygonToRaster, RasterToPolygon
 from arcpy.da import SearchCursor, UpdateCursor
@@ -12,11 +12,12 @@ from arcpy.management import AddField, CalculateField, Compact, Delete, DeleteFi
 from arcpy.mp import ArcGISProject
 from arcpy.sa import Slope, Watershed, ZonalStatisticsAsTable
 
-from utils import AddMsgAndPrint, deleteESRIAddedFields, emptyScratchGDB, errorMsg, removeMapLayers
+from scratch_manager import ScratchManager
+from utils import AddMsgAndPrint, deleteESRIAddedFields, errorMsg, projectLog, removeMapLayers, stageTimer
 
 
 def logBasicSettings(log_file_path, wascob_streams, embankments, basins_name):
-    with open (log_file_path, 'a+') as f:
+    with projectLog(log_file_path) as f:
         f.write('\n######################################################################\n')
         f.write('Executing Tool: Create WASCOB Basins\n')
         f.write(f"Pro Version: {GetInstallInfo()['Version']}\n")
@@ -59,6 +60,7 @@ else:
 support_dir = path.dirname(argv[0])
 support_gdb = path.join(support_dir, 'Support.gdb')
 scratch_gdb = path.join(support_dir, 'Scratch.gdb')
+scratch = ScratchManager(scratch_gdb)
 project_workspace = path.dirname(wascob_gdb)
 project_name = path.basename(project_workspace)
 log_file_path = path.join(project_workspace, f"{project_name}_log.txt")
@@ -70,11 +72,11 @@ flow_dir_path = path.join(wascob_gdb, 'Flow_Direction_WASCOB')
 basins_path = path.join(wascob_fd, basins_name)
 embankments_name = f"{basins_name}_Embankments"
 embankments_path = path.join(wascob_fd, embankments_name)
-embankment_buffer_temp = r"memory\Embankment_Buffer"
-pour_point_temp = r"memory\Pour_Point"
-watershed_temp = r"memory\Watershed_Temp"
-embankment_stats_temp = r"memory\Embankment_Stats"
-slope_stats_temp = r"memory\Slope_Stats"
+embankment_buffer_temp = scratch.name('Embankment_Buffer')
+pour_point_temp = scratch.name('Pour_Point')
+watershed_temp = scratch.name('Watershed_Temp')
+embankment_stats_temp = scratch.name('Embankment_Stats')
+slope_stats_temp = scratch.name('Slope_Stats')
 
 ### Validate Required Datasets Exist ###
 if not Exists(project_aoi_path):
@@ -126,13 +128,15 @@ else:
     AddMsgAndPrint(f"\nUnsupported DEM linear units {dem_linear_units}. Exiting...", 2)
     exit()
 
+perf = stageTimer('Create WASCOB Basins', project_workspace)
+
 try:
     removeMapLayers(map, [embankments_name, basins_name])
     logBasicSettings(log_file_path, wascob_streams, embankments, basins_name)
 
     ### Clip Embankments to AOI ###
     if Describe(embankments).catalogPath != embankments_path:
-        SetProgressorLabel('Clipping embankments to project AOI layer...')
+        perf.stage('Clipping embankments to project AOI layer...')
         AddMsgAndPrint('\nClipping embankments to project AOI layer...', log_file_path=log_file_path)
         Clip(embankments, project_aoi_path, embankments_path)
     else:
@@ -145,7 +149,7 @@ try:
         exit()
 
     ### Add Fields to Embankment Layer ###
-    SetProgressorLabel('Calculating embankment attributes...')
+    perf.stage('Calculating embankment attributes...')
     AddMsgAndPrint('\nCalculating embankment attributes...', log_file_path=log_file_path)
     fields = [f.name for f in ListFields(embankments_path)]
     if 'Subbasin' not in fields:
@@ -181,7 +185,7 @@ try:
             row[3] = stats[2] # Mean Elev
             cursor.updateRow(row)
 
-    SetProgressorLabel('Creating basins...')
+    perf.stage('Creating basins...')
     AddMsgAndPrint('\nCreating basins...', log_file_path=log_file_path)
 
     # Convert bufferd embankment to raster
@@ -208,7 +212,7 @@ try:
     CalculateField(basins_path, 'Acres', "!shape!.getArea('PLANAR', 'ACRES')", 'PYTHON3')
 
     ### Calculate Average Slope ###
-    SetProgressorLabel('Calculating average slope...')
+    perf.stage('Calculating average slope...')
     AddMsgAndPrint('\nCalculating average slope...', log_file_path=log_file_path)
     slope_grid = Slope(wascob_dem_path, 'PERCENT_RISE', z_factor)
     ZonalStatisticsAsTable(basins_path, 'Subbasin', slope_grid, slope_stats_temp, 'DATA')
@@ -235,7 +239,7 @@ try:
     deleteESRIAddedFields(embankments_path)
 
     ### Add Outputs to Map ###
-    SetProgressorLabel('Adding output layers to map...')
+    perf.stage('Adding output layers to map...')
     AddMsgAndPrint('\nAdding output layers to map...', log_file_path=log_file_path)
     SetParameterAsText(3, embankments_path)
     SetParameterAsText(4, basins_path)
@@ -248,7 +252,7 @@ try:
 
     ### Compact Project GDB ###
     try:
-        SetProgressorLabel('Compacting project geodatabase...')
+        perf.stage('Compacting project geodatabase...')
         AddMsgAndPrint('\nCompacting project geodatabase...', log_file_path=log_file_path)
         Compact(wascob_gdb)
     except:
@@ -266,19 +270,5 @@ except:
         AddMsgAndPrint(errorMsg('Create WASCOB Basins'), 2)
 
 finally:
-    # Clean up memory intermediates
-    memory_datasets = [
-        embankment_buffer_temp,
-        pour_point_temp,
-        watershed_temp,
-        embankment_stats_temp,
-        slope_stats_temp
-    ]
-
-    for ds in memory_datasets:
-        try:
-            if Exists(ds):
-                Delete(ds)
-        except:
-            pass
-    emptyScratchGDB(scratch_gdb)
+    perf.finish()
+    scratch.cleanup()
@@ -4,22 +4,22 @@ from sys import argv, exit
 from time import ctime
 
 from arcpy import AddFieldDelimiters, CheckExtension, CheckOutExtension, Describe, env, Exists, GetInstallInfo, GetMessages, \
-    GetParameter, GetParameterAsText, SetParameterAsText, SetProgressorLabel
+    GetParameter, GetParameterAsText, SetParameterAsText
 from arcpy.analysis import Buffer, Clip, Intersect
 from arcpy.cartography import SmoothLine
 from arcpy.conversion import PolygonToRaster, RasterToPolygon
 from arcpy.da import SearchCursor, UpdateCursor
 from arcpy.management import AddField, AssignDomainToField, CalculateField, Compact, CreateFeatureclass, Delete, DeleteField, \
     Dissolve, GetCount, TableToDomain
-from arcpy.mp import ArcGISProject
 from arcpy.sa import Con, FlowLength, GreaterThan, Minus, Plus, Slope, StreamLink, StreamToFeature, Watershed, ZonalStatistics, \
     ZonalStatisticsAsTable
 
-from utils import AddMsgAndPrint, deleteESRIAddedFields, emptyScratchGDB, errorMsg, removeMapLayers
+from scratch_manager import ScratchManager
+from utils import AddMsgAndPrint, deleteESRIAddedFields, engineeringProject, errorMsg, projectLog, removeMapLayers, stageTimer
 
 
 def logBasicSettings(log_file_path, streams, outlets, watershed_name, create_flow_paths):
-    with open (log_file_path, 'a+') as f:
+    with projectLog(log_file_path) as f:
         f.write('\n######################################################################\n')
         f.write('Executing Tool: Create Watershed\n')
         f.write(f"Pro Version: {GetInstallInfo()['Version']}\n")
@@ -34,8 +34,7 @@ def logBasicSettings(log_file_path, streams, outlets, watershed_name, create_flo
 
 ### Initial Tool Validation ###
 try:
-    aprx = ArcGISProject('CURRENT')
-    map = aprx.listMaps('Engineering')[0]
+    aprx, map = engineeringProject()
 except:
     AddMsgAndPrint('\nThis tool must be run from an ArcGIS Pro project template distributed with the Engineering Tools. Exiting!', 2)
     exit()
@@ -64,6 +63,7 @@ else:
 support_dir = path.dirname(argv[0])
 support_gdb = path.join(support_dir, 'Support.gdb')
 scratch_gdb = path.join(support_dir, 'Scratch.gdb')
+scratch = ScratchManager(scratch_gdb)
 project_workspace = path.dirname(project_gdb)
 project_name = path.basename(project_workspace)
 log_file_path = path.join(project_workspace, f"{project_name}_log.txt")
@@ -79,12 +79,12 @@ flow_length_name = f"{watershed_name}_FlowPaths"
 flow_length_path = path.join(project_fd, flow_length_name)
 id_domain_table = path.join(support_gdb, 'ID_TABLE')
 reach_domain_table = path.join(support_gdb, 'REACH_TYPE')
-outlet_buffer_temp = r"memory\Outlet_Buffer"
-pour_point_temp = r"memory\Pour_Point"
-watershed_temp = r"memory\Watershed_Temp"
-lp_smooth_temp = r"memory\LP_Smooth"
-longest_path_temp = r"memory\Longpath_Temp"
-slope_stats_temp = r"memory\Slope_Stats"
+outlet_buffer_temp = scratch.name('Outlet_Buffer')
+pour_point_temp = scratch.name('Pour_Point')
+watershed_temp = scratch.name('Watershed_Temp')
+lp_smooth_temp = scratch.name('LP_Smooth')
+longest_path_temp = scratch.name('Longpath_Temp')
+slope_stats_temp = scratch.name('Slope_Stats')
 
 ### Validate Required Datasets Exist ###
 if not Exists(project_dem_path):
@@ -121,13 +121,15 @@ env.snapRaster = project_dem_path
 env.outputCoordinateSystem = dem_desc.spatialReference
 env.workspace = project_gdb
 
+perf = stageTimer('Create Watershed', project_workspace, project_dem_path)
+
 try:
     removeMapLayers(map, [outlets_name, watershed_name, flow_length_name])
     logBasicSettings(log_file_path, streams, outlets, watershed_name, create_flow_paths)
 
     ### Clip Outlets to AOI ###
     if Describe(outlets).catalogPath != outlets_path:
-        SetProgressorLabel('Clipping outlets to project AOI layer...')
+        perf.stage('Clipping outlets to project AOI layer...')
         AddMsgAndPrint('\nClipping outlets to project AOI layer...', log_file_path=log_file_path)
         Clip(outlets, project_aoi_path, outlets_path)
     else:
@@ -140,7 +142,7 @@ try:
         exit()
 
     ### Delineate Watershed(s) from Outlets ###
-    SetProgressorLabel('Delineating Watershed(s)...')
+    perf.stage('Delineating Watershed(s)...')
     AddMsgAndPrint('\nDelineating Watershed(s)...', log_file_path=log_file_path)
 
     # Add dummy field for buffer dissolve and raster conversion using OBJECTID (which becomes subbasin ID)
@@ -178,7 +180,7 @@ try:
 
     ### Flow Length Analysis ###
     if create_flow_paths:
-        SetProgressorLabel('Calculating watershed flow path(s)...')
+        perf.stage('Calculating watershed flow path(s)...')
         AddMsgAndPrint('\nCalculating watershed flow path(s)...', log_file_path=log_file_path)
         try:
             # Derive Longest flow path for each subbasin
@@ -247,7 +249,7 @@ try:
             AddMsgAndPrint('\nAn error occured while calculating Flow Path(s).\nYou will have to trace your stream network to create them manually. Continuing...\n' + GetMessages(2), 1, log_file_path=log_file_path)
 
     ### Calculate Average Slope ###
-    SetProgressorLabel('Calculating average slope...')
+    perf.stage('Calculating average slope...')
     AddMsgAndPrint('\nCalculating average slope...', log_file_path=log_file_path)
     slope_grid = Slope(project_dem_path, 'PERCENT_RISE', 0.3048) # Z-factor Intl Feet to Meters
     ZonalStatisticsAsTable(watershed_path, 'Subbasin', slope_grid, slope_stats_temp, 'DATA')
@@ -274,7 +276,7 @@ try:
     deleteESRIAddedFields(outlets_path)
 
     ### Add Outputs to Map ###
-    SetProgressorLabel('Adding output layers to map...')
+    perf.stage('Adding output layers to map...')
     AddMsgAndPrint('\nAdding output layers to map...', log_file_path=log_file_path)
     SetParameterAsText(4, outlets_path)
     SetParameterAsText(5, watershed_path)
@@ -289,7 +291,7 @@ try:
 
     ### Compact Project GDB ###
     try:
-        SetProgressorLabel('Compacting project geodatabase...')
+        perf.stage('Compacting project geodatabase...')
         AddMsgAndPrint('\nCompacting project geodatabase...', log_file_path=log_file_path)
         Compact(project_gdb)
     except:
@@ -307,21 +309,5 @@ except:
         AddMsgAndPrint(errorMsg('Create Watershed'), 2)
 
 finally:
-    # Clean up memory intermediates
-    memory_datasets = [
-        outlet_buffer_temp,
-        watershed_temp,
-        lp_smooth_temp,
-        longest_path_temp,
-        slope_stats_temp,
-        pour_point_temp
-    ]
-
-    for ds in memory_datasets:
-        try:
-            if Exists(ds):
-                Delete(ds)
-        except:
-            pass
-
-    emptyScratchGDB(scratch_gdb)
+    perf.finish()
+    scratch.cleanup()
@@ -4,19 +4,20 @@ from sys import argv, exit
 from time import ctime
 
 from arcpy import CheckExtension, CheckOutExtension, Describe, env, Exists, GetInstallInfo, GetParameterAsText, \
-    SetParameterAsText, SetProgressorLabel
+    SetParameterAsText
 from arcpy.analysis import Clip
 from arcpy.conversion import RasterToPolygon
 from arcpy.management import AddField, AddXY, Append, CalculateField, CreateFeatureclass, Compact, CopyFeatures, \
-    Delete, DeleteFeatures, FeatureVerticesToPoints, GetCount, MakeFeatureLayer, SelectLayerByAttribute
+    DeleteFeatures, FeatureVerticesToPoints, GetCount, MakeFeatureLayer, SelectLayerByAttribute
 from arcpy.mp import ArcGISProject
 from arcpy.sa import ExtractByMask, Int, SetNull, Times
 
-from utils import AddMsgAndPrint, emptyScratchGDB, errorMsg, removeMapLayers
+from scratch_manager import ScratchManager
+from utils import AddMsgAndPrint, errorMsg, projectLog, removeMapLayers, stageTimer
 
 
 def logBasicSettings(log_file_path, input_basins, subbasin_number, design_elevation, intake_elevation):
-    with open (log_file_path, 'a+') as f:
+    with projectLog(log_file_path) as f:
         f.write('\n######################################################################\n')
         f.write('Executing Tool: Design Height and Intake Location\n')
         f.write(f"Pro Version: {GetInstallInfo()['Version']}\n")
@@ -62,6 +63,7 @@ else:
 ### Set Paths and Variables ###
 support_dir = path.dirname(argv[0])
 scratch_gdb = path.join(support_dir, 'Scratch.gdb')
+scratch = ScratchManager(scratch_gdb)
 project_workspace = path.dirname(wascob_gdb)
 project_name = path.basename(project_workspace)
 log_file_path = path.join(project_workspace, f"{project_name}_log.txt")
@@ -73,10 +75,10 @@ embankments_lyr = f"{embankments_name}_Lyr"
 stakeout_points_name = f"{basins_name}_Stakeout_Points"
 stakeout_points_path = path.join(wascob_fd, stakeout_points_name)
 stakeout_points_lyr = f"{stakeout_points_name}_Lyr"
-intake_point_temp = r"memory\intake_temp"
-dem_polygon_temp = r"memory\dem_poly_temp"
-embankment_points_temp = r"memory\embankment_points_temp"
-embankment_clip_temp = r"memory\embankment_clip_temp"
+intake_point_temp = scratch.name('intake_temp')
+dem_polygon_temp = scratch.name('dem_poly_temp')
+embankment_points_temp = scratch.name('embankment_points_temp')
+embankment_clip_temp = scratch.name('embankment_clip_temp')
 
 ### Validate Required Datasets Exist ###
 if not Exists(wascob_dem_path):
@@ -101,6 +103,8 @@ env.pyramid = 'PYRAMIDS -1 BILINEAR DEFAULT 75 NO_SKIP'
 env.parallelProcessingFactor = '75%'
 env.overwriteOutput = True
 
+perf = stageTimer('Design Height and Intake Location', project_workspace)
+
 try:
     removeMapLayers(map, [stakeout_points_name])
     logBasicSettings(log_file_path, input_basins, subbasin_number, design_elevation, intake_elevation)
@@ -114,7 +118,7 @@ try:
 
     ### Create Stakeout Points Feature Class ###
     if not Exists(stakeout_points_path):
-        SetProgressorLabel('Creating Stakeout Points feature class...')
+        perf.stage('Creating Stakeout Points feature class...')
         AddMsgAndPrint('\nCreating Stakeout Points feature class...', log_file_path=log_file_path)
         CreateFeatureclass(wascob_fd, stakeout_points_name, 'POINT', '', 'DISABLED', 'DISABLED', '', '', '0', '0', '0')
         AddField(stakeout_points_path, 'ID', 'LONG')
@@ -129,7 +133,7 @@ try:
     SelectLayerByAttribute(stakeout_points_lyr, 'CLEAR_SELECTION')
 
     ### Create Temp Intake Point and Append to Stakeout Points ###
-    SetProgressorLabel('Updating Intake Location fields...')
+    perf.stage('Updating Intake Location fields...')
     AddMsgAndPrint('\nUpdating Intake Location fields...', log_file_path=log_file_path)
 
     CopyFeatures(intake_location, intake_point_temp)
@@ -143,7 +147,7 @@ try:
     CalculateField(intake_point_temp, 'Elev', intake_elevation, 'PYTHON3')
     CalculateField(intake_point_temp, 'Notes', "'Intake'", 'PYTHON3')
 
-    SetProgressorLabel('Apending Intake Location to Stakeout Points...')
+    perf.stage('Apending Intake Location to Stakeout Points...')
     AddMsgAndPrint('\nApending Intake Location to Stakeout Points...', log_file_path=log_file_path)
     Append(intake_point_temp, stakeout_points_path, 'NO_TEST')
 
@@ -156,7 +160,7 @@ try:
     RasterToPolygon(dem_int, dem_polygon_temp, 'NO_SIMPLIFY', 'VALUE')
 
     ### Create Points from Embankment Vertices ###
-    SetProgressorLabel('Creating points along Embankment at design elevation...')
+    perf.stage('Creating points along Embankment at design elevation...')
     AddMsgAndPrint('\nCreating points along Embankment at design elevation...', log_file_path=log_file_path)
     Clip(embankments_lyr, dem_polygon_temp, embankment_clip_temp)
 
@@ -170,11 +174,11 @@ try:
     CalculateField(embankment_points_temp, 'Elev', design_elevation, 'PYTHON3')
     CalculateField(embankment_points_temp, 'Notes', "'Embankment'", 'PYTHON3')
 
-    SetProgressorLabel('Appending Embankment Points to Stakeout Points...')
+    perf.stage('Appending Embankment Points to Stakeout Points...')
     AddMsgAndPrint('\nAppending Embankment Points to Stakeout Points...', log_file_path=log_file_path)
     Append(embankment_points_temp, stakeout_points_path, 'NO_TEST')
 
-    SetProgressorLabel('Adding XY Coordinates to Stakeout Points...')
+    perf.stage('Adding XY Coordinates to Stakeout Points...')
     AddMsgAndPrint('\nAdding XY Coordinates to Stakeout Points...', log_file_path=log_file_path)
     AddXY(stakeout_points_path)
 
@@ -189,7 +193,7 @@ try:
 
     ### Compact Project GDB ###
     try:
-        SetProgressorLabel('Compacting project geodatabase...')
+        perf.stage('Compacting project geodatabase...')
         AddMsgAndPrint('\nCompacting project geodatabase...', log_file_path=log_file_path)
         Compact(wascob_gdb)
     except:
@@ -207,18 +211,5 @@ except:
         AddMsgAndPrint(errorMsg('Design Height and Intake Location'), 2)
 
 finally:
-    # Clean up memory intermediates
-    memory_datasets = [
-        intake_point_temp,
-        dem_polygon_temp,
-        embankment_points_temp,
-        embankment_clip_temp
-    ]
-
-    for ds in memory_datasets:
-        try:
-            if Exists(ds):
-                Delete(ds)
-        except:
-            pass
-    emptyScratchGDB(scratch_gdb)
+    perf.finish()
+    scratch.cleanup()
@@ -7,11 +7,11 @@ from arcpy import CheckExtension, CheckOutExtension, Describe, env, GetInstallIn
 from arcpy.mp import ArcGISProject
 from arcpy.sa import Times
 
-from utils import AddMsgAndPrint, errorMsg
+from utils import AddMsgAndPrint, closeProjectLogs, errorMsg, projectLog
 
 
 def logBasicSettings(log_file_path, project_dem, output_z_units):
-    with open (log_file_path, 'a+') as f:
+    with projectLog(log_file_path) as f:
         f.write('\n######################################################################\n')
         f.write('Executing Tool: Export Project DEM\n')
         f.write(f"Pro Version: {GetInstallInfo()['Version']}\n")
@@ -87,3 +87,6 @@ except:
         AddMsgAndPrint(errorMsg('Export Project DEM'), 2, log_file_path)
     except:
         AddMsgAndPrint(errorMsg('Export Project DEM'), 2) 
+
+finally:
+    closeProjectLogs()
@@ -3,15 +3,15 @@ from os import path
 from sys import exit
 from time import ctime
 
-from arcpy import Describe, env, Exists, GetInstallInfo, GetParameterAsText, SetProgressorLabel
+from arcpy import Describe, env, Exists, GetInstallInfo, GetParameterAsText
 from arcpy.management import CopyFeatures, SelectLayerByAttribute
 from arcpy.mp import ArcGISProject
 
-from utils import AddMsgAndPrint, errorMsg
+from utils import AddMsgAndPrint, errorMsg, projectLog, stageTimer
 
 
 def logBasicSettings(log_file_path, input_basins):
-    with open (log_file_path, 'a+') as f:
+    with projectLog(log_file_path) as f:
         f.write('\n######################################################################\n')
         f.write('Executing Tool: Export Project Data for GPS\n')
         f.write(f"Pro Version: {GetInstallInfo()['Version']}\n")
@@ -72,11 +72,13 @@ ridge_line_output = path.join(output_dir, f"{basins_name}_RidgeLines.shp")
 env.parallelProcessingFactor = '75%'
 env.overwriteOutput = True
 
+perf = stageTimer('Export Project Data for GPS', project_workspace)
+
 try:
     logBasicSettings(log_file_path, input_basins)
 
     ### Clear Selections from Layers ###
-    SetProgressorLabel('Clearing any selections from layers...')
+    perf.stage('Clearing any selections from layers...')
     AddMsgAndPrint('\nClearing any selections from layers...', log_file_path=log_file_path)
 
     if Exists(embankments_name):
@@ -93,7 +95,7 @@ try:
         SelectLayerByAttribute(ridge_lines_name, 'CLEAR_SELECTION')
 
     ### Export Layers to Shapefiles ###
-    SetProgressorLabel('Exporting layers to shapefiles...')
+    perf.stage('Exporting layers to shapefiles...')
     AddMsgAndPrint('\nExporting layers to shapefiles...', log_file_path=log_file_path)
 
     if Exists(embankments_path):
@@ -139,3 +141,6 @@ except:
         AddMsgAndPrint(errorMsg('Export Project Data for GPS'), 2, log_file_path)
     except:
         AddMsgAndPrint(errorMsg('Export Project Data for GPS'), 2)
+
+finally:
+    perf.finish()
@@ -3,17 +3,22 @@ from os import path
 from sys import argv, exit
 from time import ctime
 
-from arcpy import Describe, env, Exists, GetInstallInfo, GetParameterAsText, ListFields, SetParameterAsText, SetProgressorLabel
+from arcpy import Describe, env, Exists, GetInstallInfo, GetParameterAsText, ListFields, SetParameterAsText
 from arcpy.analysis import Clip, Union
-from arcpy.da import SearchCursor
-from arcpy.management import AddField, AssignDomainToField, CalculateField, Compact, Delete, DeleteField, Dissolve, MultipartToSinglepart, TableToDomain
+from arcpy.management import AddField, AssignDomainToField, CalculateField, Compact, DeleteField, Dissolve, MultipartToSinglepart, TableToDomain
 from arcpy.mp import ArcGISProject
 
-from utils import AddMsgAndPrint, emptyScratchGDB, errorMsg, removeMapLayers
+from numpy import unique
+
+from scratch_manager import ScratchManager
+from soils_engine import changedRows, normalizeHydroGroups
+from soils_io import extractSoils, readTextColumns, updateRows
+from soils_store import STORE_NAME
+from utils import AddMsgAndPrint, errorMsg, projectLog, removeMapLayers, stageTimer, supportTables
 
 
 def logBasicSettings(log_file_path, input_basins, input_soils, soils_hydro_field, input_boundaries):
-    with open (log_file_path, 'a+') as f:
+    with projectLog(log_file_path) as f:
         f.write('\n######################################################################\n')
         f.write('Executing Tool: Prepare Soil and Land Use Layers (WASCOB)\n')
         f.write(f"Pro Version: {GetInstallInfo()['Version']}\n")
@@ -34,6 +39,10 @@ except:
     AddMsgAndPrint('\nThis tool must be run from an ArcGIS Pro project template distributed with the Engineering Tools. Exiting!', 2)
     exit()
 
+### Processing Options ###
+# Soils store read when no Soils layer is given (built with the Build Soils Store tool)
+soils_store_path = path.join(path.dirname(argv[0]), STORE_NAME)
+
 ### Input Parameters ###
 input_basins = GetParameterAsText(0)
 input_soils = GetParameterAsText(1)
@@ -52,11 +61,12 @@ else:
 support_dir = path.dirname(argv[0])
 support_gdb = path.join(support_dir, 'Support.gdb')
 scratch_gdb = path.join(support_dir, 'Scratch.gdb')
+scratch = ScratchManager(scratch_gdb)
 project_workspace = path.dirname(wascob_gdb)
 project_name = path.basename(project_workspace)
 log_file_path = path.join(project_workspace, f"{project_name}_log.txt")
 wascob_fd = path.join(wascob_gdb, 'Layers')
-input_soils_path = Describe(input_soils).catalogPath
+input_soils_path = Describe(input_soils).catalogPath if input_soils else soils_store_path
 basins_name = path.basename(basins_path)
 output_soils_name = f"{basins_name}_Soils_WASCOB"
 output_soils_path = path.join(wascob_fd, output_soils_name)
@@ -64,9 +74,9 @@ output_landuse_name = f"{basins_name}_Land_Use_WASCOB"
 output_landuse_path = path.join(wascob_fd, output_landuse_name)
 tr_55_land_use_table = path.join(support_gdb, 'TR_55_Land_Use_Domain')
 hydro_groups_table = path.join(support_gdb, 'Hydro_Groups_Domain')
-boundaries_clip_temp = r"memory\Boundaries_Clip_Temp"
-land_use_temp = r"memory\Land_Use_Temp"
-basins_dissolve_temp = r"memory\Basins_Dissolve"
+boundaries_clip_temp = scratch.name('Boundaries_Clip_Temp')
+land_use_temp = scratch.name('Land_Use_Temp')
+basins_dissolve_temp = scratch.name('Basins_Dissolve')
 
 ### Validate Required Datasets Exist ###
 if '_Land_Use' in input_basins or '_Soils' in input_basins:
@@ -82,16 +92,27 @@ if not Exists(hydro_groups_table):
     AddMsgAndPrint('\nHydro_Groups_Domain table was not found in Support.gdb. Exiting...', 2)
     exit()
 
+if not input_soils and not path.exists(soils_store_path):
+    AddMsgAndPrint(f"\nNo Soils layer was given and the soils store {STORE_NAME} was not found. Run Build Soils Store or select a Soils layer. Exiting...", 2)
+    exit()
+if input_soils and not soils_hydro_field:
+    AddMsgAndPrint('\nSelect the hydrologic group field of the Soils layer. Exiting...', 2)
+    exit()
+if not input_soils:
+    soils_hydro_field = 'HYDGROUP'
+
 ### ESRI Environment Settings ###
 env.overwriteOutput = True
 env.parallelProcessingFactor = '75%'
 
+perf = stageTimer('Prepare Soil and Land Use Layers (WASCOB)', project_workspace)
+
 try:
     removeMapLayers(map, [output_soils_name, output_landuse_name])
-    logBasicSettings(log_file_path, input_basins, input_soils, soils_hydro_field, input_boundaries)
+    logBasicSettings(log_file_path, input_basins, input_soils_path, soils_hydro_field, input_boundaries)
 
     ### Create Land Use Layer ###
-    SetProgressorLabel('Creating Land Use layer...')
+    perf.stage('Creating Land Use layer...')
     if input_boundaries:
         Dissolve(basins_path, basins_dissolve_temp, '', '', 'MULTI_PART', 'DISSOLVE_LINES')
         Clip(input_boundaries, basins_path, boundaries_clip_temp)
@@ -103,7 +124,7 @@ try:
         AddMsgAndPrint('\nCreated Land Use layer from dissolved basins...', log_file_path=log_file_path)
 
     ### Set Land Use Domain and Delete Extra Fields ###
-    SetProgressorLabel('Setting up LANDUSE domain...')
+    perf.stage('Setting up LANDUSE domain...')
     AddMsgAndPrint('\nSetting up LANDUSE domain...', log_file_path=log_file_path)
 
     domains = Describe(wascob_gdb).domains
@@ -120,18 +141,35 @@ try:
     if delete_fields: DeleteField(output_landuse_path, delete_fields)
 
     ### Clip Soil Data with Land Use ###
-    SetProgressorLabel('Clipping soils data...')
+    perf.stage('Clipping soils data...')
     AddMsgAndPrint('\nClipping soils data...', log_file_path=log_file_path)
-    Clip(input_soils_path, output_landuse_path, output_soils_path)
+    if input_soils:
+        Clip(input_soils_path, output_landuse_path, output_soils_path)
+    else:
+        candidate_count = extractSoils(soils_store_path, output_landuse_path, output_soils_path)
+        AddMsgAndPrint(f"\tClipped {candidate_count} candidate polygons from the soils store...", log_file_path=log_file_path)
 
     ### Update Fields and Hydrologic Group Domain ###
-    SetProgressorLabel('Updating soils fields...')
+    perf.stage('Updating soils fields...')
     AddMsgAndPrint('\nUpdating soils fields...', log_file_path=log_file_path)
 
     if soils_hydro_field.upper() != 'HYDGROUP':
         AddField(output_soils_path, 'HYDGROUP', 'TEXT', field_length='20')
-        CalculateField(output_soils_path, 'HYDGROUP', f"!{soils_hydro_field}!", 'PYTHON3')
+    else:
+        soils_hydro_field = 'HYDGROUP'
+
+    # Read the hydrologic groups once, normalize them, and write back only the rows that change
+    valid_hydro_values = supportTables(support_gdb).values('Hydro_Groups_Domain', 'HydrolGRP')
+    read_fields = list(dict.fromkeys([soils_hydro_field, 'HYDGROUP']))
+    soils_oids, soils_columns = readTextColumns(output_soils_path, read_fields)
+    hydro_values, hydro_report = normalizeHydroGroups(soils_columns[soils_hydro_field], valid_hydro_values)
+    changed = changedRows([soils_columns['HYDGROUP']], [hydro_values])
+    updateRows(output_soils_path, ['HYDGROUP'], {soils_oids[i]: [str(hydro_values[i]) or None] for i in changed})
+
+    if soils_hydro_field != 'HYDGROUP':
         AddMsgAndPrint(f"\nAdded 'HYDGROUP' field to soils table and copied values from '{soils_hydro_field}'...", log_file_path=log_file_path)
+    elif len(changed):
+        AddMsgAndPrint(f"\nNormalized {len(changed)} Hydrologic Group value(s) to upper case without surrounding spaces...", log_file_path=log_file_path)
 
     if not 'Hydro_Domain' in domains:
         TableToDomain(hydro_groups_table, 'HydrolGRP', 'HydrolGRP', wascob_gdb, 'Hydro_Domain', 'Hydro_Domain', 'REPLACE')
@@ -146,21 +184,17 @@ try:
     if delete_fields: DeleteField(output_soils_path, delete_fields)
 
     ### Validate Hydrologic Group Values ###
-    soils_hyrdo_values = set([row[0] for row in SearchCursor(output_soils_path, soils_hydro_field)])
-    where_clause = f"{soils_hydro_field} IS NULL OR {soils_hydro_field} = ''"
-    empty_hydro_values = [row[0] for row in SearchCursor(output_soils_path, soils_hydro_field, where_clause=where_clause)]
-    if len(empty_hydro_values) == 1:
+    empty_hydro_count = int(hydro_report['empty'].sum())
+    if empty_hydro_count == 1:
         AddMsgAndPrint('\tThere is 1 NULL polygon that needs to be attributed with a Hydrologic Group Value.', 1, log_file_path)
-    elif len(empty_hydro_values) > 1:
-        AddMsgAndPrint(f"\tThere are {len(empty_hydro_values)} NULL polygons that need to be attributed with a Hydrologic Group Value.", 1, log_file_path)
+    elif empty_hydro_count > 1:
+        AddMsgAndPrint(f"\tThere are {empty_hydro_count} NULL polygons that need to be attributed with a Hydrologic Group Value.", 1, log_file_path)
 
-    valid_hydro_values = ['A','B','C','D','A/D','B/D','C/D','W']
-    invalid_hydro_values = [val for val in soils_hyrdo_values if not val in valid_hydro_values]
+    invalid_hydro_values = unique(hydro_values[hydro_report['invalid']]).tolist()
     if len(invalid_hydro_values):
         AddMsgAndPrint(f"\tThe following Hydrologic Values are not valid: {str(invalid_hydro_values)}.", 1, log_file_path)
 
-    convert_hydro_values = ['A/D','B/D','C/D','W']
-    hydro_values_to_convert = [val for val in soils_hyrdo_values if val in convert_hydro_values]
+    hydro_values_to_convert = unique(hydro_values[hydro_report['dual'] | (hydro_values == 'W')]).tolist()
     if len(hydro_values_to_convert):
         AddMsgAndPrint(f"\tThe following Hydrologic Values need to be converted: {str(hydro_values_to_convert)} to a single class (e.g. 'B/D' to 'B').", 1, log_file_path)
 
@@ -172,7 +206,7 @@ try:
 
     ### Compact Project GDB ###
     try:
-        SetProgressorLabel('Compacting project geodatabase...')
+        perf.stage('Compacting project geodatabase...')
         AddMsgAndPrint('\nCompacting project geodatabase...', log_file_path=log_file_path)
         Compact(wascob_gdb)
     except:
@@ -190,17 +224,5 @@ except:
         AddMsgAndPrint(errorMsg('Prepare Soil and Land Use Layers (WASCOB)'), 2)
 
 finally:
-    # Clean up memory intermediates
-    memory_datasets = [
-        boundaries_clip_temp,
-        land_use_temp,
-        basins_dissolve_temp
-    ]
-
-    for ds in memory_datasets:
-        try:
-            if Exists(ds):
-                Delete(ds)
-        except:
-            pass
-    emptyScratchGDB(scratch_gdb)
+    perf.finish()
+    scratch.cleanup()
@@ -3,17 +3,18 @@ from os import path
 from sys import argv, exit
 from time import ctime
 
-from arcpy import Describe, env, Exists, GetInstallInfo, GetParameter, GetParameterAsText, SetParameterAsText, SetProgressorLabel
-from arcpy.management import AddField, CalculateField, Compact, CopyFeatures, CreateFeatureDataset, CreateFileGDB, CreateFolder, \
-    DeleteField, MakeFeatureLayer, SelectLayerByAttribute
+from arcpy import Describe, env, Exists, GetInstallInfo, GetParameter, GetParameterAsText, SetParameterAsText
+from arcpy.management import Compact, CreateFeatureDataset, CreateFileGDB, CreateFolder
 from arcpy.mp import ArcGISProject
-from arcpy.sa import Contour, Int, Minus, Plus, Times, ZonalStatistics
+from arcpy.sa import Int, Minus, Plus, Times, ZonalStatistics
 
-from utils import AddMsgAndPrint, emptyScratchGDB, errorMsg, removeMapLayers
+from raster_io import createContours
+from scratch_manager import ScratchManager
+from utils import AddMsgAndPrint, errorMsg, projectLog, removeMapLayers, stageTimer
 
 
 def logBasicSettings(log_file_path, project_dem, input_z_units, relative_survey, contour_interval):
-    with open (log_file_path, 'a+') as f:
+    with projectLog(log_file_path) as f:
         f.write('\n######################################################################\n')
         f.write('Executing Tool: Setup WASCOB Project\n')
         f.write(f"Pro Version: {GetInstallInfo()['Version']}\n")
@@ -56,6 +57,7 @@ if relative_survey and float(contour_interval) not in [0.5, 1, 2, 5, 10]:
 ### Set Paths and Variables ###
 support_dir = path.dirname(argv[0])
 scratch_gdb = path.join(support_dir, 'Scratch.gdb')
+scratch = ScratchManager(scratch_gdb)
 project_workspace = path.dirname(project_gdb)
 project_name = path.basename(project_workspace)
 log_file_path = path.join(project_workspace, f"{project_name}_log.txt")
@@ -70,7 +72,6 @@ wascob_dem_name = f"{project_name}_DEM_WASCOB"
 wascob_dem_path = path.join(wascob_gdb_path, wascob_dem_name)
 contours_name = f"Relative_Contour_{contour_interval.replace('.','_dot_')}"
 contours_path = path.join(wascob_fd_path, contours_name)
-temp_contours_path = f"memory\\{contours_name}"
 
 ### ESRI Environment Settings ###
 dem_desc = Describe(project_dem_path)
@@ -94,46 +95,48 @@ elif input_z_units == 'US Survey Feet':
 elif input_z_units == 'US Survey Inches':
     z_factor = 12.000002400
 
+perf = stageTimer('Setup WASCOB Project', project_workspace, project_dem_path)
+
 try:
     removeMapLayers(map, [wascob_dem_name, contours_name])
     logBasicSettings(log_file_path, project_dem, input_z_units, relative_survey, contour_interval)
 
     ### Create WASCOB GDB, Documents and GIS_Output Folders ###
     if not Exists(wascob_gdb_path):
-        SetProgressorLabel('Creating project geodatabase...')
+        perf.stage('Creating project geodatabase...')
         AddMsgAndPrint('\nCreating project geodatabase...', log_file_path=log_file_path)
         CreateFileGDB(project_workspace, wascob_gdb_name)
 
     if not Exists(wascob_fd_path):
-        SetProgressorLabel('Creating project feature dataset...')
+        perf.stage('Creating project feature dataset...')
         AddMsgAndPrint('\nCreating project feature dataset...', log_file_path=log_file_path)
         CreateFeatureDataset(wascob_gdb_path, 'Layers', dem_sr)
 
     if not Exists(output_dir):
-        SetProgressorLabel('Creating GIS_Output folder...')
+        perf.stage('Creating GIS_Output folder...')
         AddMsgAndPrint('\nCreating GIS_Output folder...', log_file_path=log_file_path)
         CreateFolder(project_workspace, 'GIS_Output')
 
     if not Exists(tables_dir):
-        SetProgressorLabel('Creating Tables folder...')
+        perf.stage('Creating Tables folder...')
         AddMsgAndPrint('\nCreating Tables folder...', log_file_path=log_file_path)
         CreateFolder(output_dir, 'Tables')
 
     if not Exists(documents_dir):
-        SetProgressorLabel('Creating Documents folder...')
+        perf.stage('Creating Documents folder...')
         AddMsgAndPrint('\nCreating Documents folder...', log_file_path=log_file_path)
         CreateFolder(project_workspace, 'Documents')
 
     ### Convert DEM Values to Feet ###
     if input_z_units != 'International Feet':
-        SetProgressorLabel('Converting DEM values to feet...')
+        perf.stage('Converting DEM values to feet...')
         AddMsgAndPrint(f"\nConverting DEM values to feet using z-factor of {z_factor}...", log_file_path=log_file_path)
         project_dem_ft = Times(project_dem, z_factor)
         project_dem = project_dem_ft
 
     ### Adjust DEM Values for Relative Survey ###
     if relative_survey:
-        SetProgressorLabel('Adjusting DEM to relative elevations...')
+        perf.stage('Adjusting DEM to relative elevations...')
         AddMsgAndPrint('\nAdjusting DEM to relative elevations (0 ft. to maximum rise)...', log_file_path=log_file_path)
         min_dem = ZonalStatistics(project_aoi, 'OBJECTID', project_dem, 'MINIMUM', 'DATA')
         # Subtract Minimum Elevation from all cells in AOI
@@ -141,7 +144,7 @@ try:
         project_dem = minus_dem
 
     ### Round DEM Values to Nearest 10th ###
-    SetProgressorLabel('Rounding DEM values to nearest 1/10th ft...')
+    perf.stage('Rounding DEM values to nearest 1/10th ft...')
     AddMsgAndPrint('\nRounding DEM values to nearest 1/10th ft...', log_file_path=log_file_path)
     # Multiply DEM by 10 for rounding
     int_dem = Int(Plus(Times(project_dem, 10),0.5))
@@ -151,35 +154,14 @@ try:
 
     ### Create Relative Contours ###
     if relative_survey:
-        SetProgressorLabel('Creating relative contours...')
+        perf.stage('Creating relative contours...')
         AddMsgAndPrint(f"\nCreating relative contours with a {contour_interval} ft interval...", log_file_path=log_file_path)
         # Z factor to use here is 1 because vertical values of the input DEM have been forced to be feet.
-        Contour(wascob_dem_path, temp_contours_path, contour_interval, '0', 1)
-
-        ### Add Index Field ###
-        DeleteField(temp_contours_path, 'Id')
-        AddField(temp_contours_path, 'Index', 'DOUBLE')
-
-        ### Update Every 5th Index to 1 ###
-        SetProgressorLabel('Updating contour indexing...')
-        AddMsgAndPrint('\nUpdating contour indexing...', log_file_path=log_file_path)
-        MakeFeatureLayer(temp_contours_path, 'contour_lyr')
-        expression = "MOD( \"CONTOUR\"," + str(float(contour_interval) * 5) + ") = 0"
-        SelectLayerByAttribute('contour_lyr', 'NEW_SELECTION', expression)
-        CalculateField('contour_lyr', 'Index', 1, 'PYTHON3')
-
-        ### Update All Other Indexes to 0 ###
-        SelectLayerByAttribute('contour_lyr', 'SWITCH_SELECTION')
-        CalculateField('contour_lyr', 'Index', 0, 'PYTHON3')
-
-        ### Copy Final Contour Output ###
-        SetProgressorLabel('Finalizing contour layer...')
-        AddMsgAndPrint('\nFinalizing lontour layer...', log_file_path=log_file_path)
-        SelectLayerByAttribute('contour_lyr', 'CLEAR_SELECTION')
-        CopyFeatures('contour_lyr', contours_path)
+        contour_count = createContours(wascob_dem_path, contours_path, float(contour_interval), 0, 1)
+        AddMsgAndPrint(f"\tCreated {contour_count} contour lines", log_file_path=log_file_path)
 
     ### Add Output DEM to Map and Symbolize ###
-    SetProgressorLabel('Adding DEM to map...')
+    perf.stage('Adding DEM to map...')
     AddMsgAndPrint('\nAdding DEM to map...', log_file_path=log_file_path)
     map.addDataFromPath(wascob_dem_path)
     dem_layer = map.listLayers(wascob_dem_name)[0]
@@ -196,13 +178,13 @@ try:
     ### Update Layer Order in TOC ###
     if map.listLayers()[0].supports("NAME"):
         if map.listLayers()[0].name == wascob_dem_name:
-            SetProgressorLabel('Updating layer order...')
+            perf.stage('Updating layer order...')
             AddMsgAndPrint('\nUpdating layer order...', log_file_path=log_file_path)
             map.moveLayer(map.listLayers()[1], dem_layer, 'AFTER')
 
     ### Compact Project GDB ###
     try:
-        SetProgressorLabel('Compacting project geodatabase...')
+        perf.stage('Compacting project geodatabase...')
         AddMsgAndPrint('\nCompacting project geodatabase...', log_file_path=log_file_path)
         Compact(wascob_gdb_path)
     except:
@@ -220,4 +202,5 @@ except:
         AddMsgAndPrint(errorMsg('Setup WASCOB Project'), 2)
 
 finally:
-    emptyScratchGDB(scratch_gdb)
+    perf.finish()
+    scratch.cleanup()
@@ -3,16 +3,16 @@ from os import path
 from sys import exit
 from time import ctime
 
-from arcpy import CheckExtension, CheckOutExtension, Describe, env, Exists, GetInstallInfo, GetParameterAsText, SetProgressorLabel
+from arcpy import CheckExtension, CheckOutExtension, Describe, env, Exists, GetInstallInfo, GetParameterAsText
 from arcpy.management import Compact
 from arcpy.mp import ArcGISProject
 from arcpy.sa import Divide, FlowLength, Ln, Plus, Raster, SetNull, Slope, Times
 
-from utils import AddMsgAndPrint, errorMsg, removeMapLayers
+from utils import AddMsgAndPrint, errorMsg, projectLog, removeMapLayers, stageTimer
 
 
 def logBasicSettings(log_file_path, project_dem, min_flow, max_drainage):
-    with open (log_file_path, 'a+') as f:
+    with projectLog(log_file_path) as f:
         f.write('\n######################################################################\n')
         f.write('Executing Tool: Stream Power Index (SPI)\n')
         f.write(f"Pro Version: {GetInstallInfo()['Version']}\n")
@@ -84,6 +84,8 @@ env.cellSize = dem_cell_size
 env.snapRaster = project_dem_path
 env.outputCoordinateSystem = dem_desc.spatialReference
 
+perf = stageTimer('Stream Power Index (SPI)', project_workspace, project_dem_path)
+
 try:
     removeMapLayers(map, [output_spi_name])
     logBasicSettings(log_file_path, project_dem, min_flow, max_drainage)
@@ -93,38 +95,38 @@ try:
     channel_thresh = float(max_drainage) * 4046 / dem_cell_size**2
 
     # Calculate Upstream Flow Length
-    SetProgressorLabel('Calculating upstream flow lengths...')
+    perf.stage('Calculating upstream flow lengths...')
     AddMsgAndPrint('\nCalculating upstream flow lengths...', log_file_path=log_file_path)
     flow_length = FlowLength(Raster(project_flow_direc), 'UPSTREAM')
 
     # Filter Out Overland Flow
-    SetProgressorLabel('Filtering out overland flow...')
+    perf.stage('Filtering out overland flow...')
     AddMsgAndPrint(f"\nFiltering out flow accumulation with overland flow < {min_flow} feet...", log_file_path=log_file_path)
     filter_1 = SetNull(Raster(project_flow_accum), flow_length, f"VALUE < {overland_thresh}")
 
     # Filter Out Channelized Flow
-    SetProgressorLabel('Filtering out channelized flow...')
+    perf.stage('Filtering out channelized flow...')
     AddMsgAndPrint(f"\nFiltering out channelized flow with > {max_drainage} acre drainage area...", log_file_path=log_file_path)
     filter_2 = SetNull(filter_1, filter_1, f"VALUE > {channel_thresh}")
 
     # Calculate percent slope with proper z-factor
-    SetProgressorLabel('Calculating slope percentage...')
+    perf.stage('Calculating slope percentage...')
     AddMsgAndPrint('\nCalculating slope percentage...', log_file_path=log_file_path)
     slope = Slope(project_dem_path, 'PERCENT_RISE', 0.3048)
 
     # Create and Filter Stream Power Index
-    SetProgressorLabel('Calculating stream power index...')
+    perf.stage('Calculating stream power index...')
     AddMsgAndPrint('\nCalculating stream power index...', log_file_path=log_file_path)
     spiTemp = Raster(Ln(Times(Plus(filter_2,0.001),Plus(Divide(slope,100),0.001))))
 
     # Set Index Values < 0 to NULL
-    SetProgressorLabel('Filtering index values less than zero...')
+    perf.stage('Filtering index values less than zero...')
     AddMsgAndPrint('\nFiltering index values less than zero...', log_file_path=log_file_path)
     setNegativeNulls = SetNull(spiTemp, spiTemp, 'VALUE <= 0.0')
     setNegativeNulls.save(output_spi_path)
 
     ### Add Output SPI to Map and Symbolize ###
-    SetProgressorLabel('Adding SPI layer to map...')
+    perf.stage('Adding SPI layer to map...')
     AddMsgAndPrint('\nAdding SPI layer to map...', log_file_path=log_file_path)
     map.addDataFromPath(output_spi_path)
     spi_layer = map.listLayers(output_spi_name)[0]
@@ -138,7 +140,7 @@ try:
 
     ### Compact Project GDB ###
     try:
-        SetProgressorLabel('Compacting project geodatabase...')
+        perf.stage('Compacting project geodatabase...')
         AddMsgAndPrint('\nCompacting project geodatabase...', log_file_path=log_file_path)
         Compact(project_gdb)
     except:
@@ -154,3 +156,6 @@ except:
         AddMsgAndPrint(errorMsg('Stream Power Index (SPI)'), 2, log_file_path)
     except:
         AddMsgAndPrint(errorMsg('Stream Power Index (SPI)'), 2)
+
+finally:
+    perf.finish()
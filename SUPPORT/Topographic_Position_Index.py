@@ -3,16 +3,16 @@ from os import path
 from sys import exit
 from time import ctime
 
-from arcpy import CheckExtension, CheckOutExtension, Describe, env, Exists, GetInstallInfo, GetParameterAsText, SetProgressorLabel
+from arcpy import CheckExtension, CheckOutExtension, Describe, env, Exists, GetInstallInfo, GetParameterAsText
 from arcpy.management import Compact
 from arcpy.mp import ArcGISProject
 from arcpy.sa import FocalStatistics, Minus
 
-from utils import AddMsgAndPrint, errorMsg, removeMapLayers
+from utils import AddMsgAndPrint, errorMsg, projectLog, removeMapLayers, stageTimer
 
 
 def logBasicSettings(log_file_path, project_dem, window_size):
-    with open (log_file_path, 'a+') as f:
+    with projectLog(log_file_path) as f:
         f.write('\n######################################################################\n')
         f.write('Executing Tool: Topographic Position Index (TPI)\n')
         f.write(f"Pro Version: {GetInstallInfo()['Version']}\n")
@@ -57,14 +57,15 @@ else:
 project_workspace = path.dirname(project_gdb)
 project_name = path.basename(project_workspace)
 log_file_path = path.join(project_workspace, f"{project_name}_log.txt")
-extracted_dem_path = path.join(project_gdb, f"{project_name}_DEM_extract") #TODO: validate this exists?
+extracted_dem_path = path.join(project_gdb, f"{project_name}_DEM_extract")
 output_tpi_name = f"{project_name}_TPI_{window_size}"
 output_tpi_path = path.join(project_gdb, output_tpi_name)
 
 ### Locate Extracted (non-smoothed) DEM ###
 if not Exists(extracted_dem_path):
-    AddMsgAndPrint('\nCould not locate the non-smoothed extracted DEM. Run the "Create DEM" tool and try again. Exiting...', 2)
-    exit()
+    AddMsgAndPrint('\nCould not locate the non-smoothed extracted DEM. Using the smoothed project DEM instead...', 1)
+    AddMsgAndPrint('Rerun "Create DEM" with Keep Extracted DEM checked to compute TPI on the non-smoothed DEM.', 1)
+    extracted_dem_path = project_dem_path
 
 ### ESRI Environment Settings ###
 dem_desc = Describe(project_dem_path)
@@ -78,11 +79,13 @@ env.cellSize = dem_cell_size
 env.snapRaster = project_dem_path
 env.outputCoordinateSystem = dem_desc.spatialReference
 
+perf = stageTimer('Topographic Position Index (TPI)', project_workspace, project_dem_path)
+
 try:
     removeMapLayers(map, [output_tpi_name])
     logBasicSettings(log_file_path, project_dem, window_size)
 
-    SetProgressorLabel('Computing Topographic Position Index...')
+    perf.stage('Computing Topographic Position Index...')
     AddMsgAndPrint('Computing Topographic Position Index...', log_file_path=log_file_path)
 
     output_focal_stats = FocalStatistics(extracted_dem_path, f"RECTANGLE {window_size} {window_size} CELL", 'MEAN', 'DATA')
@@ -90,7 +93,7 @@ try:
     output_tpi.save(output_tpi_path)
 
     ### Add Output CTI to Map and Symbolize ###
-    SetProgressorLabel('Adding TPI layer to map...')
+    perf.stage('Adding TPI layer to map...')
     AddMsgAndPrint('\nAdding TPI layer to map...', log_file_path=log_file_path)
     map.addDataFromPath(output_tpi_path)
     tpi_layer = map.listLayers(output_tpi_name)[0]
@@ -111,7 +114,7 @@ try:
 
     ### Compact Project GDB ###
     try:
-        SetProgressorLabel('Compacting project geodatabase...')
+        perf.stage('Compacting project geodatabase...')
         AddMsgAndPrint('\nCompacting project geodatabase...', log_file_path=log_file_path)
         Compact(project_gdb)
     except:
@@ -128,3 +131,6 @@ except:
         AddMsgAndPrint(errorMsg('Topographic Position Index (TPI)'), 2, log_file_path)
     except:
         AddMsgAndPrint(errorMsg('Topographic Position Index (TPI)'), 2)
+
+finally:
+    perf.finish()
@@ -5,7 +5,7 @@ from sys import argv, exit
 from time import ctime
 
 from arcpy import AddFieldDelimiters, CheckExtension, CheckOutExtension, Describe, env, Exists, GetInstallInfo, \
-    GetParameterAsText, ListFields, SetProgressorLabel
+    GetParameterAsText, ListFields
 from arcpy.analysis import Buffer
 from arcpy.da import SearchCursor, UpdateCursor
 from arcpy.ddd import SurfaceVolume
@@ -14,11 +14,12 @@ from arcpy.management import AddField, Append, CalculateField, Compact, CopyRows
 from arcpy.mp import ArcGISProject
 from arcpy.sa import ExtractByMask, Slope, ZonalStatisticsAsTable
 
-from utils import AddMsgAndPrint, emptyScratchGDB, errorMsg
+from scratch_manager import ScratchManager
+from utils import AddMsgAndPrint, errorMsg, projectLog, stageTimer
 
 
 def logBasicSettings(log_file_path, input_basins):
-    with open (log_file_path, 'a+') as f:
+    with projectLog(log_file_path) as f:
         f.write('\n######################################################################\n')
         f.write('Executing Tool: Update WASCOB Attributes\n')
         f.write(f"Pro Version: {GetInstallInfo()['Version']}\n")
@@ -62,6 +63,7 @@ else:
 ### Set Paths and Variables ###
 support_dir = path.dirname(argv[0])
 scratch_gdb = path.join(support_dir, 'Scratch.gdb')
+scratch = ScratchManager(scratch_gdb)
 project_workspace = path.dirname(wascob_gdb)
 project_name = path.basename(project_workspace)
 log_file_path = path.join(project_workspace, f"{project_name}_log.txt")
@@ -69,10 +71,10 @@ wascob_fd = path.join(wascob_gdb, 'Layers')
 wascob_dem_path = path.join(wascob_gdb, f"{project_name}_DEM_WASCOB")
 embankments_name = f"{basins_name}_Embankments"
 embankments_path = path.join(wascob_fd, embankments_name)
-embankment_buffer_temp = r"memory\Embankment_Buffer"
-embankment_stats_temp = r"memory\Embankment_Stats"
-slope_stats_temp = r"memory\Slope_Stats"
-storage_table_temp = r"memory\Storage"
+embankment_buffer_temp = scratch.name('Embankment_Buffer')
+embankment_stats_temp = scratch.name('Embankment_Stats')
+slope_stats_temp = scratch.name('Slope_Stats')
+storage_table_temp = scratch.name('Storage')
 storage_dbf_template = path.join(support_dir, 'storage.dbf')
 tables_dir = path.join(project_workspace, 'GIS_Output', 'Tables')
 storage_dbf = path.join(tables_dir, 'Storage.dbf')
@@ -116,18 +118,20 @@ else:
     AddMsgAndPrint(f"\nUnsupported DEM linear units {dem_linear_units}. Exiting...", 2)
     exit()
 
+perf = stageTimer('Update WASCOB Attributes', project_workspace)
+
 try:
     logBasicSettings(log_file_path, input_basins)
 
     ### Update Basin Acreage ###
-    SetProgressorLabel('Updating basin acreage...')
+    perf.stage('Updating basin acreage...')
     AddMsgAndPrint('\nUpdating basin acreage...', log_file_path=log_file_path)
     if 'Acres' not in [f.name for f in ListFields(basins_path)]:
         AddField(basins_path, 'Acres', 'DOUBLE')
     CalculateField(basins_path, 'Acres', "!shape!.getArea('PLANAR', 'ACRES')", 'PYTHON3')
 
     ### Update Average Slope ###
-    SetProgressorLabel('Updating average slope...')
+    perf.stage('Updating average slope...')
     AddMsgAndPrint('\nUpdating average slope...', log_file_path=log_file_path)
     slope_grid = Slope(wascob_dem_path, 'PERCENT_RISE', z_factor)
     ZonalStatisticsAsTable(basins_path, 'Subbasin', slope_grid, slope_stats_temp, 'DATA')
@@ -215,7 +219,7 @@ try:
     SelectLayerByAttribute(input_basins, 'CLEAR_SELECTION')
 
     ### Finalize Storage Table ###
-    SetProgressorLabel('Finalizing storage table...')
+    perf.stage('Finalizing storage table...')
     AddMsgAndPrint('\nFinalizing storage table...', log_file_path=log_file_path)
 
     if Exists(storage_dbf):
@@ -255,7 +259,7 @@ try:
 
     ### Compact Project GDB ###
     try:
-        SetProgressorLabel('Compacting project geodatabase...')
+        perf.stage('Compacting project geodatabase...')
         AddMsgAndPrint('\nCompacting project geodatabase...', log_file_path=log_file_path)
         Compact(wascob_gdb)
     except:
@@ -273,18 +277,5 @@ except:
         AddMsgAndPrint(errorMsg('Update WASCOB Attributes'), 2)
 
 finally:
-    # Clean up memory intermediates
-    memory_datasets = [
-        embankment_buffer_temp,
-        embankment_stats_temp,
-        slope_stats_temp,
-        storage_table_temp
-    ]
-
-    for ds in memory_datasets:
-        try:
-            if Exists(ds):
-                Delete(ds)
-        except:
-            pass
-    emptyScratchGDB(scratch_gdb)
+    perf.finish()
+    scratch.cleanup()
@@ -4,17 +4,18 @@ from sys import argv, exit
 from time import ctime
 
 from arcpy import AddFieldDelimiters, CheckExtension, CheckOutExtension, Describe, env, Exists, GetInstallInfo, \
-    GetParameterAsText, ListFields, SetProgressorLabel
+    GetParameterAsText, ListFields
 from arcpy.da import SearchCursor, UpdateCursor
-from arcpy.management import AddField, CalculateField, Compact, Delete
+from arcpy.management import AddField, CalculateField, Compact
 from arcpy.mp import ArcGISProject
 from arcpy.sa import Slope, ZonalStatisticsAsTable
 
-from utils import AddMsgAndPrint, emptyScratchGDB, errorMsg
+from scratch_manager import ScratchManager
+from utils import AddMsgAndPrint, errorMsg, projectLog, stageTimer
 
 
 def logBasicSettings(log_file_path, watershed):
-    with open (log_file_path, 'a+') as f:
+    with projectLog(log_file_path) as f:
         f.write('\n######################################################################\n')
         f.write('Executing Tool: Update Watershed Attributes\n')
         f.write(f"Pro Version: {GetInstallInfo()['Version']}\n")
@@ -52,6 +53,7 @@ else:
 ### Set Paths and Variables ###
 support_dir = path.dirname(argv[0])
 scratch_gdb = path.join(support_dir, 'Scratch.gdb')
+scratch = ScratchManager(scratch_gdb)
 project_workspace = path.dirname(project_gdb)
 project_name = path.basename(project_workspace)
 log_file_path = path.join(project_workspace, f"{project_name}_log.txt")
@@ -60,8 +62,8 @@ project_aoi_path = path.join(project_fd, f"{project_name}_AOI")
 project_dem_path = path.join(project_gdb, f"{project_name}_DEM")
 watershed_name = path.basename(watershed_path)
 flow_length_path = path.join(project_fd, f"{watershed_name}_FlowPaths")
-slope_grid_temp = path.join(scratch_gdb, 'Slope_Grid')
-slope_stats_temp = r"memory\Slope_Stats"
+slope_grid_temp = scratch.name('Slope_Grid', in_gdb=True)
+slope_stats_temp = scratch.name('Slope_Stats')
 update_flow_length = False
 
 ### Validate Required Datasets Exist ###
@@ -84,11 +86,13 @@ env.outputCoordinateSystem = dem_desc.spatialReference
 env.workspace = project_gdb
 env.mask = watershed
 
+perf = stageTimer('Update Watershed Attributes', project_workspace, project_dem_path)
+
 try:
     logBasicSettings(log_file_path, watershed)
 
     ### Update Drainage Area(s) ###
-    SetProgressorLabel('Updating drainage area(s)...')
+    perf.stage('Updating drainage area(s)...')
     AddMsgAndPrint('\nUpdating drainage area(s)...', log_file_path=log_file_path)
     if len(ListFields(watershed, 'Acres')) < 1:
         AddField(watershed, 'Acres', 'DOUBLE')
@@ -96,14 +100,14 @@ try:
 
     ### Update Flow Path Length (if present) ###
     if update_flow_length:
-        SetProgressorLabel('Updating flow path length...')
+        perf.stage('Updating flow path length...')
         AddMsgAndPrint('\nUpdating flow path length...', log_file_path=log_file_path)
         if len(ListFields(flow_length_path,'Length_ft')) < 1:
             AddField(flow_length_path, 'Length_ft', 'DOUBLE')
         CalculateField(flow_length_path, 'Length_ft', "!shape!.getLength('PLANAR', 'FEET')", 'PYTHON3')
 
     ### Update Average Slope ###
-    SetProgressorLabel('Updating average slope...')
+    perf.stage('Updating average slope...')
     AddMsgAndPrint('\nUpdating average slope...')
     slope_grid = Slope(project_dem_path, 'PERCENT_RISE', 0.3048) # Z-factor Intl Feet to Meters
     ZonalStatisticsAsTable(watershed_path, 'Subbasin', slope_grid, slope_stats_temp, 'DATA')
@@ -131,7 +135,7 @@ try:
 
     ### Compact Project GDB ###
     try:
-        SetProgressorLabel('Compacting project geodatabase...')
+        perf.stage('Compacting project geodatabase...')
         AddMsgAndPrint('\nCompacting project geodatabase...', log_file_path=log_file_path)
         Compact(project_gdb)
     except:
@@ -149,8 +153,5 @@ except:
         AddMsgAndPrint(errorMsg('Update Watershed Attributes'), 2)
 
 finally:
-    try:
-        Delete(slope_stats_temp)
-    except:
-        pass
-    emptyScratchGDB(scratch_gdb)
+    perf.finish()
+    scratch.cleanup()
@@ -4,16 +4,16 @@ from shutil import copyfile
 from sys import argv, exit
 from time import ctime
 
-from arcpy import Describe, env, Exists, GetInstallInfo, GetParameterAsText, ListFields, SetProgressorLabel
+from arcpy import Describe, env, Exists, GetInstallInfo, GetParameterAsText, ListFields
 from arcpy.conversion import TableToTable
 from arcpy.da import SearchCursor
 from arcpy.mp import ArcGISProject
 
-from utils import AddMsgAndPrint, errorMsg
+from utils import AddMsgAndPrint, errorMsg, projectLog, stageTimer
 
 
 def logBasicSettings(log_file_path, input_basins):
-    with open (log_file_path, 'a+') as f:
+    with projectLog(log_file_path) as f:
         f.write('\n######################################################################\n')
         f.write('Executing Tool: WASCOB Design Worksheet\n')
         f.write(f"Pro Version: {GetInstallInfo()['Version']}\n")
@@ -75,6 +75,8 @@ if not Exists(template_worksheet):
 ### ESRI Environment Settings ###
 env.overwriteOutput = True
 
+perf = stageTimer('WASCOB Design Worksheet', project_workspace)
+
 try:
     logBasicSettings(log_file_path, input_basins)
 
@@ -85,13 +87,13 @@ try:
         exit()
 
     ### Create Tables from Input Basins and RCN ###
-    SetProgressorLabel('\nCreating Basins and RCN tables...')
+    perf.stage('\nCreating Basins and RCN tables...')
     AddMsgAndPrint('\nCreating Basins and RCN tables...', log_file_path=log_file_path)
     TableToTable(input_basins, tables_dir, 'WASCOB_Basins.dbf')
     TableToTable(rcn_path, tables_dir, 'RCN_Summary.dbf')
 
     ### Create WASCOB Worksheet ###
-    SetProgressorLabel('Creating WASCOB Worksheet...')
+    perf.stage('Creating WASCOB Worksheet...')
     AddMsgAndPrint('\nCreating WASCOB Worksheet...', log_file_path=log_file_path)
     output_worksheet = path.join(documents_dir, f"{project_name}_WASCOB.xlsm")
     x = 1
@@ -122,3 +124,6 @@ except:
         AddMsgAndPrint(errorMsg('WASCOB Design Worksheet'), 2, log_file_path)
     except:
         AddMsgAndPrint(errorMsg('WASCOB Design Worksheet'), 2)
+
+finally:
+    perf.finish()
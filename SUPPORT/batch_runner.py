@@ -0,0 +1,235 @@
+''' Run the Engineering Tools workflow over many projects without ArcGIS Pro open.
+
+Run with the ArcGIS Pro Python environment, e.g.:
+
+    propy batch_runner.py plans_2026.yaml --workers 4
+
+The manifest (YAML, which needs PyYAML, or JSON) names the projects and the parameters of each pipeline step, by
+the tool parameter names in the toolbox. Defaults apply to every project and project values override them. String
+values may use {name} and any other top level project field as placeholders:
+
+    workers: 4
+    defaults:
+      CreateStreamNetwork: {stream_threshold: 5}
+      CalculateStageStorage: {analysis_increment: 0.5, create_pool_polygons: false}
+    projects:
+      - name: Smith_Farm
+        folder: D:/Plans/Smith_Farm
+        steps:
+          CreateProject: {output_folder: D:/Plans, output_name: '{name}', output_sr: WGS 1984 UTM Zone 15N}
+          CreateAOI: {project_workspace: '{folder}', input_aoi: D:/Plans/AOIs/Smith.shp}
+          CreateDEM: {Project_AOI: '{folder}/{name}_EngPro.gdb/Layers/{name}_AOI', ...}
+
+A step runs when the defaults or the project give it parameters, in PIPELINE order. Tools run headless: they do
+not need the CURRENT project and skip map operations. Projects run in parallel on a process pool, and each keeps a
+status file in the status folder (by default next to the manifest). A rerun resumes each project after its last
+completed step; a step whose parameters changed runs again along with every step after it, and --restart runs
+every step. Tools reuse outputs whose inputs are unchanged (see provenance.py); --force rebuilds them.'''
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from json import dump, load
+from os import environ, makedirs, path, replace
+from sys import exit
+from time import perf_counter, strftime
+
+try:
+    from yaml import safe_load
+except ImportError:
+    safe_load = None
+
+from arcpy import ExecuteError, GetMessages, ImportToolbox
+
+from utils import FORCE_VARIABLE, HEADLESS_VARIABLE
+
+# Workflow steps by toolbox tool name, in the order they run
+PIPELINE = ('CreateProject', 'CreateAOI', 'CreateDEM', 'CreateStreamNetwork', 'CreateWatershed',
+            'PrepareSoilAndLandUseLayers', 'CalculateRunoffCurveNumber', 'CalculateStageStorage')
+TOOLBOX_ALIAS = 'NRCSEngineeringTools'
+DEFAULT_TOOLBOX = path.join(path.dirname(path.dirname(path.abspath(__file__))), 'NRCS Engineering Tools.atbx')
+
+_toolboxes = {}
+
+
+def loadManifest(manifest_path):
+    ''' Read a YAML or JSON manifest of projects.'''
+    with open(manifest_path) as f:
+        if manifest_path.lower().endswith(('.yaml', '.yml')):
+            if safe_load is None:
+                raise ImportError('PyYAML is required to read YAML manifests; install it or use a JSON manifest.')
+            manifest = safe_load(f)
+        else:
+            manifest = load(f)
+    if not isinstance(manifest, dict) or not isinstance(manifest.get('projects'), list):
+        raise ValueError(f"{manifest_path} does not have a list of projects.")
+    unknown = set(manifest.get('defaults') or {}) - set(PIPELINE)
+    for project in manifest['projects']:
+        if not project.get('name'):
+            raise ValueError(f"A project in {manifest_path} has no name.")
+        unknown |= set(project.get('steps') or {}) - set(PIPELINE)
+    if unknown:
+        raise ValueError(f"Unknown steps in {manifest_path}: {', '.join(sorted(unknown))}. Steps are {', '.join(PIPELINE)}.")
+    return manifest
+
+
+def _fill(value, fields):
+    if isinstance(value, str):
+        return value.format_map(fields)
+    if isinstance(value, list):
+        return [_fill(item, fields) for item in value]
+    return value
+
+
+def projectSteps(project, defaults=None):
+    ''' Return [(step, parameters)] for a project in pipeline order, with defaults merged and placeholders filled.'''
+    defaults = defaults or {}
+    steps = project.get('steps') or {}
+    fields = {key: value for key, value in project.items() if key != 'steps'}
+    project_steps = []
+    for step in PIPELINE:
+        if step not in defaults and step not in steps:
+            continue
+        parameters = dict(defaults.get(step) or {})
+        parameters.update(steps.get(step) or {})
+        project_steps.append((step, {name: _fill(value, fields) for name, value in parameters.items()}))
+    return project_steps
+
+
+def readStatus(status_path):
+    ''' Return a project status record, or an empty one if the project has not run.'''
+    if path.exists(status_path):
+        with open(status_path) as f:
+            return load(f)
+    return {'status': 'pending', 'steps': {}}
+
+
+def writeStatus(status_path, status):
+    ''' Write a project status record, replacing the file in one step so a failure never leaves it partly written.'''
+    status['updated'] = strftime('%Y-%m-%dT%H:%M:%S')
+    temp_path = f"{status_path}.tmp"
+    with open(temp_path, 'w') as f:
+        dump(status, f, indent=2)
+    replace(temp_path, status_path)
+
+
+def pendingSteps(project_steps, status, restart=False):
+    ''' Steps still to run: everything from the first step that did not complete with the same parameters.'''
+    if restart:
+        return project_steps
+    for index, (step, parameters) in enumerate(project_steps):
+        done = status['steps'].get(step, {})
+        if done.get('status') != 'completed' or done.get('parameters') != parameters:
+            return project_steps[index:]
+    return []
+
+
+def _runTool(toolbox, step, parameters):
+    if toolbox not in _toolboxes:
+        _toolboxes[toolbox] = ImportToolbox(toolbox, TOOLBOX_ALIAS)
+    return getattr(_toolboxes[toolbox], step)(**parameters)
+
+
+def runProject(project, defaults, toolbox, status_path, restart=False):
+    ''' Run the pending steps of one project headless, recording each in its status file.
+
+    Returns (project name, status, failed step or None).'''
+    environ[HEADLESS_VARIABLE] = '1'
+    project_steps = projectSteps(project, defaults)
+    status = readStatus(status_path)
+    status['project'] = project['name']
+    if restart:
+        status['steps'] = {}
+
+    for step, parameters in pendingSteps(project_steps, status, restart):
+        record = status['steps'][step] = {'status': 'running', 'parameters': parameters,
+                                          'started': strftime('%Y-%m-%dT%H:%M:%S')}
+        status['status'] = 'running'
+        writeStatus(status_path, status)
+        start = perf_counter()
+        try:
+            _runTool(toolbox, step, parameters)
+            record['status'] = 'completed'
+        except ExecuteError:
+            record['status'] = 'failed'
+            record['messages'] = GetMessages(2)
+        except Exception as e:
+            record['status'] = 'failed'
+            record['messages'] = f"{type(e).__name__}: {e}"
+        record['wall_s'] = round(perf_counter() - start, 2)
+        if record['status'] == 'failed':
+            status['status'] = 'failed'
+            writeStatus(status_path, status)
+            return project['name'], 'failed', step
+
+    status['status'] = 'completed'
+    writeStatus(status_path, status)
+    return project['name'], 'completed', None
+
+
+def runBatch(manifest_path, workers=None, toolbox=None, status_folder=None, restart=False, projects=None, force=False):
+    ''' Run every project of a manifest, or only the named projects, on a process pool.
+
+    Returns {project name: (status, failed step or None)}.'''
+    manifest = loadManifest(manifest_path)
+    defaults = manifest.get('defaults') or {}
+    toolbox = toolbox or manifest.get('toolbox') or DEFAULT_TOOLBOX
+    workers = workers or manifest.get('workers') or 1
+    status_folder = status_folder or manifest.get('status_folder') or \
+        f"{path.splitext(path.abspath(manifest_path))[0]}_status"
+    makedirs(status_folder, exist_ok=True)
+
+    selected = [project for project in manifest['projects'] if not projects or project['name'] in projects]
+    jobs = [(project, defaults, toolbox, path.join(status_folder, f"{project['name']}.json"), restart)
+            for project in selected]
+
+    # Set before the pool starts so worker processes inherit them
+    environ[HEADLESS_VARIABLE] = '1'
+    if force:
+        environ[FORCE_VARIABLE] = '1'
+    results = {}
+
+    def report(name, status, failed_step):
+        results[name] = (status, failed_step)
+        print(f"{len(results)}/{len(jobs)}\t{name}\t{status}{f' at {failed_step}' if failed_step else ''}", flush=True)
+
+    if workers == 1:
+        for job in jobs:
+            report(*runProject(*job))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(runProject, *job): job[0]['name'] for job in jobs}
+            for future in as_completed(futures):
+                try:
+                    report(*future.result())
+                except Exception as e:
+                    report(futures[future], 'failed', f"worker error: {e}")
+    return results
+
+
+def main(argv=None):
+    parser = ArgumentParser(description='Run the Engineering Tools workflow headless over the projects of a manifest.')
+    parser.add_argument('manifest', help='YAML or JSON manifest of projects and step parameters')
+    parser.add_argument('--workers', type=int, help='projects run at once (default: manifest workers or 1)')
+    parser.add_argument('--toolbox', help=f"toolbox to run (default: {path.basename(DEFAULT_TOOLBOX)})")
+    parser.add_argument('--status-folder', help='folder of per-project status files (default: next to the manifest)')
+    parser.add_argument('--restart', action='store_true', help='ignore status files and run every step')
+    parser.add_argument('--force', action='store_true', help='rebuild outputs even when their inputs are unchanged')
+    parser.add_argument('--project', action='append', dest='projects', help='run only this project; repeatable')
+    args = parser.parse_args(argv)
+
+    try:
+        results = runBatch(args.manifest, args.workers, args.toolbox, args.status_folder, args.restart, args.projects,
+                           args.force)
+    except (OSError, ValueError, ImportError) as e:
+        print(f"\n{e} Exiting...")
+        return 2
+
+    failed = sorted(name for name, (status, step) in results.items() if status != 'completed')
+    print(f"\n{len(results) - len(failed)} of {len(results)} projects completed")
+    if failed:
+        print(f"Failed: {', '.join(failed)}. Rerun to resume them after their last completed step.")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -0,0 +1,206 @@
+from numpy import arange, argsort, array, ceil, concatenate, floor, full, int64, isnan, nanmax, nanmin, nonzero, \
+    round as np_round, zeros
+
+# Cell edges: 0 top, 1 right, 2 bottom, 3 left. Corners are bit flags 8 top left, 4 top right, 2 bottom right,
+# 1 bottom left set where the corner is at or above the level. Saddles (5, 10) are resolved by the cell center.
+SEGMENT_TABLE = array([
+    [[-1, -1], [-1, -1]],
+    [[3, 2], [-1, -1]],
+    [[2, 1], [-1, -1]],
+    [[3, 1], [-1, -1]],
+    [[0, 1], [-1, -1]],
+    [[0, 1], [3, 2]],
+    [[0, 2], [-1, -1]],
+    [[0, 3], [-1, -1]],
+    [[0, 3], [-1, -1]],
+    [[0, 2], [-1, -1]],
+    [[0, 3], [2, 1]],
+    [[0, 1], [-1, -1]],
+    [[3, 1], [-1, -1]],
+    [[2, 1], [-1, -1]],
+    [[3, 2], [-1, -1]],
+    [[-1, -1], [-1, -1]]
+])
+SADDLE_CENTER_ABOVE = {5: [[0, 3], [2, 1]], 10: [[0, 1], [3, 2]]}
+
+
+def contourLevels(zmin, zmax, interval, base=0.0):
+    ''' Contour values at base plus multiples of interval within the range of the data.'''
+    first = int(ceil((zmin - base) / interval))
+    last = int(floor((zmax - base) / interval))
+    return base + arange(first, last + 1) * interval
+
+
+def isIndexContour(level, interval, every=5):
+    ''' True where a contour value is a multiple of every * interval, matching MOD(CONTOUR, 5 * interval) = 0.'''
+    ratio = level / (interval * every)
+    return abs(ratio - np_round(ratio)) < 1e-6
+
+
+def _edgeCrossings(z, level, edges, rows, cols, row_offset, total_cols):
+    ''' Fractional (row, col) positions and global keys of the level crossings on one edge of each cell.'''
+    vertical = (edges == 1) | (edges == 3)
+    edge_row = rows + (edges == 2)
+    edge_col = cols + (edges == 1)
+    start = z[edge_row, edge_col]
+    t = (level - start) / (z[edge_row + vertical, edge_col + ~vertical] - start)
+    keys = ((edge_row + row_offset).astype(int64) * total_cols + edge_col) * 2 + vertical
+    return keys, edge_row + t * vertical + row_offset, edge_col + t * ~vertical
+
+
+def cellSegments(z, level, row_offset=0, total_cols=None):
+    ''' Marching squares segments for one level over an array of corner values (cell centers).
+
+    Returns (keys, rows, cols) of the start crossings followed by those of the end crossings, rows being
+    fractional positions in the full raster. Keys identify the crossed edge in
+    the full raster (rows offset by row_offset), so tiles that share a row of corners produce the same keys
+    along their seam. Cells with a NoData corner produce no segments.'''
+    total_cols = total_cols or z.shape[1]
+    above = z >= level
+    case = (above[:-1, :-1] * 8 + above[:-1, 1:] * 4 + above[1:, 1:] * 2 + above[1:, :-1] * 1)
+    no_data = isnan(z)
+    valid = ~(no_data[:-1, :-1] | no_data[:-1, 1:] | no_data[1:, 1:] | no_data[1:, :-1])
+    case = case * valid
+
+    edges = SEGMENT_TABLE[case]
+    saddle = (case == 5) | (case == 10)
+    if saddle.any():
+        rows, cols = nonzero(saddle)
+        center = (z[rows, cols] + z[rows, cols + 1] + z[rows + 1, cols] + z[rows + 1, cols + 1]) / 4
+        for value, center_edges in SADDLE_CENTER_ABOVE.items():
+            flip = (case[rows, cols] == value) & (center >= level)
+            edges[rows[flip], cols[flip]] = center_edges
+
+    ends_a, ends_b = [], []
+    for slot in (0, 1):
+        rows, cols = nonzero(edges[:, :, slot, 0] >= 0)
+        ends_a.append(_edgeCrossings(z, level, edges[rows, cols, slot, 0], rows, cols, row_offset, total_cols))
+        ends_b.append(_edgeCrossings(z, level, edges[rows, cols, slot, 1], rows, cols, row_offset, total_cols))
+    return tuple(concatenate(values) for values in zip(*ends_a)) + tuple(concatenate(values) for values in zip(*ends_b))
+
+
+def _partners(key_a, key_b):
+    ''' For each segment end (a ends first, then b ends) the other end sharing its crossing key, or -1.'''
+    keys = concatenate((key_a, key_b))
+    order = argsort(keys, kind='stable')
+    shared = nonzero(keys[order][1:] == keys[order][:-1])[0]
+    partner = full(keys.size, -1)
+    partner[order[shared]] = order[shared + 1]
+    partner[order[shared + 1]] = order[shared]
+    return partner
+
+
+def _otherEnd(end, count):
+    return end + count if end < count else end - count
+
+
+def walkChains(key_a, key_b):
+    ''' Link segments sharing crossing keys into chains.
+
+    Yields (ends, closed) where ends lists the segment end at which each segment of the chain is entered
+    (indexes below the segment count are a ends, the rest b ends).'''
+    count = key_a.size
+    partner = _partners(key_a, key_b).tolist()
+    visited = zeros(count, bool)
+    for segment in range(count):
+        if visited[segment]:
+            continue
+        # Walk backwards to the start of an open chain
+        entry = segment
+        closed = False
+        while True:
+            previous = partner[entry]
+            if previous == -1:
+                break
+            previous_segment = previous % count
+            if previous_segment == segment:
+                closed = True
+                entry = segment
+                break
+            entry = _otherEnd(previous, count)
+
+        ends = []
+        while True:
+            current = entry % count
+            visited[current] = True
+            ends.append(entry)
+            following = partner[_otherEnd(entry, count)]
+            if following == -1 or visited[following % count]:
+                break
+            entry = following
+        yield ends, closed
+
+
+def segmentChains(key_a, row_a, col_a, key_b, row_b, col_b):
+    ''' Chain cell segments into lines of fractional (row, col) positions.
+
+    Returns closed lines and open lines; open lines carry their first and last crossing keys for stitching.'''
+    count = key_a.size
+    keys = concatenate((key_a, key_b))
+    rows = concatenate((row_a, row_b))
+    cols = concatenate((col_a, col_b))
+    closed_lines, open_lines = [], []
+    for ends, closed in walkChains(key_a, key_b):
+        points = array(ends + [_otherEnd(ends[-1], count)])
+        line = (rows[points], cols[points])
+        if closed:
+            closed_lines.append(line)
+        else:
+            open_lines.append((keys[points[0]], keys[points[-1]], line))
+    return closed_lines, open_lines
+
+
+def stitchChains(open_lines):
+    ''' Join open lines from neighbouring tiles that end on the same crossing key.
+
+    Returns closed and open lines of (row, col) arrays.'''
+    if not open_lines:
+        return [], []
+    count = len(open_lines)
+    key_a = array([line[0] for line in open_lines], int64)
+    key_b = array([line[1] for line in open_lines], int64)
+    closed_lines, stitched = [], []
+    for ends, closed in walkChains(key_a, key_b):
+        rows, cols = [], []
+        for end in ends:
+            line_rows, line_cols = open_lines[end % count][2]
+            if end >= count:
+                line_rows, line_cols = line_rows[::-1], line_cols[::-1]
+            # Consecutive lines share their joining crossing point
+            start = 1 if rows else 0
+            rows.append(line_rows[start:])
+            cols.append(line_cols[start:])
+        line = (concatenate(rows), concatenate(cols))
+        (closed_lines if closed else stitched).append(line)
+    return closed_lines, stitched
+
+
+def contourTile(z, interval, base=0.0, row_offset=0, total_cols=None):
+    ''' Contour one tile of corner values at every level within its data range.
+
+    Returns (level, closed lines, open lines) for each level with segments in the tile.'''
+    results = []
+    if isnan(z).all():
+        return results
+    for level in contourLevels(*dataRange(z), interval, base):
+        segments = cellSegments(z, level, row_offset, total_cols)
+        if segments[0].size:
+            results.append((level,) + segmentChains(*segments))
+    return results
+
+
+def tileRanges(nrows, tile_rows):
+    ''' Yield (start, stop) corner row ranges for tiles that overlap their neighbours by one row of corners.'''
+    for start in range(0, max(nrows - 1, 1), tile_rows):
+        yield start, min(start + tile_rows + 1, nrows)
+
+
+def dataRange(z):
+    ''' Minimum and maximum of the data cells of an array.'''
+    return float(nanmin(z)), float(nanmax(z))
+
+
+def gridToMap(line, xmin, ymax, cell_width, cell_height):
+    ''' Convert fractional (row, col) cell center positions to map XY coordinates.'''
+    rows, cols = line
+    return xmin + (cols + 0.5) * cell_width, ymax - (rows + 0.5) * cell_height
@@ -0,0 +1,273 @@
+from numpy import abs as np_abs, append, arange, clip, column_stack, concatenate, diff, empty, flatnonzero, float32, full, \
+    hstack, int32, isnan, log, median, meshgrid, minimum, nan, nonzero, ones, pad, searchsorted, unique, vstack, where, zeros
+from numpy.linalg import lstsq, solve
+
+# Values held by each cells-by-points distance array when evaluating correction surfaces
+SURFACE_CHUNK_ELEMENTS = 4000000
+# Cells between the nodes a correction surface is evaluated at before bilinear interpolation
+CORRECTION_GRID_STEP = 16
+
+
+def iterRowBlocks(nrows, block_rows, halo=0):
+    ''' Yield (read_start, read_stop, start, stop) row ranges covering a raster in blocks with a halo.'''
+    for start in range(0, nrows, block_rows):
+        stop = min(start + block_rows, nrows)
+        yield max(start - halo, 0), min(stop + halo, nrows), start, stop
+
+
+def padRowHalo(block, top, bottom):
+    ''' Pad a block with NoData (NaN) rows where the halo runs past the raster edge.'''
+    if top == 0 and bottom == 0:
+        return block
+    ncols = block.shape[1]
+    return vstack([full((top, ncols), nan, block.dtype), block, full((bottom, ncols), nan, block.dtype)])
+
+
+def focalMean3x3(block):
+    ''' 3x3 mean ignoring NoData, matching FocalStatistics RECTANGLE 3 3 CELL MEAN DATA.
+
+    The block carries one halo row above and below; the returned array covers the core rows only.'''
+    valid = ~isnan(block)
+    values = pad(where(valid, block, 0), ((0, 0), (1, 1)))
+    counts = pad(valid.astype(float32), ((0, 0), (1, 1)))
+    nrows, ncols = block.shape[0] - 2, block.shape[1]
+    total = zeros((nrows, ncols), float32)
+    count = zeros((nrows, ncols), float32)
+    for r in range(3):
+        for c in range(3):
+            total += values[r:r+nrows, c:c+ncols]
+            count += counts[r:r+nrows, c:c+ncols]
+    with_data = count > 0
+    return where(with_data, total / where(with_data, count, 1), nan).astype(float32)
+
+
+def finalizeDEMBlock(block, z_factor):
+    ''' Convert a filled DEM block to international feet and smooth it with a 3x3 mean in one pass.'''
+    return focalMean3x3(block) * float32(z_factor)
+
+
+def labelRegions(mask):
+    ''' Label 8-connected regions of a boolean mask, working on row runs so cost follows region perimeter.'''
+    nrows = mask.shape[0]
+    labels = zeros(mask.shape, int32)
+    parent = []
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    runs = []
+    previous = []
+    for row in range(nrows):
+        edges = flatnonzero(diff(concatenate(([0], mask[row].view('i1'), [0]))))
+        current = []
+        j = 0
+        for start, stop in zip(edges[::2], edges[1::2]):
+            run_id = len(parent)
+            parent.append(run_id)
+            # Runs on the previous row touching [start-1, stop] are 8-connected to this run
+            while j < len(previous) and previous[j][1] < start:
+                j += 1
+            k = j
+            while k < len(previous) and previous[k][0] <= stop:
+                root_a, root_b = find(previous[k][2]), find(run_id)
+                if root_a != root_b:
+                    parent[max(root_a, root_b)] = min(root_a, root_b)
+                k += 1
+            current.append((start, stop, run_id))
+            runs.append((row, start, stop, run_id))
+        previous = current
+
+    roots = {}
+    for row, start, stop, run_id in runs:
+        labels[row, start:stop] = roots.setdefault(find(run_id), len(roots) + 1)
+    return labels, len(roots)
+
+
+def interiorNullMask(array):
+    ''' Return NoData cells that are enclosed by data, excluding NoData connected to the raster edge.'''
+    null_mask = isnan(array)
+    labels, count = labelRegions(null_mask)
+    if count == 0:
+        return null_mask
+    edge_labels = unique(concatenate((labels[0], labels[-1], labels[:, 0], labels[:, -1])))
+    exterior = zeros(count + 1, bool)
+    exterior[edge_labels] = True
+    exterior[0] = True
+    return ~exterior[labels]
+
+
+def fillNullGaps(array, max_distance, fill_mask=None):
+    ''' Fill NoData gaps inward from their edges with the mean of valid 8-neighbours.
+
+    fill_mask marks the cells that may be filled, e.g. those inside the AOI; without it only NoData enclosed by
+    data is filled. Only the remaining gap cells are visited on each pass, so work scales with gap size. Gaps wider
+    than twice max_distance cells are left partially filled. Returns the filled array and the count of filled cells.'''
+    gaps = isnan(array) & fill_mask if fill_mask is not None else interiorNullMask(array)
+    filled = pad(array.astype(float32), 1, constant_values=nan)
+    rows, cols = nonzero(pad(gaps, 1))
+    offsets = [(dr, dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1) if (dr, dc) != (0, 0)]
+    filled_count = 0
+
+    for distance in range(max_distance):
+        if rows.size == 0:
+            break
+        total = zeros(rows.size, float32)
+        count = zeros(rows.size, float32)
+        for dr, dc in offsets:
+            neighbours = filled[rows + dr, cols + dc]
+            valid = ~isnan(neighbours)
+            total[valid] += neighbours[valid]
+            count[valid] += 1
+        frontier = count > 0
+        if not frontier.any():
+            break
+        # Assign after all neighbours are read so each pass grows the fill by exactly one cell
+        filled[rows[frontier], cols[frontier]] = total[frontier] / count[frontier]
+        filled_count += int(frontier.sum())
+        rows, cols = rows[~frontier], cols[~frontier]
+
+    return filled[1:-1, 1:-1], filled_count
+
+
+def rejectOutliers(residuals, threshold=3.0, max_iterations=5):
+    ''' Return a mask of residuals kept after iterative median absolute deviation rejection.'''
+    keep = ~isnan(residuals)
+    for iteration in range(max_iterations):
+        center = median(residuals[keep])
+        spread = 1.4826 * median(np_abs(residuals[keep] - center))
+        if spread == 0:
+            break
+        new_keep = keep & (np_abs(residuals - center) <= threshold * spread)
+        if (new_keep == keep).all():
+            break
+        keep = new_keep
+    return keep
+
+
+def planeResiduals(px, py, values, keep):
+    ''' Residuals of values from a least squares plane fit to the kept points; NaN values stay NaN.'''
+    x, y = px - px[keep].mean(), py - py[keep].mean()
+    design = column_stack([ones(x.size), x, y])
+    coefficients = lstsq(design[keep], values[keep], rcond=None)[0]
+    return values - design @ coefficients
+
+
+def rejectSurfaceOutliers(px, py, values, threshold=3.0, max_iterations=5):
+    ''' Return a mask of points kept after rejecting outliers from the residuals of a fitted plane.
+
+    The plane absorbs any tilt in the differences, so points are judged on their departure from the trend rather
+    than from the average. Under three points there is no plane and the differences themselves are used.'''
+    keep = ~isnan(values)
+    for iteration in range(max_iterations):
+        residuals = planeResiduals(px, py, values, keep) if keep.sum() >= 3 else values
+        new_keep = rejectOutliers(residuals, threshold) & ~isnan(values)
+        if (new_keep == keep).all():
+            break
+        keep = new_keep
+    return keep
+
+
+def surfaceChunkSize(points, chunk_elements=SURFACE_CHUNK_ELEMENTS):
+    ''' Coordinates evaluated at a time against points so each distance array holds about chunk_elements values.'''
+    return max(chunk_elements // max(points, 1), 1)
+
+
+def idwSurface(px, py, values, x, y, power=2.0, chunk_elements=SURFACE_CHUNK_ELEMENTS):
+    ''' Inverse distance weighted surface from point residuals evaluated at arrays of XY coordinates.'''
+    x, y = x.ravel(), y.ravel()
+    result = empty(x.size)
+    chunk_size = surfaceChunkSize(px.size, chunk_elements)
+    for start in range(0, x.size, chunk_size):
+        stop = min(start + chunk_size, x.size)
+        d2 = (x[start:stop, None] - px[None, :])**2 + (y[start:stop, None] - py[None, :])**2
+        exact = d2 == 0
+        weights = 1.0 / where(exact, 1, d2)**(power / 2.0)
+        estimate = (weights * values).sum(axis=1) / weights.sum(axis=1)
+        hit = exact.any(axis=1)
+        if hit.any():
+            estimate[hit] = values[exact[hit].argmax(axis=1)]
+        result[start:stop] = estimate
+    return result
+
+
+def _tpsKernel(d2):
+    with_distance = d2 > 0
+    return where(with_distance, 0.5 * d2 * log(where(with_distance, d2, 1)), 0)
+
+
+def fitThinPlateSpline(px, py, values, smoothing=0.0):
+    ''' Solve thin-plate spline weights and affine terms for point residuals.
+
+    Coordinates are centered and scaled before solving; the returned tuple is consumed by thinPlateSurface.'''
+    x0, y0 = px.mean(), py.mean()
+    scale = max(px.max() - px.min(), py.max() - py.min(), 1.0)
+    u, v = (px - x0) / scale, (py - y0) / scale
+    n = px.size
+    kernel = _tpsKernel((u[:, None] - u[None, :])**2 + (v[:, None] - v[None, :])**2)
+    kernel[range(n), range(n)] += smoothing
+    affine = column_stack((ones(n), u, v))
+    system = vstack((hstack((kernel, affine)), hstack((affine.T, zeros((3, 3))))))
+    coefficients = solve(system, concatenate((values, zeros(3))))
+    return (x0, y0, scale, u, v, coefficients[:n], coefficients[n:])
+
+
+def thinPlateSurface(spline, x, y, chunk_elements=SURFACE_CHUNK_ELEMENTS):
+    ''' Evaluate a fitted thin-plate spline at arrays of XY coordinates.'''
+    x0, y0, scale, u, v, weights, affine = spline
+    x, y = (x.ravel() - x0) / scale, (y.ravel() - y0) / scale
+    result = empty(x.size)
+    chunk_size = surfaceChunkSize(u.size, chunk_elements)
+    for start in range(0, x.size, chunk_size):
+        stop = min(start + chunk_size, x.size)
+        d2 = (x[start:stop, None] - u[None, :])**2 + (y[start:stop, None] - v[None, :])**2
+        result[start:stop] = _tpsKernel(d2) @ weights + affine[0] + affine[1] * x[start:stop] + affine[2] * y[start:stop]
+    return result
+
+
+def blockCoordinates(start, shape, xmin, ymax, cell_width, cell_height):
+    ''' Return X and Y cell-center coordinate grids for a block of rows starting at row start.'''
+    x = xmin + (arange(shape[1]) + 0.5) * cell_width
+    y = ymax - (arange(start, start + shape[0]) + 0.5) * cell_height
+    return meshgrid(x, y)
+
+
+def _gridNodes(count, step):
+    nodes = arange(0, count, step)
+    return nodes if nodes[-1] == count - 1 else append(nodes, count - 1)
+
+
+def _linearWeights(nodes, count):
+    ''' Lower node index and fraction toward the next node for each of count cells.'''
+    cells = arange(count)
+    if nodes.size == 1:
+        return zeros(count, int), zeros(count)
+    lower = clip(searchsorted(nodes, cells, 'right') - 1, 0, nodes.size - 2)
+    return lower, (cells - nodes[lower]) / (nodes[lower + 1] - nodes[lower])
+
+
+def applyCorrectionBlock(block, start, surface_function, xmin, ymax, cell_width, cell_height, grid_step=CORRECTION_GRID_STEP):
+    ''' Add a correction surface to the data cells of a DEM block.
+
+    The surface is evaluated every grid_step cells, including the first and last row and column of the block, and
+    interpolated bilinearly between, so its cost depends on the number of nodes rather than cells.'''
+    data = ~isnan(block)
+    corrected = block.copy()
+    if not data.any():
+        return corrected
+    nrows, ncols = block.shape
+    row_nodes, col_nodes = _gridNodes(nrows, grid_step), _gridNodes(ncols, grid_step)
+    x = xmin + (col_nodes + 0.5) * cell_width
+    y = ymax - (start + row_nodes + 0.5) * cell_height
+    node_x, node_y = meshgrid(x, y)
+    nodes = surface_function(node_x.ravel(), node_y.ravel()).reshape(node_x.shape)
+    row, row_fraction = _linearWeights(row_nodes, nrows)
+    col, col_fraction = _linearWeights(col_nodes, ncols)
+    next_row, next_col = minimum(row + 1, row_nodes.size - 1), minimum(col + 1, col_nodes.size - 1)
+    top = nodes[row][:, col] * (1 - col_fraction) + nodes[row][:, next_col] * col_fraction
+    bottom = nodes[next_row][:, col] * (1 - col_fraction) + nodes[next_row][:, next_col] * col_fraction
+    surface = top * (1 - row_fraction)[:, None] + bottom * row_fraction[:, None]
+    corrected[data] += surface[data].astype(float32)
+    return corrected
@@ -0,0 +1,117 @@
+from numpy import abs as np_abs, arange, asarray, ceil, concatenate, cumprod, cumsum, diff, hypot, isnan, maximum, nan, \
+    where
+
+from profile_engine import interpolateStations
+
+CUBIC_FEET_PER_YARD = 27.0
+
+
+def templateDepths(ground, top_elevation, distance, top_width, side_slope):
+    ''' Cut and fill depths of ground against a trapezoidal template centered on a line.
+
+    distance is the horizontal distance from the centerline in feet. Past the edge of the top the template
+    falls at side_slope (H:V) where ground is below it and rises at side_slope where ground is above it.
+    Each point is taken on its own, so nothing ends the side slopes where they meet the ground; see daylightDepths.
+    NoData ground has no cut or fill.'''
+    drop = maximum(distance - top_width / 2.0, 0) / side_slope
+    cut = maximum(ground - (top_elevation + drop), 0)
+    fill = maximum(top_elevation - drop - ground, 0)
+    no_data = isnan(ground)
+    return where(no_data, 0, cut), where(no_data, 0, fill)
+
+
+def daylightDepths(cut, fill, offsets, top_width):
+    ''' Clip the (stations, offsets) cut and fill depths of cross sections at their daylight points.
+
+    Past each edge of the top the side slope is a fill slope where the ground at the edge is below the top and a
+    cut slope otherwise, and it ends at the first offset outward where it no longer cuts or fills the ground.
+    offsets run from -reach to reach.'''
+    offsets = asarray(offsets, float)
+    cut, fill = cut.copy(), fill.copy()
+    for side in ((offsets < -top_width / 2.0).nonzero()[0][::-1], (offsets > top_width / 2.0).nonzero()[0]):
+        if side.size == 0:
+            continue
+        side_cut, side_fill = cut[:, side], fill[:, side]
+        fill_slope = side_fill[:, :1] > 0
+        active = cumprod(where(fill_slope, side_fill, side_cut) > 0, axis=1).astype(bool)
+        cut[:, side] = where(active & ~fill_slope, side_cut, 0)
+        fill[:, side] = where(active & fill_slope, side_fill, 0)
+    return cut, fill
+
+
+def fitGrade(stations, ground, grade=None):
+    ''' Least squares design grade line (elevation at station 0, rise per foot) of a ground profile, ignoring NoData.
+
+    With grade only the elevation is fitted. Returns None for a profile with no data.'''
+    stations, ground = asarray(stations, float), asarray(ground, float)
+    valid = ~isnan(ground)
+    if not valid.any():
+        return None
+    stations, ground = stations[valid], ground[valid]
+    if grade is None:
+        spread = ((stations - stations.mean())**2).sum()
+        grade = ((stations - stations.mean()) * (ground - ground.mean())).sum() / spread if spread > 0 else 0.0
+    return float((ground - grade * stations).mean()), float(grade)
+
+
+def gradeElevations(design, stations):
+    ''' Design elevations at stations (feet) along a line from its (elevation at station 0, rise per foot) grade.'''
+    return design[0] + design[1] * asarray(stations, float)
+
+
+def sectionReach(top_width, side_slope, relief):
+    ''' Half width (feet) a section must span to reach ground with up to relief feet of cut or fill.'''
+    return top_width / 2.0 + side_slope * relief
+
+
+def sectionOffsets(reach, spacing):
+    ''' Symmetric cross section offsets from -reach to reach at spacing.'''
+    count = int(ceil(reach / spacing))
+    return arange(-count, count + 1) * spacing
+
+
+def stationNormals(parts, stations, length):
+    ''' Unit normals (left of the line direction) at stations measured along a line.'''
+    step = min(0.5, length / 2.0)
+    stations = asarray(stations, float)
+    x0, y0 = interpolateStations(parts, maximum(stations - step, 0), length)
+    x1, y1 = interpolateStations(parts, where(stations + step > length, length, stations + step), length)
+    dx, dy = x1 - x0, y1 - y0
+    norm = hypot(dx, dy)
+    norm = where(norm > 0, norm, 1)
+    return -dy / norm, dx / norm
+
+
+def sectionPoints(x, y, normal_x, normal_y, offsets):
+    ''' XY coordinates of every (station, offset) cross section point.'''
+    return x[:, None] + normal_x[:, None] * offsets[None, :], y[:, None] + normal_y[:, None] * offsets[None, :]
+
+
+def sectionAreas(ground, top_elevation, offsets, top_width, side_slope):
+    ''' Cut and fill end areas (square feet) of each station's ground section, integrated over offsets in feet
+    and clipped where the side slopes daylight.
+
+    ground is a (stations, offsets) array; top_elevation is a scalar or one value per station.'''
+    top = asarray(top_elevation, float)
+    top = top[:, None] if top.ndim else top
+    cut, fill = templateDepths(ground, top, np_abs(offsets)[None, :], top_width, side_slope)
+    cut, fill = daylightDepths(cut, fill, offsets, top_width)
+    widths = diff(offsets)[None, :]
+    return ((cut[:, 1:] + cut[:, :-1]) / 2 * widths).sum(axis=1), ((fill[:, 1:] + fill[:, :-1]) / 2 * widths).sum(axis=1)
+
+
+def averageEndAreaVolumes(stations, cut_area, fill_area):
+    ''' Cumulative cut and fill volumes (cubic yards) at each station by the average end area method.'''
+    lengths = diff(asarray(stations, float))
+    cut_volume = concatenate(([0], cumsum((cut_area[1:] + cut_area[:-1]) / 2 * lengths))) / CUBIC_FEET_PER_YARD
+    fill_volume = concatenate(([0], cumsum((fill_area[1:] + fill_area[:-1]) / 2 * lengths))) / CUBIC_FEET_PER_YARD
+    return cut_volume, fill_volume
+
+
+def cutFillBlock(ground, distance, top_elevation, top_width, side_slope):
+    ''' Cut (positive) and fill (negative) depths of a DEM block against the template of its nearest line.
+
+    Cells outside the template footprint are NoData.'''
+    cut, fill = templateDepths(ground, top_elevation, distance, top_width, side_slope)
+    footprint = (cut > 0) | (fill > 0) | (distance <= top_width / 2.0)
+    return where(footprint & ~isnan(ground), cut - fill, nan)
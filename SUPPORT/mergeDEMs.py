@@ -8,28 +8,24 @@
 
 ## ================================================================================================================ 
 def print_exception():
-    
-    tb = sys.exc_info()[2]
-    l = traceback.format_tb(tb)
-    l.reverse()
-    tbinfo = "".join(l)
-    AddMsgAndPrint("\n----------ERROR Start-------------------\n",2)
-    AddMsgAndPrint("Traceback Info: \n" + tbinfo + "Error Info: \n    " +  str(sys.exc_type)+ ": " + str(sys.exc_value) + "",2)
-    AddMsgAndPrint("----------ERROR End-------------------- \n",2)
+
+    theMsg = errorMsg("Clip and Merge Adjacent DEM")
+    if theMsg:
+        AddMsgAndPrint(theMsg,2)
 
 ## ================================================================================================================    
 def AddMsgAndPrint(msg, severity=0):
     # prints message to screen if run as a python script
     # Adds tool message to the geoprocessor
-    # Split the message on  \n first, so that if it's multiple lines, a GPMessage will be added for each line
+    # Writes message to the buffered project log
 
     print(msg)
     
     try:
-        f = open(textFilePath,'a+')
-        f.write(msg + " \n")
-        f.close
-        del f
+        log = projectLog(textFilePath)
+        log.write(msg + " \n")
+        if severity == 2:
+            log.flush()
         
         if severity == 0:
             arcpy.AddMessage(msg)
@@ -47,7 +43,7 @@ def logBasicSettings():
 
     import getpass, time
 
-    f = open(textFilePath,'a+')
+    f = projectLog(textFilePath)
     f.write("\n##################################################################\n")
     f.write("Executing \"Clip and Merge Adjacent DEM\" Tool\n")
     f.write("User Name: " + getpass.getuser() + "\n")
@@ -63,7 +59,11 @@ def logBasicSettings():
 
 ## ================================================================================================================
 # Import system modules
-import arcpy, sys, os, traceback
+import arcpy, numpy, sys, os
+
+from dem_processing import fillNullGaps
+from raster_io import processRasterInBlocks
+from utils import closeProjectLogs, errorMsg, projectLog
 #import arcgisscripting
 
 # Environment settings
@@ -119,6 +119,14 @@ try:
     del x
     
     projectAOI = watershedFD + os.sep + os.path.basename(mergedDEM) + "_AOI"
+
+    # Widest gap (in cells, from each side) closed between merged rasters; optional parameter, 25 cells by default
+    maxGapDistance = 25
+    if arcpy.GetArgumentCount() > 5 and arcpy.GetParameterAsText(5):
+        maxGapDistance = int(arcpy.GetParameterAsText(5))
+    if maxGapDistance < 1:
+        AddMsgAndPrint("\n\nThe maximum gap distance must be at least 1 cell. Exiting...\n",2)
+        sys.exit()
     
     # Start log file
     textFilePath = userWorkspace + os.sep + projectName + "_EngTools.txt"
@@ -126,6 +134,7 @@ try:
     
     # ------------------------------------------------------------------ Intermediate Data
     tempDEM = watershedGDB_path + os.sep + "tempDEM"
+    tempAOI = watershedGDB_path + os.sep + "tempAOI"
     #outCLip = userWorkspace + os.sep + "clip" --- defined below in loop
 
     # ------------------------------- Map Layers
@@ -273,22 +282,29 @@ try:
     
     del grids
 
-    # ------------------------------------------------------------------------------------------------- Fill any gaps with focal mean
-    # RasterCalculator is not available in arcpy. Need to do this as separate steps now (10.16.2019).
-    # 1. Create the focal mean surface.
-    # 2. Execute Con and if null, then use the focal mean surface, else use the normal surface.
-    outFocal = arcpy.sa.FocalStatistics(tempDEM, "RECTANGLE 3 3 CELL", "MEAN", "DATA")
-    outCon = arcpy.sa.Con(arcpy.sa.IsNull(tempDEM), outFocal, tempDEM)
-    outCon.save(mergedDEM)
-    arcpy.Delete_management(outFocal)
-    
-##    expression = "con(isnull([" + str(tempDEM) + "]),focalmean([" + str(tempDEM) + "], rectangle, 3, 3, DATA),[" + str(tempDEM) + "])"
-##    outSOMA = arcpy.sa.RasterCalculator(expression)
-##    outSOMA.save(mergedDEM)
-    
-    AddMsgAndPrint("\nSuccessfully removed any gaps in merged data",0)
+    # ------------------------------------------------------------------------------------------------- Fill any gaps between merged rasters
+    # NoData inside the AOI is filled, working inward from the gap edges one cell per pass until the gap
+    # closes or maxGapDistance cells is reached. NoData outside the AOI is left alone. The AOI is rasterized
+    # on the merged grid and both are read in row windows with a halo of maxGapDistance rows.
+    arcpy.env.extent = tempDEM
+    arcpy.env.snapRaster = tempDEM
+    arcpy.PolygonToRaster_conversion(projectAOI, arcpy.Describe(projectAOI).OIDFieldName, tempAOI, "CELL_CENTER", "", cellSize)
+    arcpy.env.extent = "MINOF"
+    arcpy.env.snapRaster = ""
+
+    filledCells = [0]
+    def fillGapBlock(block, start, aoiBlock):
+        filledBlock, count = fillNullGaps(block, maxGapDistance, aoiBlock)
+        core = slice(maxGapDistance, block.shape[0] - maxGapDistance)
+        filledCells[0] += int((numpy.isnan(block[core]) & ~numpy.isnan(filledBlock[core])).sum())
+        return filledBlock[core]
+
+    processRasterInBlocks(tempDEM, mergedDEM, fillGapBlock, halo=maxGapDistance, mask_raster=tempAOI)
+
+    AddMsgAndPrint("\nSuccessfully filled " + str(filledCells[0]) + " gap cells in merged data",0)
 
     arcpy.Delete_management(tempDEM) 
+    arcpy.Delete_management(tempAOI)
 ##    del expression   
 
     # ----------------------------------------------------------------------------------------------------- Delete intermediate data
@@ -333,4 +349,6 @@ except KeyboardInterrupt:
 
 except:
     print_exception()     
-    
+
+finally:
+    closeProjectLogs()
@@ -0,0 +1,86 @@
+from json import dump, load
+from math import ceil, floor
+from os import listdir, path, replace
+
+INDEX_NAME = 'nlcd_index.json'
+TILE_EXTENSIONS = ('.tif', '.tiff', '.img')
+
+
+def gridWindow(xmin, ymin, xmax, ymax, origin_x, origin_y, cell_size):
+    ''' (first column, first row, columns, rows) of the cells of a grid with its upper left corner at origin that
+    cover an extent.'''
+    first_col, last_col = floor((xmin - origin_x) / cell_size), ceil((xmax - origin_x) / cell_size)
+    first_row, last_row = floor((origin_y - ymax) / cell_size), ceil((origin_y - ymin) / cell_size)
+    return first_col, first_row, max(last_col - first_col, 1), max(last_row - first_row, 1)
+
+
+def windowOverlap(window, other):
+    ''' Overlap of two (first column, first row, columns, rows) windows on the same grid as (column offset in window,
+    row offset in window, column offset in other, row offset in other, columns, rows), or None.'''
+    first_col, first_row = max(window[0], other[0]), max(window[1], other[1])
+    last_col = min(window[0] + window[2], other[0] + other[2])
+    last_row = min(window[1] + window[3], other[1] + other[3])
+    if last_col <= first_col or last_row <= first_row:
+        return None
+    return (first_col - window[0], first_row - window[1], first_col - other[0], first_row - other[1],
+            last_col - first_col, last_row - first_row)
+
+
+class TileIndex:
+    ''' JSON index of the bounds of pre-split raster tiles that share one grid, kept in the tile folder.'''
+
+    def __init__(self, tile_folder):
+        self.tile_folder = tile_folder
+        self.index_path = path.join(tile_folder, INDEX_NAME)
+        self.cell_size = None
+        self.origin = None
+        self.spatial_reference = None
+        self.tiles = []
+
+    @staticmethod
+    def tileFiles(tile_folder):
+        return sorted(name for name in listdir(tile_folder) if name.lower().endswith(TILE_EXTENSIONS))
+
+    def load(self):
+        ''' Read the index; returns False if it is missing or does not list the tiles now in the folder.'''
+        try:
+            with open(self.index_path) as f:
+                index = load(f)
+        except (OSError, ValueError):
+            return False
+        if sorted(tile['name'] for tile in index['tiles']) != self.tileFiles(self.tile_folder):
+            return False
+        self.cell_size = index['cell_size']
+        self.origin = tuple(index['origin'])
+        self.spatial_reference = index['spatial_reference']
+        self.tiles = index['tiles']
+        return True
+
+    def build(self, describe):
+        ''' Index every tile in the folder with describe(tile_path) -> (xmin, ymin, xmax, ymax, cell size, spatial
+        reference string). The grid origin is the upper left corner of the tiles' combined extent.'''
+        self.tiles = []
+        for name in self.tileFiles(self.tile_folder):
+            xmin, ymin, xmax, ymax, cell_size, spatial_reference = describe(path.join(self.tile_folder, name))
+            self.tiles.append({'name': name, 'xmin': xmin, 'ymin': ymin, 'xmax': xmax, 'ymax': ymax})
+            self.cell_size = cell_size
+            self.spatial_reference = spatial_reference
+        if not self.tiles:
+            raise ValueError(f"No raster tiles found in {self.tile_folder}")
+        self.origin = (min(tile['xmin'] for tile in self.tiles), max(tile['ymax'] for tile in self.tiles))
+
+        temp_path = f"{self.index_path}.tmp"
+        with open(temp_path, 'w') as f:
+            dump({'cell_size': self.cell_size, 'origin': self.origin, 'spatial_reference': self.spatial_reference,
+                  'tiles': self.tiles}, f)
+        replace(temp_path, self.index_path)
+
+    def intersecting(self, xmin, ymin, xmax, ymax):
+        ''' Return (tile path, tile window) for the tiles whose bounds intersect an extent.'''
+        return [(path.join(self.tile_folder, tile['name']), self.window(tile['xmin'], tile['ymin'], tile['xmax'], tile['ymax']))
+                for tile in self.tiles
+                if tile['xmax'] > xmin and tile['xmin'] < xmax and tile['ymax'] > ymin and tile['ymin'] < ymax]
+
+    def window(self, xmin, ymin, xmax, ymax):
+        ''' Grid window of the cells covering an extent.'''
+        return gridWindow(xmin, ymin, xmax, ymax, self.origin[0], self.origin[1], self.cell_size)
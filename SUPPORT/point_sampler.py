@@ -0,0 +1,71 @@
+from numpy import asarray, ceil, clip, floor, isnan, nan, where, zeros
+
+DEFAULT_METHOD = 'BILINEAR'
+
+
+def gridPosition(x, y, xmin, ymax, cell_width, cell_height):
+    ''' Return fractional (row, column) positions of XY coordinates relative to cell centers.'''
+    col = (asarray(x, float) - xmin) / cell_width - 0.5
+    row = (ymax - asarray(y, float)) / cell_height - 0.5
+    return row, col
+
+
+def sampleNearest(array, row, col):
+    ''' Sample the cell containing each fractional position; NaN outside the array.'''
+    nrows, ncols = array.shape
+    r = floor(row + 0.5).astype(int)
+    c = floor(col + 0.5).astype(int)
+    inside = (r >= 0) & (r < nrows) & (c >= 0) & (c < ncols)
+    values = array[clip(r, 0, nrows - 1), clip(c, 0, ncols - 1)].astype(float)
+    return where(inside, values, nan)
+
+
+def sampleBilinear(array, row, col):
+    ''' Bilinear interpolation between the four surrounding cell centers.
+
+    Falls back to the containing cell where a neighbour is NoData; positions outside the array are NaN.'''
+    nrows, ncols = array.shape
+    r0 = clip(floor(row).astype(int), 0, max(nrows - 2, 0))
+    c0 = clip(floor(col).astype(int), 0, max(ncols - 2, 0))
+    r1 = clip(r0 + 1, 0, nrows - 1)
+    c1 = clip(c0 + 1, 0, ncols - 1)
+    dr = clip(row - r0, 0, 1)
+    dc = clip(col - c0, 0, 1)
+    values = (array[r0, c0] * (1 - dr) * (1 - dc) + array[r0, c1] * (1 - dr) * dc +
+              array[r1, c0] * dr * (1 - dc) + array[r1, c1] * dr * dc)
+    nearest = sampleNearest(array, row, col)
+    return where(isnan(values), nearest, where(isnan(nearest), nan, values))
+
+
+def sampleNeighborhoodMean(array, row, col, radius=1.0):
+    ''' Mean of the data cells whose centers lie within radius cells of each position.
+
+    Matches buffering each point by radius cells and running ZonalStatistics MEAN on the buffers.'''
+    nrows, ncols = array.shape
+    reach = int(ceil(radius))
+    total = zeros(row.shape)
+    count = zeros(row.shape)
+    base_row = floor(row + 0.5).astype(int)
+    base_col = floor(col + 0.5).astype(int)
+    for dr in range(-reach, reach + 1):
+        for dc in range(-reach, reach + 1):
+            r = base_row + dr
+            c = base_col + dc
+            near = ((r - row)**2 + (c - col)**2 <= radius**2) & (r >= 0) & (r < nrows) & (c >= 0) & (c < ncols)
+            values = array[clip(r, 0, nrows - 1), clip(c, 0, ncols - 1)]
+            use = near & ~isnan(values)
+            total[use] += values[use]
+            count[use] += 1
+    return where(count > 0, total / where(count > 0, count, 1), nan)
+
+
+def samplePoints(array, x, y, xmin, ymax, cell_width, cell_height, method=DEFAULT_METHOD):
+    ''' Return elevations for arrays of XY coordinates from a raster window.
+
+    method is BILINEAR, NEAREST or MEAN (mean of cells within one cell of the point).'''
+    row, col = gridPosition(x, y, xmin, ymax, cell_width, cell_height)
+    if method == 'NEAREST':
+        return sampleNearest(array, row, col)
+    if method == 'MEAN':
+        return sampleNeighborhoodMean(array, row, col)
+    return sampleBilinear(array, row, col)
@@ -0,0 +1,221 @@
+from numpy import abs as np_abs, arange, append, argsort, asarray, clip, concatenate, cumsum, diff, floor, full, hypot, inf, \
+    interp, isnan, lexsort, maximum, repeat, searchsorted, tile, unique, zeros
+
+
+def stationValues(length, interval):
+    ''' Station values (feet) at every interval from 0 plus the end station, truncated to whole feet.'''
+    stations = arange(0, length, interval)
+    return append(stations, length).astype(int)
+
+
+def cumulativeChainage(parts):
+    ''' Concatenate line part vertices and their cumulative planar distance, without spanning gaps between parts.'''
+    x = concatenate([asarray(part[0], float) for part in parts])
+    y = concatenate([asarray(part[1], float) for part in parts])
+    segments = hypot(diff(x), diff(y))
+    part_starts = cumsum([len(part[0]) for part in parts])[:-1]
+    segments[part_starts - 1] = 0
+    return x, y, concatenate(([0], cumsum(segments)))
+
+
+def orientUpperLeft(parts):
+    ''' Reverse a line if needed so measures start at the end nearest its extent's upper left corner.
+
+    Matches CreateRoutes with the UPPER_LEFT coordinate priority used by the profile tools.'''
+    xmin = min(min(part[0]) for part in parts)
+    ymax = max(max(part[1]) for part in parts)
+    start_x, start_y = parts[0][0][0], parts[0][1][0]
+    end_x, end_y = parts[-1][0][-1], parts[-1][1][-1]
+    if hypot(end_x - xmin, end_y - ymax) < hypot(start_x - xmin, start_y - ymax):
+        return [(asarray(part[0])[::-1], asarray(part[1])[::-1]) for part in reversed(parts)]
+    return parts
+
+
+def interpolateStations(parts, stations, length):
+    ''' Place stations measured 0 to length along a line's vertices, scaling measures to the planar chainage.'''
+    x, y, chainage = cumulativeChainage(orientUpperLeft(parts))
+    distance = asarray(stations, float) / length * chainage[-1] if length > 0 else asarray(stations, float) * 0
+    return interp(distance, chainage, x), interp(distance, chainage, y)
+
+
+def generateStations(lines, interval):
+    ''' Yield (line_id, length, stations, x, y) for each (line_id, length, parts) line record.'''
+    for line_id, length, parts in lines:
+        stations = stationValues(length, interval)
+        x, y = interpolateStations(parts, stations, length)
+        yield line_id, length, stations, x, y
+
+
+def linesExtent(lines):
+    ''' Return the (xmin, ymin, xmax, ymax) extent of all vertices in a set of line records.'''
+    xs = [value for line in lines for part in line[2] for value in part[0]]
+    ys = [value for line in lines for part in line[2] for value in part[1]]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def profileRecords(lines, interval, sampler):
+    ''' Stream (line_id, length, stations, x, y, z) profile records, sampling elevations with sampler(x, y).'''
+    for line_id, length, stations, x, y in generateStations(lines, interval):
+        yield line_id, length, stations, x, y, sampler(x, y)
+
+
+def densifyPart(x, y, spacing):
+    ''' Return positions every spacing along a line part, plus its vertices, with their chainage.'''
+    x, y, chainage = cumulativeChainage([(x, y)])
+    positions = unique(concatenate((chainage, arange(0, chainage[-1], spacing))))
+    return interp(positions, chainage, x), interp(positions, chainage, y), positions
+
+
+def simplify3D(x, y, z, chainage, horizontal_tolerance, vertical_tolerance):
+    ''' Douglas-Peucker simplification of a 3D line against separate horizontal and vertical tolerances.
+
+    A vertex is kept when it lies farther than either tolerance from the chord of the kept vertices around it;
+    vertical deviation is measured against the grade of the chord. Returns the kept vertex mask with the
+    largest horizontal and vertical deviation of the dropped vertices.'''
+    keep = zeros(x.size, bool)
+    keep[0] = keep[-1] = True
+    max_horizontal = max_vertical = 0.0
+    spans = [(0, x.size - 1)]
+    while spans:
+        start, stop = spans.pop()
+        if stop - start < 2:
+            continue
+        inner = arange(start + 1, stop)
+        dx, dy = x[stop] - x[start], y[stop] - y[start]
+        length2 = dx**2 + dy**2
+        t = clip(((x[inner] - x[start]) * dx + (y[inner] - y[start]) * dy) / (length2 + (length2 == 0)), 0, 1)
+        horizontal = hypot(x[start] + t * dx - x[inner], y[start] + t * dy - y[inner])
+        run = chainage[stop] - chainage[start]
+        grade = (z[stop] - z[start]) / run if run > 0 else 0
+        vertical = np_abs(z[inner] - (z[start] + grade * (chainage[inner] - chainage[start])))
+
+        score = maximum(horizontal / horizontal_tolerance, vertical / vertical_tolerance)
+        worst = score.argmax()
+        if score[worst] > 1:
+            split = start + 1 + worst
+            keep[split] = True
+            spans += [(start, split), (split, stop)]
+        else:
+            max_horizontal = max(max_horizontal, horizontal.max())
+            max_vertical = max(max_vertical, vertical.max())
+    return keep, max_horizontal, max_vertical
+
+
+def profileLine(parts, sampler, spacing, horizontal_tolerance, vertical_tolerance):
+    ''' Sample a line's elevations every spacing and simplify each part in 3D.
+
+    Returns the (x, y, z) arrays of each part, the sampled and kept vertex counts and the maximum
+    horizontal and vertical deviation. Samples without an elevation are dropped.'''
+    profile_parts = []
+    sampled = kept = 0
+    max_horizontal = max_vertical = 0.0
+    for part_x, part_y in parts:
+        x, y, chainage = densifyPart(part_x, part_y, spacing)
+        z = sampler(x, y)
+        data = ~isnan(z)
+        x, y, z, chainage = x[data], y[data], z[data], chainage[data]
+        sampled += x.size
+        if x.size < 2:
+            continue
+        keep, horizontal, vertical = simplify3D(x, y, z, chainage, horizontal_tolerance, vertical_tolerance)
+        profile_parts.append((x[keep], y[keep], z[keep]))
+        kept += int(keep.sum())
+        max_horizontal = max(max_horizontal, horizontal)
+        max_vertical = max(max_vertical, vertical)
+    return profile_parts, sampled, kept, max_horizontal, max_vertical
+
+
+class SegmentIndex:
+    ''' Uniform grid index over the segments of line records for vectorized nearest-line queries.
+
+    Segments are bucketed by midpoint in cells at least as wide as the longest segment, so searching the
+    3x3 cells around a point finds every segment within half a cell; farther points fall back to a full scan.
+    A larger cell_size widens the radius resolved without the scan.'''
+
+    def __init__(self, lines, cell_size=0):
+        x0, y0, x1, y1, line_ids, measures, scales = [], [], [], [], [], [], []
+        for line_id, length, parts in lines:
+            oriented = orientUpperLeft(parts)
+            x, y, chainage = cumulativeChainage(oriented)
+            scale = length / chainage[-1] if chainage[-1] > 0 else 0
+            start = 0
+            for part in oriented:
+                stop = start + len(part[0])
+                x0.append(x[start:stop-1]); y0.append(y[start:stop-1])
+                x1.append(x[start+1:stop]); y1.append(y[start+1:stop])
+                measures.append(chainage[start:stop-1])
+                line_ids.append(full(stop - start - 1, line_id))
+                scales.append(full(stop - start - 1, scale))
+                start = stop
+
+        self.x0, self.y0 = concatenate(x0), concatenate(y0)
+        self.x1, self.y1 = concatenate(x1), concatenate(y1)
+        self.line_ids = concatenate(line_ids)
+        self.measures = concatenate(measures)
+        self.scales = concatenate(scales)
+        self.cell_size = max(hypot(self.x1 - self.x0, self.y1 - self.y0).max(), cell_size, 1e-9)
+        self.origin = (min(self.x0.min(), self.x1.min()), min(self.y0.min(), self.y1.min()))
+
+        cols, rows = self._cells((self.x0 + self.x1) / 2, (self.y0 + self.y1) / 2)
+        self.ncols = int(cols.max()) + 3
+        keys = rows * self.ncols + cols
+        self.order = argsort(keys, kind='stable')
+        self.keys = keys[self.order]
+
+    def _cells(self, x, y):
+        cols = floor((asarray(x, float) - self.origin[0]) / self.cell_size).astype(int)
+        rows = floor((asarray(y, float) - self.origin[1]) / self.cell_size).astype(int)
+        return cols, rows
+
+    def _distances(self, point_index, segments, px, py):
+        dx, dy = self.x1[segments] - self.x0[segments], self.y1[segments] - self.y0[segments]
+        length2 = dx**2 + dy**2
+        t = clip(((px[point_index] - self.x0[segments]) * dx + (py[point_index] - self.y0[segments]) * dy) /
+                 (length2 + (length2 == 0)), 0, 1)
+        return hypot(self.x0[segments] + t * dx - px[point_index], self.y0[segments] + t * dy - py[point_index]), t
+
+    def _nearest(self, point_index, segments, px, py, best_distance, best_segment, best_t):
+        if point_index.size == 0:
+            return
+        distance, t = self._distances(point_index, segments, px, py)
+        order = lexsort((distance, point_index))
+        first = concatenate(([True], diff(point_index[order]) != 0))
+        winners = order[first]
+        closer = distance[winners] < best_distance[point_index[winners]]
+        winners = winners[closer]
+        best_distance[point_index[winners]] = distance[winners]
+        best_segment[point_index[winners]] = segments[winners]
+        best_t[point_index[winners]] = t[winners]
+
+    def query(self, px, py, max_distance=None):
+        ''' Return the nearest line ID, measure along it (line length units) and distance for arrays of points.
+
+        With max_distance no wider than half a cell, points farther than it from every line are not scanned
+        and their results are only meaningful as being beyond max_distance.'''
+        px, py = asarray(px, float), asarray(py, float)
+        best_distance = full(px.size, inf)
+        best_segment = zeros(px.size, int)
+        best_t = zeros(px.size)
+
+        cols, rows = self._cells(px, py)
+        for dr in (-1, 0, 1):
+            for dc in (-1, 0, 1):
+                keys = (rows + dr) * self.ncols + (cols + dc)
+                valid = (cols + dc >= 0) & (cols + dc < self.ncols - 2) & (rows + dr >= 0)
+                starts = searchsorted(self.keys, keys, 'left')
+                counts = (searchsorted(self.keys, keys, 'right') - starts) * valid
+                point_index = repeat(arange(px.size), counts)
+                offsets = arange(counts.sum()) - repeat(cumsum(counts) - counts, counts)
+                segments = self.order[repeat(starts, counts) + offsets]
+                self._nearest(point_index, segments, px, py, best_distance, best_segment, best_t)
+
+        # Points with no segment inside the guaranteed search radius are scanned against every segment
+        unresolved = (best_distance > self.cell_size / 2).nonzero()[0]
+        if unresolved.size and (max_distance is None or max_distance > self.cell_size / 2):
+            point_index = repeat(unresolved, self.x0.size)
+            segments = tile(arange(self.x0.size), unresolved.size)
+            self._nearest(point_index, segments, px, py, best_distance, best_segment, best_t)
+
+        segment_length = hypot(self.x1 - self.x0, self.y1 - self.y0)[best_segment]
+        measures = (self.measures[best_segment] + best_t * segment_length) * self.scales[best_segment]
+        return self.line_ids[best_segment], measures, best_distance
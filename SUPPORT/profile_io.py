@@ -0,0 +1,186 @@
+from os import path
+
+from numpy import array, isnan
+
+from arcpy import Array, Describe, ListFields, Point, Polyline, SetProgressorLabel
+from arcpy.da import InsertCursor, SearchCursor, UpdateCursor
+from arcpy.management import AddField, CalculateField, CopyFeatures, CreateFeatureclass
+
+from point_sampler import DEFAULT_METHOD, samplePoints
+from profile_engine import interpolateStations, linesExtent, profileLine, profileRecords
+from raster_io import readRasterWindow
+from utils import AddMsgAndPrint
+
+HORIZONTAL_TOLERANCE = 0.1
+VERTICAL_TOLERANCE = 0.1
+
+
+class ProfileError(ValueError):
+    ''' Input lines that profiles cannot be made from; the message is meant for the tool user.'''
+
+
+def lineParts(shape):
+    ''' Return (x, y) vertex lists for each part of a polyline geometry.'''
+    parts = []
+    for part in shape:
+        points = [point for point in part if point]
+        parts.append(([point.X for point in points], [point.Y for point in points]))
+    return parts
+
+
+def readLines(line_fc, id_field='ID', length_field='LENGTH_FT'):
+    ''' Read (line_id, length, parts) records for every line in a feature class with one cursor.'''
+    with SearchCursor(line_fc, [id_field, length_field, 'SHAPE@']) as cursor:
+        return [(row[0], row[1], lineParts(row[2])) for row in cursor]
+
+
+def createStationsFeatureClass(stations_fc, spatial_reference):
+    ''' Create an empty station points feature class with the ID, STATION and POINT_X/Y/Z fields.'''
+    CreateFeatureclass(path.dirname(stations_fc), path.basename(stations_fc), 'POINT', spatial_reference=spatial_reference)
+    AddField(stations_fc, 'ID', 'LONG')
+    AddField(stations_fc, 'STATION', 'LONG')
+    AddField(stations_fc, 'POINT_X', 'DOUBLE')
+    AddField(stations_fc, 'POINT_Y', 'DOUBLE')
+    AddField(stations_fc, 'POINT_Z', 'DOUBLE')
+
+
+def insertStations(stations_fc, station_records):
+    ''' Bulk insert (line_id, stations, x, y, z) station arrays with one InsertCursor. Returns the station count.'''
+    count = 0
+    with InsertCursor(stations_fc, ['SHAPE@XY', 'ID', 'STATION', 'POINT_X', 'POINT_Y', 'POINT_Z']) as cursor:
+        for line_id, stations, x, y, z in station_records:
+            for station, point_x, point_y, point_z in zip(stations.tolist(), x.tolist(), y.tolist(), z.tolist()):
+                point_z = None if isnan(point_z) else round(point_z, 1)
+                cursor.insertRow(((point_x, point_y), line_id, station, point_x, point_y, point_z))
+                count += 1
+    return count
+
+
+def mergeStations(stations_fc, lines, new_stations, sampler):
+    ''' Merge new station measures into the existing stations of their lines and re-place every station.
+
+    lines are the affected (line_id, length, parts) records and new_stations maps their line IDs to arrays of new
+    station measures. The affected lines' stations are read and deleted, combined with the new ones in station
+    order, placed along the line and sampled again with sampler(x, y), so no station keeps an elevation from an
+    earlier DEM. Returns the rows written.'''
+    merged = {line_id: list(stations.tolist()) for line_id, stations in new_stations.items()}
+    where_clause = f"ID IN ({', '.join(str(line_id) for line_id in merged)})"
+    with UpdateCursor(stations_fc, ['ID', 'STATION'], where_clause=where_clause) as cursor:
+        for row in cursor:
+            merged[row[0]].append(row[1])
+            cursor.deleteRow()
+
+    station_records = []
+    for line_id, length, parts in sorted(lines, key=lambda line: line[0]):
+        if line_id not in merged:
+            continue
+        stations = array(sorted(merged[line_id]), int)
+        x, y = interpolateStations(parts, stations, length)
+        station_records.append((line_id, stations, x, y, sampler(x, y)))
+    return insertStations(stations_fc, station_records)
+
+
+def demSampler(dem_path, lines, z_factor=1, method=DEFAULT_METHOD, margin=2):
+    ''' Read the DEM window covering all lines, plus a margin of cells, once and return a sampler(x, y) for it
+    with the DEM cell size.'''
+    xmin, ymin, xmax, ymax = linesExtent(lines)
+    window, window_xmin, window_ymax, cell_width, cell_height = readRasterWindow(dem_path, xmin, ymin, xmax, ymax, margin)
+    sampler = lambda x, y: samplePoints(window, x, y, window_xmin, window_ymax, cell_width, cell_height, method) * z_factor
+    return sampler, cell_width
+
+
+def create3DLines(line_fc, out_fc, sampler, spacing, horizontal_tolerance=HORIZONTAL_TOLERANCE,
+                  vertical_tolerance=VERTICAL_TOLERANCE, log_file_path=None):
+    ''' Write Z-enabled copies of lines sampled every spacing and reduced with 3D Douglas-Peucker.
+
+    Replaces InterpolateShape, which keeps a vertex in every DEM cell. Returns the largest horizontal
+    and vertical deviation of the simplified lines from the sampled profile.'''
+    spatial_reference = Describe(line_fc).spatialReference
+    CreateFeatureclass(path.dirname(out_fc), path.basename(out_fc), 'POLYLINE', line_fc, 'DISABLED', 'ENABLED', spatial_reference)
+    fields = [field.name for field in ListFields(line_fc) if field.editable and field.type not in ('OID', 'Geometry')]
+
+    max_horizontal = max_vertical = 0.0
+    with SearchCursor(line_fc, fields + ['SHAPE@']) as search_cursor, InsertCursor(out_fc, fields + ['SHAPE@']) as insert_cursor:
+        for row in search_cursor:
+            parts, sampled, kept, horizontal, vertical = profileLine(lineParts(row[-1]), sampler, spacing,
+                                                                     horizontal_tolerance, vertical_tolerance)
+            if not parts:
+                continue
+            shape = Polyline(Array([Array([Point(*vertex) for vertex in zip(x.tolist(), y.tolist(), z.tolist())]) for x, y, z in parts]),
+                             spatial_reference, True)
+            insert_cursor.insertRow(list(row[:-1]) + [shape])
+            max_horizontal = max(max_horizontal, horizontal)
+            max_vertical = max(max_vertical, vertical)
+            AddMsgAndPrint(f"\tLine ID {row[fields.index('ID')]}: reduced {sampled} profile vertices to {kept}", log_file_path=log_file_path)
+
+    AddMsgAndPrint(f"\tMaximum deviation from the DEM profile: {max_horizontal:.2f} horizontal, {max_vertical:.2f} vertical", log_file_path=log_file_path)
+    return max_horizontal, max_vertical
+
+
+def prepareLines(input_line, line_temp):
+    ''' Copy input lines and populate the ID and LENGTH_FT fields used by the profile tools.'''
+    CopyFeatures(input_line, line_temp)
+    field_list = [field.name for field in ListFields(line_temp)]
+    if 'ID' not in field_list:
+        AddField(line_temp, 'ID', 'LONG')
+    if 'NO_STATIONS' not in field_list:
+        AddField(line_temp, 'NO_STATIONS', 'LONG')
+    if 'FROM_PT' not in field_list:
+        AddField(line_temp, 'FROM_PT', 'LONG')
+    if 'LENGTH_FT' not in field_list:
+        AddField(line_temp, 'LENGTH_FT', 'DOUBLE')
+
+    CalculateField(line_temp, 'ID', '!OBJECTID!', 'PYTHON3')
+    CalculateField(line_temp, 'LENGTH_FT', "!shape!.getLength('PLANAR', 'FeetInt')", 'PYTHON3')
+
+
+def createProfiles(input_line, line_temp, stations_temp, output_lines, dem_path, interval, z_factor=1, log_file_path=None,
+                   stage=SetProgressorLabel):
+    ''' Shared profile pipeline for the tile, ridge and cross section tools.
+
+    Copies the input lines, places stations at the interval plus the end station, samples all station
+    elevations from one DEM read and writes the stations with one cursor and the vertex reduced 3D lines
+    to output_lines. Returns the lines read. Raises ProfileError if a line is shorter than the interval.
+    stage(label) starts each step, e.g. the tool's StageTimer.stage so the steps are timed in its perf log.'''
+    stage('Calculating number of stations...')
+    prepareLines(input_line, line_temp)
+
+    AddMsgAndPrint('\nCalculating number of stations...', log_file_path=log_file_path)
+    AddMsgAndPrint(f"\tStation Point interval: {interval} Feet", log_file_path=log_file_path)
+
+    lines = readLines(line_temp)
+    for line_id, length, parts in lines:
+        if length < interval:
+            raise ProfileError(f"The length of line {line_id} is less than the specified interval of {interval} ft. Use a smaller interval or a longer line.")
+
+    stage('Creating stations and retrieving station elevations...')
+    sampler, cell_size = demSampler(dem_path, lines, z_factor)
+    station_records = []
+    station_counts = {}
+    for line_id, length, stations, x, y, z in profileRecords(lines, interval, sampler):
+        remainder = length % interval
+        equidistant_stations = len(stations) if remainder == 0 else len(stations) - 1
+        AddMsgAndPrint(f"\tLine ID {line_id} Total Length: {length} Feet", log_file_path=log_file_path)
+        AddMsgAndPrint(f"\tEquidistant Stations (Including Station 0): {equidistant_stations}", log_file_path=log_file_path)
+
+        if remainder > 0:
+            AddMsgAndPrint(f"\tPlus 1 covering the remaining {remainder} Feet", log_file_path=log_file_path)
+
+        station_records.append((line_id, stations, x, y, z))
+        station_counts[line_id] = len(stations)
+
+    with UpdateCursor(line_temp, ['ID', 'NO_STATIONS', 'FROM_PT']) as cursor:
+        for row in cursor:
+            row[1] = station_counts[row[0]]
+            row[2] = 0
+            cursor.updateRow(row)
+
+    createStationsFeatureClass(stations_temp, Describe(line_temp).spatialReference)
+    station_count = insertStations(stations_temp, station_records)
+    AddMsgAndPrint(f"\nCreated a total of {station_count} stations for the {len(lines)} provided line(s)...", log_file_path=log_file_path)
+
+    stage('Creating 3D profile lines...')
+    AddMsgAndPrint('\nCreating 3D profile lines...', log_file_path=log_file_path)
+    create3DLines(line_temp, output_lines, sampler, cell_size, log_file_path=log_file_path)
+
+    return lines
@@ -0,0 +1,67 @@
+from threading import Event, Lock, Thread
+from time import monotonic
+
+
+class ProjectLog:
+    ''' Buffered writer for a project log file that keeps one append handle open.
+
+    Text is held in memory and written when the buffer reaches buffer_chars, when flush_seconds have passed since
+    the last write to disk, on flush() or close(), and when used as a context manager on leaving the block. With
+    background=True a daemon thread also flushes every flush_seconds, so the file stays current between messages.'''
+
+    def __init__(self, log_file_path, buffer_chars=65536, flush_seconds=1.0, background=False):
+        self.log_file_path = log_file_path
+        self.buffer_chars = buffer_chars
+        self.flush_seconds = flush_seconds
+        self.buffer = []
+        self.buffered_chars = 0
+        self.handle = None
+        self.last_flush = monotonic()
+        self.lock = Lock()
+        self.stopped = Event()
+        self.thread = None
+        if background:
+            self.thread = Thread(target=self._flushLoop, name=f"ProjectLog {log_file_path}", daemon=True)
+            self.thread.start()
+
+    def _flushLoop(self):
+        while not self.stopped.wait(self.flush_seconds):
+            self.flush()
+
+    def _flush(self):
+        if self.buffer:
+            if self.handle is None:
+                self.handle = open(self.log_file_path, 'a+')
+            self.handle.write(''.join(self.buffer))
+            self.handle.flush()
+            self.buffer = []
+            self.buffered_chars = 0
+        self.last_flush = monotonic()
+
+    def write(self, text):
+        with self.lock:
+            self.buffer.append(text)
+            self.buffered_chars += len(text)
+            if self.buffered_chars >= self.buffer_chars or monotonic() - self.last_flush >= self.flush_seconds:
+                self._flush()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def close(self):
+        ''' Flush and release the file handle and background thread.'''
+        self.stopped.set()
+        if self.thread is not None and self.thread.is_alive():
+            self.thread.join()
+        with self.lock:
+            self._flush()
+            if self.handle is not None:
+                self.handle.close()
+                self.handle = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.flush()
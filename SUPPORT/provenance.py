@@ -0,0 +1,100 @@
+from glob import escape, glob
+from hashlib import sha1
+from json import dump, dumps, load
+from os import path, replace, stat
+from time import strftime
+
+
+def digest(value):
+    ''' SHA-1 hex digest of a JSON serializable value, independent of dictionary order.'''
+    return sha1(dumps(value, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def fileStamp(file_path):
+    ''' Modification stamp of a file and its sidecar files (same name, any extension) from their sizes and times.'''
+    stem = path.splitext(file_path)[0]
+    stamps = []
+    for sidecar in sorted(set(glob(f"{escape(stem)}.*")) | {file_path}):
+        try:
+            info = stat(sidecar)
+        except OSError:
+            continue
+        stamps.append(f"{path.basename(sidecar)}-{info.st_size}-{info.st_mtime_ns}")
+    return '|'.join(stamps)
+
+
+class ProvenanceStore:
+    ''' Record of the inputs and parameters each tool output was made from, kept as JSON in the project workspace.
+
+    key() hashes the stamps of a step's input datasets with its parameters. A step whose outputs all exist and
+    were recorded with the same key is current and can be skipped, unless the store was opened with force.
+    stamp(dataset) returns a stamp that changes when the dataset changes; stamps are computed once per store.'''
+
+    def __init__(self, store_path, stamp, exists, force=False):
+        self.store_path = store_path
+        self.stamp_function = stamp
+        self.exists = exists
+        self.force = force
+        self.stamps = {}
+        self.inputs = {}
+        try:
+            with open(store_path) as f:
+                self.records = load(f)
+        except (OSError, ValueError):
+            self.records = {}
+
+    def _save(self):
+        temp_path = f"{self.store_path}.tmp"
+        try:
+            with open(temp_path, 'w') as f:
+                dump(self.records, f, indent=1, sort_keys=True)
+            replace(temp_path, self.store_path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _name(dataset):
+        return path.normcase(path.normpath(dataset))
+
+    def stamp(self, dataset):
+        ''' Stamp of an input dataset, or None for no dataset.'''
+        if not dataset:
+            return None
+        name = self._name(dataset)
+        if name not in self.stamps:
+            self.stamps[name] = self.stamp_function(dataset)
+        return self.stamps[name]
+
+    def key(self, inputs, parameters=None):
+        ''' Key of a step from its {name: input dataset} and {name: parameter value}.'''
+        stamps = {name: self.stamp(dataset) for name, dataset in inputs.items()}
+        key = digest({'inputs': stamps, 'parameters': parameters or {}})
+        self.inputs[key] = stamps
+        return key
+
+    def current(self, outputs, key):
+        ''' True if every output exists and was recorded with key, and the store was not opened with force.'''
+        if self.force:
+            return False
+        for output in outputs:
+            record = self.records.get(self._name(output))
+            if record is None or record['key'] != key or not self.exists(output):
+                return False
+        return True
+
+    def record(self, outputs, key, step=None):
+        ''' Record that outputs were made with key.'''
+        for output in outputs:
+            self.records[self._name(output)] = {
+                'key': key,
+                'step': step,
+                'inputs': self.inputs.get(key),
+                'created': strftime('%Y-%m-%dT%H:%M:%S'),
+            }
+        self._save()
+
+    def forget(self, outputs):
+        ''' Drop the records of outputs about to be rebuilt, so a failed run never leaves them marked current.'''
+        dropped = [self.records.pop(self._name(output), None) for output in outputs]
+        if any(record is not None for record in dropped):
+            self._save()
@@ -0,0 +1,62 @@
+from hashlib import sha1
+from os import environ, path
+
+from numpy import ascontiguousarray, float32, nan
+
+from arcpy import Describe, Exists, ListFields, Point, Raster, RasterToNumPyArray
+from arcpy.da import SearchCursor
+
+from dem_processing import iterRowBlocks
+from provenance import fileStamp, ProvenanceStore
+from utils import FORCE_VARIABLE, REUSE_CURRENT_OUTPUTS
+
+CHECKSUM_BLOCK_ROWS = 2048
+
+
+def rasterChecksum(in_raster, block_rows=CHECKSUM_BLOCK_ROWS):
+    ''' Content hash of a raster's grid definition and cell values, read in row blocks.'''
+    raster = Raster(in_raster) if isinstance(in_raster, str) else in_raster
+    extent = raster.extent
+    cell_height = raster.meanCellHeight
+    checksum = sha1(f"{extent.XMin!r}|{extent.YMax!r}|{raster.meanCellWidth!r}|{cell_height!r}|{raster.height}|"
+                    f"{raster.width}|{raster.spatialReference.factoryCode}".encode('utf-8'))
+    for read_start, read_stop, start, stop in iterRowBlocks(raster.height, block_rows):
+        lower_left = Point(extent.XMin, extent.YMax - stop * cell_height)
+        block = RasterToNumPyArray(raster, lower_left, raster.width, stop - start, nan).astype(float32)
+        checksum.update(ascontiguousarray(block).tobytes())
+    return checksum.hexdigest()
+
+
+def featureChecksum(in_table):
+    ''' Content hash of the rows of a feature class or table: geometry and every attribute except the ObjectID.'''
+    desc = Describe(in_table)
+    fields = [field.name for field in ListFields(in_table) if field.type not in ('OID', 'Geometry', 'Blob', 'Raster')]
+    if hasattr(desc, 'shapeType'):
+        fields.append('SHAPE@WKB')
+    checksum = sha1('|'.join(fields).encode('utf-8'))
+    order_by = (None, f"ORDER BY {desc.OIDFieldName}") if getattr(desc, 'hasOID', False) else (None, None)
+    with SearchCursor(in_table, fields, sql_clause=order_by) as cursor:
+        for row in cursor:
+            checksum.update(repr([bytes(value) if isinstance(value, (bytearray, memoryview)) else value
+                                  for value in row]).encode('utf-8'))
+    return checksum.hexdigest()
+
+
+def datasetStamp(dataset):
+    ''' Stamp of a dataset: the modification stamp of files on disk (e.g. shapefiles, TIFFs) and a content hash of
+    rasters, feature classes and tables in a geodatabase.'''
+    desc = Describe(dataset)
+    catalog_path = desc.catalogPath
+    if path.isfile(catalog_path):
+        return fileStamp(catalog_path)
+    if desc.dataType in ('RasterDataset', 'RasterLayer', 'RasterBand', 'MosaicDataset'):
+        return rasterChecksum(catalog_path)
+    return featureChecksum(catalog_path)
+
+
+def provenanceStore(project_workspace):
+    ''' Return the provenance store of a project, {project}_provenance.json in its workspace. Steps are never
+    current when REUSE_CURRENT_OUTPUTS is False or the FORCE_VARIABLE environment variable is 1.'''
+    store_path = path.join(project_workspace, f"{path.basename(project_workspace)}_provenance.json")
+    force = not REUSE_CURRENT_OUTPUTS or environ.get(FORCE_VARIABLE) == '1'
+    return ProvenanceStore(store_path, datasetStamp, Exists, force)
@@ -0,0 +1,186 @@
+from os import path
+from struct import pack
+
+from numpy import array, column_stack, finfo, float32, floor, isnan, nan, where
+
+from arcpy import Point, Raster, RasterToNumPyArray
+from arcpy.da import InsertCursor, SearchCursor, UpdateCursor
+from arcpy.management import AddField, Clip, CreateFeatureclass, Delete, MosaicToNewRaster
+
+from contour_engine import contourTile, gridToMap, isIndexContour, stitchChains, tileRanges
+
+from dem_processing import iterRowBlocks, padRowHalo
+from point_sampler import DEFAULT_METHOD, samplePoints
+from tile_cache import snapExtentToTiles, TileCache, tileExtent, tileKey, tileSize
+
+BLOCK_ROWS = 2048
+# NoData of 32 bit float rasters written in blocks
+FLOAT32_NODATA = float(finfo(float32).min)
+CONTOUR_TILE_ROWS = 1024
+
+
+def readRasterWindow(in_raster, xmin, ymin, xmax, ymax, margin=1):
+    ''' Read the cells covering an extent, plus a margin of cells, into a NumPy array with NoData as NaN.
+
+    Returns the array with the window's left edge, top edge, cell width and cell height.'''
+    raster = Raster(in_raster) if isinstance(in_raster, str) else in_raster
+    extent = raster.extent
+    cell_width = raster.meanCellWidth
+    cell_height = raster.meanCellHeight
+    first_col = max(int(floor((xmin - extent.XMin) / cell_width)) - margin, 0)
+    last_col = min(int(floor((xmax - extent.XMin) / cell_width)) + margin, raster.width - 1)
+    first_row = max(int(floor((extent.YMax - ymax) / cell_height)) - margin, 0)
+    last_row = min(int(floor((extent.YMax - ymin) / cell_height)) + margin, raster.height - 1)
+    ncols = max(last_col - first_col + 1, 1)
+    nrows = max(last_row - first_row + 1, 1)
+
+    window_xmin = extent.XMin + first_col * cell_width
+    window_ymax = extent.YMax - first_row * cell_height
+    lower_left = Point(window_xmin, window_ymax - nrows * cell_height)
+    array = RasterToNumPyArray(raster, lower_left, ncols, nrows, nan).astype(float32)
+    return array, window_xmin, window_ymax, cell_width, cell_height
+
+
+def processRasterInBlocks(in_raster, out_raster_path, block_function, halo=1, block_rows=BLOCK_ROWS, mask_raster=None):
+    ''' Apply a NumPy function to a raster in row blocks with a halo and write the blocks into one new 32 bit float
+    raster on the same grid, which is saved once to out_raster_path.
+
+    block_function is called with the haloed block and the index of its first core row and, with mask_raster, the
+    matching haloed block of mask_raster as booleans (True where it has data). It returns the core rows.'''
+    raster = Raster(in_raster) if isinstance(in_raster, str) else in_raster
+    extent = raster.extent
+    cell_height = raster.meanCellHeight
+    nrows = raster.height
+    ncols = raster.width
+
+    raster_info = raster.getRasterInfo()
+    raster_info.setBandCount(1)
+    raster_info.setPixelType('F32')
+    raster_info.setNoDataValues(FLOAT32_NODATA)
+    out_raster = Raster(raster_info)
+
+    for read_start, read_stop, start, stop in iterRowBlocks(nrows, block_rows, halo):
+        values = raster.read(upper_left_corner=(0, read_start), ncols=ncols, nrows=read_stop - read_start, nodata_to_value=nan)
+        band_shape = values.shape[2:]
+        block = padRowHalo(values.reshape(values.shape[:2]).astype(float32), halo - (start - read_start), halo - (read_stop - stop))
+        if mask_raster is None:
+            out_array = block_function(block, start)
+        else:
+            lower_left = Point(extent.XMin, extent.YMax - read_stop * cell_height)
+            mask_block = RasterToNumPyArray(mask_raster, lower_left, ncols, read_stop - read_start, nan).astype(float32)
+            mask_block = ~isnan(padRowHalo(mask_block, halo - (start - read_start), halo - (read_stop - stop)))
+            out_array = block_function(block, start, mask_block)
+
+        out_array = where(isnan(out_array), FLOAT32_NODATA, out_array).astype(float32)
+        out_raster.write(out_array.reshape(out_array.shape + band_shape), upper_left_corner=(0, start),
+                         value_to_nodata=FLOAT32_NODATA)
+
+    out_raster.save(out_raster_path)
+    return out_raster_path
+
+
+def clipServiceWithCache(source_service, source_id, extent, spatial_reference, out_raster, scratch, cache=None):
+    ''' Clip an image service to an extent through the local tile cache, downloading only tiles not already cached.
+
+    Tiles are mosaicked in a scratch geodatabase dataset named by scratch (a ScratchManager). Returns the number of
+    tiles downloaded and the number reused from the cache.'''
+    cache = cache or TileCache()
+    sr_id = spatial_reference.factoryCode or spatial_reference.name
+    size = tileSize(spatial_reference.metersPerUnit if spatial_reference.type == 'Projected' else None)
+    tiles = snapExtentToTiles(extent.XMin, extent.YMin, extent.XMax, extent.YMax, size)
+    keys = [tileKey(source_id, tile, size, sr_id) for tile in tiles]
+
+    tile_paths = []
+    downloaded = 0
+    for tile, key in zip(tiles, keys):
+        tile_path = cache.get(key)
+        if tile_path is None:
+            tile_ext = tileExtent(tile, size)
+            tile_path = cache.tilePath(key)
+            Clip(source_service, ' '.join(str(value) for value in tile_ext), tile_path, '', '', '', 'NO_MAINTAIN_EXTENT')
+            cache.put(key, source_id, tile_ext, sr_id, protected=keys)
+            downloaded += 1
+        tile_paths.append(tile_path)
+
+    clip_ext = f"{extent.XMin} {extent.YMin} {extent.XMax} {extent.YMax}"
+    if len(tile_paths) == 1:
+        Clip(tile_paths[0], clip_ext, out_raster, '', '', '', 'NO_MAINTAIN_EXTENT')
+    else:
+        mosaic_path = scratch.name('cached_tiles_mosaic', in_gdb=True)
+        MosaicToNewRaster(';'.join(tile_paths), path.dirname(mosaic_path), path.basename(mosaic_path), spatial_reference, '32_BIT_FLOAT', '', '1', 'FIRST')
+        Clip(mosaic_path, clip_ext, out_raster, '', '', '', 'NO_MAINTAIN_EXTENT')
+        Delete(mosaic_path)
+
+    return downloaded, len(tiles) - downloaded
+
+
+def updatePointZ(feature_class, in_raster, method=DEFAULT_METHOD, z_field='POINT_Z', z_factor=1, decimals=1):
+    ''' Sample a raster at every point in a feature class and write the elevations with one UpdateCursor.
+
+    The raster window covering all points is read once. Returns the number of points without an elevation.'''
+    with SearchCursor(feature_class, ['OID@', 'SHAPE@X', 'SHAPE@Y']) as cursor:
+        points = [row for row in cursor]
+    if not points:
+        return 0
+
+    x = array([point[1] for point in points], float)
+    y = array([point[2] for point in points], float)
+    window, window_xmin, window_ymax, cell_width, cell_height = readRasterWindow(in_raster, x.min(), y.min(), x.max(), y.max(), 2)
+    elevations = samplePoints(window, x, y, window_xmin, window_ymax, cell_width, cell_height, method) * z_factor
+    point_z = {point[0]: None if isnan(z) else round(float(z), decimals) for point, z in zip(points, elevations)}
+
+    with UpdateCursor(feature_class, ['OID@', z_field]) as cursor:
+        for row in cursor:
+            row[1] = point_z[row[0]]
+            cursor.updateRow(row)
+
+    return int(isnan(elevations).sum())
+
+
+def _lineWKB(x, y):
+    return pack('<BII', 1, 2, x.size) + column_stack((x, y)).astype('<f8').tobytes()
+
+
+def createContours(in_raster, out_fc, interval, base=0.0, z_factor=1, tile_rows=CONTOUR_TILE_ROWS):
+    ''' Contour a raster in row tiles with marching squares and write the lines with one InsertCursor.
+
+    Tiles share a row of cells with their neighbours so lines crossing a seam are stitched on their shared crossing
+    points. The Index field (1 where MOD(Contour, 5 * interval) = 0) is set as lines are written, so only one tile
+    and the lines still open at its seams are held in memory. Returns the number of lines written.'''
+    raster = Raster(in_raster) if isinstance(in_raster, str) else in_raster
+    extent = raster.extent
+    cell_width = raster.meanCellWidth
+    cell_height = raster.meanCellHeight
+    nrows = raster.height
+    ncols = raster.width
+
+    CreateFeatureclass(path.dirname(out_fc), path.basename(out_fc), 'POLYLINE', spatial_reference=raster.spatialReference)
+    AddField(out_fc, 'Contour', 'DOUBLE')
+    AddField(out_fc, 'Index', 'DOUBLE')
+
+    def readTile(start, stop):
+        lower_left = Point(extent.XMin, extent.YMax - stop * cell_height)
+        return RasterToNumPyArray(raster, lower_left, ncols, stop - start, nan).astype(float32) * float32(z_factor)
+
+    count = 0
+    open_lines = {}
+    with InsertCursor(out_fc, ['SHAPE@WKB', 'Contour', 'Index']) as cursor:
+
+        def writeLines(level, lines):
+            nonlocal count
+            index = 1 if isIndexContour(level, interval) else 0
+            for line in lines:
+                x, y = gridToMap(line, extent.XMin, extent.YMax, cell_width, cell_height)
+                cursor.insertRow((_lineWKB(x, y), round(float(level), 6), index))
+                count += 1
+
+        for start, stop in tileRanges(nrows, tile_rows):
+            for level, closed_lines, tile_open_lines in contourTile(readTile(start, stop), interval, base, start, ncols):
+                writeLines(level, closed_lines)
+                open_lines.setdefault(level, []).extend(tile_open_lines)
+
+        for level, lines in open_lines.items():
+            closed_lines, stitched_lines = stitchChains(lines)
+            writeLines(level, closed_lines + stitched_lines)
+
+    return count
@@ -0,0 +1,128 @@
+from math import ceil, floor
+
+from numpy import bincount, full, int64, isin, isnan, nan, nonzero, unique, where
+
+# NLCD_RCN_TABLE Join_ values encode an NLCD class and a hydrologic group code as NLCD * 100 + code
+PAIR_BASE = 100
+CULTIVATED_CLASSES = (81, 82, 83, 84, 85)
+
+
+def rcnTable(rcn_lookup, land_use_codes, hyd_group_codes):
+    ''' Build a [land use code, hydrologic group code] array of RCN values from a (LANDUSE, HYDGROUP): RCN lookup.
+
+    Codes map raster values to the LANDUSE and HYDGROUP strings; combinations missing from the lookup are NaN.'''
+    table = full((max(land_use_codes, default=0) + 1, max(hyd_group_codes, default=0) + 1), nan)
+    for land_use_code, land_use in land_use_codes.items():
+        for hyd_group_code, hyd_group in hyd_group_codes.items():
+            table[land_use_code, hyd_group_code] = rcn_lookup.get((land_use, hyd_group), nan)
+    return table
+
+
+def lookupRCN(table, land_use, hyd_group):
+    ''' RCN for arrays of land use and hydrologic group codes; negative codes (NoData) give NaN.'''
+    valid = (land_use >= 0) & (hyd_group >= 0)
+    rcn = full(land_use.shape, nan)
+    rcn[valid] = table[land_use[valid], hyd_group[valid]]
+    return rcn
+
+
+def missingCombinations(table, land_use, hyd_group):
+    ''' (land use code, hydrologic group code) pairs present in the data that have no RCN in the table.'''
+    valid = (land_use >= 0) & (hyd_group >= 0)
+    pairs = unique(land_use[valid].astype(int64) * table.shape[1] + hyd_group[valid])
+    missing = pairs[isnan(table.ravel()[pairs])]
+    return [(int(pair // table.shape[1]), int(pair % table.shape[1])) for pair in missing]
+
+
+def zonalMeanRCN(zones, rcn):
+    ''' Area weighted RCN and cell count for each zone of equal area cells, as {zone: (rcn, cells)}.'''
+    valid = (zones >= 0) & ~isnan(rcn)
+    sums = bincount(zones[valid], weights=rcn[valid])
+    counts = bincount(zones[valid])
+    return {int(zone): (float(sums[zone] / counts[zone]), int(counts[zone])) for zone in nonzero(counts)[0]}
+
+
+def combinationCodes(zones, land_use, hyd_group, land_use_count, hyd_group_count):
+    ''' Encode each cell's (zone, land use, hydrologic group) as one integer; -1 where any is NoData.'''
+    valid = (zones >= 0) & (land_use >= 0) & (hyd_group >= 0)
+    codes = full(zones.shape, -1, int64)
+    codes[valid] = (zones[valid].astype(int64) * land_use_count + land_use[valid]) * hyd_group_count + hyd_group[valid]
+    return codes
+
+
+def decodeCombination(code, land_use_count, hyd_group_count):
+    ''' Return the (zone, land use code, hydrologic group code) of a combination code.'''
+    zone_land_use, hyd_group = divmod(int(code), hyd_group_count)
+    zone, land_use = divmod(zone_land_use, land_use_count)
+    return zone, land_use, hyd_group
+
+
+def pairCodes(land_use, soils):
+    ''' Encode NLCD classes and hydrologic group codes as NLCD * 100 + code; -1 where either is NoData (NaN or 0).'''
+    valid = ~isnan(land_use) & ~isnan(soils) & (land_use > 0) & (soils > 0)
+    codes = full(land_use.shape, -1, int64)
+    codes[valid] = land_use[valid].astype(int64) * PAIR_BASE + soils[valid].astype(int64)
+    return codes
+
+
+def pairCounts(codes):
+    ''' Cell count of each pair code, as {code: cells}.'''
+    values, counts = unique(codes[codes >= 0], return_counts=True)
+    return dict(zip(values.tolist(), counts.tolist()))
+
+
+def pairTable(pair_rcn):
+    ''' Dense array of RCN indexed by pair code from a {code: RCN} lookup; codes not in the lookup are NaN.'''
+    table = full(max(pair_rcn, default=0) + 1, nan)
+    for code, rcn in pair_rcn.items():
+        table[code] = nan if rcn is None else rcn
+    return table
+
+
+def lookupPairs(codes, pair_rcn):
+    ''' RCN for an array of pair codes from a {code: RCN} lookup; NoData and codes missing from the lookup give NaN.'''
+    table = pairTable(pair_rcn)
+    valid = (codes >= 0) & (codes < table.size)
+    rcn = full(codes.shape, nan)
+    rcn[valid] = table[codes[valid]]
+    return rcn
+
+
+def weightedRCN(pair_counts, pair_rcn):
+    ''' Area weighted RCN of {code: cells} counts, with the codes missing from the lookup.'''
+    matched = {code: cells for code, cells in pair_counts.items() if pair_rcn.get(code) is not None}
+    missing = sorted(code for code in pair_counts if code not in matched)
+    total = sum(matched.values())
+    rcn = sum(pair_rcn[code] * cells for code, cells in matched.items()) / total if total else nan
+    return rcn, missing
+
+
+def resolveHydGroups(land_use, drained, natural):
+    ''' Hydrologic group codes per cell: the drained code on cultivated NLCD classes and the natural code elsewhere.'''
+    return where(isin(land_use, CULTIVATED_CLASSES), drained, natural)
+
+
+def tilePairCounts(land_use, drained, natural):
+    ''' Pair codes and their cell counts for one tile of NLCD and drained and natural hydrologic group codes.'''
+    codes = pairCodes(land_use, resolveHydGroups(land_use, drained, natural))
+    return codes, pairCounts(codes)
+
+
+def mergeCounts(total, counts):
+    ''' Add {code: cells} counts into a running total.'''
+    for code, cells in counts.items():
+        total[code] = total.get(code, 0) + cells
+    return total
+
+
+def extentTiles(xmin, ymin, xmax, ymax, origin_x, origin_y, cell_size, tile_cells):
+    ''' (xmin, ymin, xmax, ymax) tiles of up to tile_cells by tile_cells cells covering an extent, snapped to the
+    grid whose upper left corner is at origin.'''
+    first_col, last_col = floor((xmin - origin_x) / cell_size), ceil((xmax - origin_x) / cell_size)
+    first_row, last_row = floor((origin_y - ymax) / cell_size), ceil((origin_y - ymin) / cell_size)
+    tiles = []
+    for row in range(first_row, last_row, tile_cells):
+        for col in range(first_col, last_col, tile_cells):
+            tiles.append((origin_x + col * cell_size, origin_y - min(row + tile_cells, last_row) * cell_size,
+                          origin_x + min(col + tile_cells, last_col) * cell_size, origin_y - row * cell_size))
+    return tiles
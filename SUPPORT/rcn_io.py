@@ -0,0 +1,283 @@
+from concurrent.futures import ThreadPoolExecutor
+from os import path
+
+from numpy import float32, int32, nan, uint8, zeros
+
+from arcpy import Describe, env, Extent, ListFields, NumPyArrayToRaster, Point, Raster, RasterToNumPyArray, SpatialReference
+from arcpy.conversion import PolygonToRaster, RasterToPolygon
+from arcpy.da import SearchCursor, UpdateCursor
+from arcpy.management import AddField, CalculateField, DefineProjection, Delete, DeleteField, MosaicToNewRaster
+
+from nlcd_index import gridWindow, TileIndex, windowOverlap
+from rcn_engine import combinationCodes, decodeCombination, lookupPairs, lookupRCN, mergeCounts, missingCombinations, pairCodes, rcnTable, \
+    tilePairCounts, zonalMeanRCN
+from scratch_manager import scratchName
+from utils import supportTables
+
+
+class MissingRCNError(ValueError):
+    ''' Land use and hydrologic group combinations missing from the RCN lookup; pairs lists (LANDUSE, HYDGROUP).'''
+
+    def __init__(self, pairs):
+        super().__init__(f"No RCN found for {len(pairs)} land use and hydrologic group combination(s)")
+        self.pairs = pairs
+
+
+def readRCNLookup(lookup_table):
+    ''' Read a TR-55 style table into a {(LANDUSE, HYDGROUP): RCN} dictionary through the support table cache.'''
+    return supportTables(path.dirname(lookup_table)).lookup(path.basename(lookup_table), ['LANDUSE', 'HYDGROUP'], 'RCN')
+
+
+def readNLCDLookup(lookup_table):
+    ''' Read NLCD_RCN_TABLE into a {pair code: (CN, NRCS_LANDUSE, Soil)} lookup and a {Soil: ID} hydrologic group code
+    lookup through the support table cache.'''
+    pair_lookup, soil_codes = {}, {}
+    rows = supportTables(path.dirname(lookup_table)).rows(path.basename(lookup_table), ['Join_', 'CN', 'NRCS_LANDUSE', 'Soil', 'ID'])
+    for row in rows:
+        pair_lookup[int(row[0])] = row[1:4]
+        soil_codes[row[3]] = row[4]
+    return pair_lookup, soil_codes
+
+
+def readPairCodes(land_use_raster, soils_raster):
+    ''' Read an NLCD raster and a hydrologic group code raster on the NLCD grid and encode each cell as a pair code.
+
+    Returns the code array with its lower left corner, cell width and cell height.'''
+    land_use_raster = Raster(land_use_raster) if isinstance(land_use_raster, str) else land_use_raster
+    extent = land_use_raster.extent
+    lower_left = Point(extent.XMin, extent.YMin)
+    ncols, nrows = land_use_raster.width, land_use_raster.height
+    land_use = RasterToNumPyArray(land_use_raster, lower_left, ncols, nrows, 0).astype(float32)
+    soils = RasterToNumPyArray(soils_raster, lower_left, ncols, nrows, nan).astype(float32)
+    return pairCodes(land_use, soils), lower_left, land_use_raster.meanCellWidth, land_use_raster.meanCellHeight
+
+
+def saveArray(array, lower_left, cell_width, cell_height, no_data, out_raster, spatial_reference):
+    ''' Save a NumPy array as a raster and define its coordinate system.'''
+    NumPyArrayToRaster(array, lower_left, cell_width, cell_height, no_data).save(out_raster)
+    DefineProjection(out_raster, spatial_reference)
+    return out_raster
+
+
+def savePairRCN(codes, pair_rcn, lower_left, cell_width, cell_height, out_raster, spatial_reference):
+    ''' Save the RCN of an array of pair codes as a floating point raster.'''
+    return saveArray(lookupPairs(codes, pair_rcn).astype(float32), lower_left, cell_width, cell_height, nan, out_raster, spatial_reference)
+
+
+def _describeTile(tile_path):
+    desc = Describe(tile_path)
+    extent = desc.extent
+    return extent.XMin, extent.YMin, extent.XMax, extent.YMax, desc.meanCellWidth, desc.spatialReference.exportToString()
+
+
+def nlcdTileIndex(tile_folder):
+    ''' Load the index of a folder of pre-split NLCD tiles, building it when missing or out of date.'''
+    index = TileIndex(tile_folder)
+    if not index.load():
+        index.build(_describeTile)
+    return index
+
+
+def nlcdGrid(nlcd_source):
+    ''' Upper left corner, cell size, spatial reference and a snap raster of an NLCD raster or TileIndex.'''
+    if isinstance(nlcd_source, TileIndex):
+        spatial_reference = SpatialReference()
+        spatial_reference.loadFromString(nlcd_source.spatial_reference)
+        snap_raster = path.join(nlcd_source.tile_folder, nlcd_source.tiles[0]['name'])
+        return nlcd_source.origin[0], nlcd_source.origin[1], nlcd_source.cell_size, spatial_reference, snap_raster
+    desc = Describe(nlcd_source)
+    return desc.extent.XMin, desc.extent.YMax, desc.meanCellWidth, desc.spatialReference, nlcd_source
+
+
+def readNLCDWindow(nlcd_source, xmin, ymin, xmax, ymax):
+    ''' Read the NLCD cells covering an extent from a raster or a TileIndex of pre-split tiles, reading only the
+    windows of the sources that intersect it. Returns the array (NoData 0) with its lower left corner.'''
+    origin_x, origin_y, cell_size = nlcdGrid(nlcd_source)[:3]
+    window = gridWindow(xmin, ymin, xmax, ymax, origin_x, origin_y, cell_size)
+    if isinstance(nlcd_source, TileIndex):
+        sources = nlcd_source.intersecting(xmin, ymin, xmax, ymax)
+    else:
+        extent = Raster(nlcd_source).extent
+        sources = [(nlcd_source, gridWindow(extent.XMin, extent.YMin, extent.XMax, extent.YMax, origin_x, origin_y, cell_size))]
+
+    array = zeros((window[3], window[2]), uint8)
+    for source, source_window in sources:
+        overlap = windowOverlap(window, source_window)
+        if overlap is None:
+            continue
+        window_col, window_row, source_col, source_row, ncols, nrows = overlap
+        lower_left = Point(origin_x + (source_window[0] + source_col) * cell_size, origin_y - (source_window[1] + source_row + nrows) * cell_size)
+        array[window_row:window_row + nrows, window_col:window_col + ncols] = RasterToNumPyArray(source, lower_left, ncols, nrows, 0)
+    return array, Point(origin_x + window[0] * cell_size, origin_y - (window[1] + window[3]) * cell_size)
+
+
+def maskWindow(array, mask_fc, lower_left, cell_size, spatial_reference, snap_raster):
+    ''' Set the cells of a window array whose centers fall outside the mask polygons to 0.'''
+    mask_temp = scratchName('memory', 'nlcd_mask')
+    nrows, ncols = array.shape
+    saved_env = (env.extent, env.snapRaster, env.cellSize, env.outputCoordinateSystem)
+    env.extent = Extent(lower_left.X, lower_left.Y, lower_left.X + ncols * cell_size, lower_left.Y + nrows * cell_size)
+    env.snapRaster = snap_raster
+    env.cellSize = cell_size
+    env.outputCoordinateSystem = spatial_reference
+    try:
+        PolygonToRaster(mask_fc, Describe(mask_fc).OIDFieldName, mask_temp, 'CELL_CENTER', '', cell_size)
+        array[RasterToNumPyArray(mask_temp, lower_left, ncols, nrows, -1) < 0] = 0
+        return array
+    finally:
+        env.extent, env.snapRaster, env.cellSize, env.outputCoordinateSystem = saved_env
+        try:
+            Delete(mask_temp)
+        except:
+            pass
+
+
+def extractNLCD(nlcd_source, mask_fc, out_raster):
+    ''' Extract NLCD within mask polygons by reading only the source windows that cover the mask extent and masking
+    in memory. Returns out_raster.'''
+    origin_x, origin_y, cell_size, spatial_reference, snap_raster = nlcdGrid(nlcd_source)
+    extent = Describe(mask_fc).extent.projectAs(spatial_reference)
+    array, lower_left = readNLCDWindow(nlcd_source, extent.XMin, extent.YMin, extent.XMax, extent.YMax)
+    maskWindow(array, mask_fc, lower_left, cell_size, spatial_reference, snap_raster)
+    return saveArray(array, lower_left, cell_size, cell_size, 0, out_raster, spatial_reference)
+
+
+def tiledPairCounts(nlcd_source, mask_fc, soils_fc, tiles, pair_rcn=None, out_rcn_grid=None, scratch_workspace=None, workers=1):
+    ''' Count NLCD and hydrologic group pair codes tile by tile on the NLCD grid, keeping memory flat as area grows.
+
+    NLCD is read from a raster or TileIndex one tile window at a time and masked in memory. Soils are rasterized per tile from HYD_CODE (drained) and NAT_CODE (natural); cultivated cells take the drained code.
+    Tiles are counted on a thread pool of the given size while the next tile is read. With out_rcn_grid the RCN of each
+    tile is saved to scratch_workspace and the tiles are mosaicked into one grid. Returns {code: cells}.'''
+    origin_x, origin_y, cell_size, spatial_reference, snap_raster = nlcdGrid(nlcd_source)
+    drained_temp = scratchName('memory', 'tile_drained')
+    natural_temp = scratchName('memory', 'tile_natural')
+    with SearchCursor(mask_fc, ['SHAPE@']) as cursor:
+        masks = [row[0] for row in cursor]
+
+    total, tile_paths = {}, []
+
+    def collectTile(future, lower_left):
+        codes, counts = future.result()
+        mergeCounts(total, counts)
+        if out_rcn_grid:
+            tile_path = scratchName(scratch_workspace, f"rcn_tile_{len(tile_paths)}")
+            tile_paths.append(savePairRCN(codes, pair_rcn, lower_left, cell_size, cell_size, tile_path, spatial_reference))
+
+    saved_env = (env.extent, env.snapRaster, env.cellSize)
+    env.snapRaster = snap_raster
+    env.cellSize = cell_size
+    try:
+        with ThreadPoolExecutor(max(workers, 1)) as pool:
+            pending = []
+            for xmin, ymin, xmax, ymax in tiles:
+                tile_extent = Extent(xmin, ymin, xmax, ymax)
+                if all(mask.disjoint(tile_extent.polygon) for mask in masks):
+                    continue
+                land_use, lower_left = readNLCDWindow(nlcd_source, xmin, ymin, xmax, ymax)
+                maskWindow(land_use, mask_fc, lower_left, cell_size, spatial_reference, snap_raster)
+                nrows, ncols = land_use.shape
+
+                env.extent = tile_extent
+                PolygonToRaster(soils_fc, 'HYD_CODE', drained_temp, 'MAXIMUM_AREA', 'NONE', cell_size)
+                PolygonToRaster(soils_fc, 'NAT_CODE', natural_temp, 'MAXIMUM_AREA', 'NONE', cell_size)
+                arrays = [land_use.astype(float32),
+                          RasterToNumPyArray(drained_temp, lower_left, ncols, nrows, nan).astype(float32),
+                          RasterToNumPyArray(natural_temp, lower_left, ncols, nrows, nan).astype(float32)]
+
+                pending.append((pool.submit(tilePairCounts, *arrays), lower_left))
+                # Keep a bounded number of tiles in memory
+                while len(pending) > max(workers, 1) or (pending and pending[0][0].done()):
+                    collectTile(*pending.pop(0))
+            for future, lower_left in pending:
+                collectTile(future, lower_left)
+
+        if out_rcn_grid and tile_paths:
+            MosaicToNewRaster(';'.join(tile_paths), path.dirname(out_rcn_grid), path.basename(out_rcn_grid),
+                              spatial_reference, '32_BIT_FLOAT', cell_size, '1', 'FIRST')
+        return total
+
+    finally:
+        env.extent, env.snapRaster, env.cellSize = saved_env
+        for temp in [drained_temp, natural_temp] + tile_paths:
+            try:
+                Delete(temp)
+            except:
+                pass
+
+
+def rasterizeField(in_fc, field, out_raster, cell_size):
+    ''' Rasterize a polygon field on the current environment grid and return {raster value: field value}.'''
+    PolygonToRaster(in_fc, field, out_raster, 'CELL_CENTER', '', cell_size)
+    if ListFields(in_fc, field)[0].type == 'String':
+        with SearchCursor(out_raster, ['Value', field]) as cursor:
+            return {row[0]: row[1] for row in cursor}
+    return None
+
+
+def readAligned(in_raster, lower_left, ncols, nrows):
+    ''' Read an integer raster over a fixed window with NoData as -1.'''
+    return RasterToNumPyArray(in_raster, lower_left, ncols, nrows, -1).astype(int32)
+
+
+def rasterRCN(zones_fc, land_use_fc, soils_fc, rcn_lookup, snap_raster, out_rcn_fc, out_rcn_grid, scratch):
+    ''' Area weighted RCN per subbasin from land use and hydrologic groups rasterized to the snap raster's grid.
+
+    Writes an RCN grid and an RCN polygon layer (one multipart feature per Subbasin, LANDUSE and HYDGROUP) and
+    returns {Subbasin: RCN}. Raises MissingRCNError if land use and hydrologic group combinations are missing from the lookup.
+    Temporary rasters are named in the scratch geodatabase by scratch, the tool's ScratchManager, which deletes them.'''
+    zones_temp = scratch.name('rcn_zones', in_gdb=True)
+    land_use_temp = scratch.name('rcn_land_use', in_gdb=True)
+    hyd_group_temp = scratch.name('rcn_hyd_group', in_gdb=True)
+    combination_temp = scratch.name('rcn_combination', in_gdb=True)
+    snap_desc = Describe(snap_raster)
+    cell_size = snap_desc.meanCellWidth
+
+    saved_env = (env.extent, env.snapRaster, env.outputCoordinateSystem)
+    env.extent = Describe(zones_fc).extent
+    env.snapRaster = snap_raster
+    env.outputCoordinateSystem = snap_desc.spatialReference
+    try:
+        rasterizeField(zones_fc, 'Subbasin', zones_temp, cell_size)
+        land_use_codes = rasterizeField(land_use_fc, 'LANDUSE', land_use_temp, cell_size)
+        hyd_group_codes = rasterizeField(soils_fc, 'HYDGROUP', hyd_group_temp, cell_size)
+
+        zones_raster = Raster(zones_temp)
+        extent = zones_raster.extent
+        lower_left = Point(extent.XMin, extent.YMin)
+        ncols, nrows = zones_raster.width, zones_raster.height
+        zones = readAligned(zones_raster, lower_left, ncols, nrows)
+        land_use = readAligned(land_use_temp, lower_left, ncols, nrows)
+        hyd_group = readAligned(hyd_group_temp, lower_left, ncols, nrows)
+
+        table = rcnTable(rcn_lookup, land_use_codes, hyd_group_codes)
+        missing = missingCombinations(table, land_use, hyd_group)
+        if missing:
+            raise MissingRCNError([(land_use_codes[land_use_code], hyd_group_codes[hyd_group_code]) for land_use_code, hyd_group_code in missing])
+
+        rcn = lookupRCN(table, land_use, hyd_group)
+        rcn[zones < 0] = nan
+        saveArray(rcn.astype(float32), lower_left, zones_raster.meanCellWidth, zones_raster.meanCellHeight, nan, out_rcn_grid, snap_desc.spatialReference)
+
+        ### RCN Layer from Combinations ###
+        land_use_count, hyd_group_count = table.shape
+        codes = combinationCodes(zones, land_use, hyd_group, land_use_count, hyd_group_count)
+        saveArray(codes.astype(int32), lower_left, zones_raster.meanCellWidth, zones_raster.meanCellHeight, -1, combination_temp, snap_desc.spatialReference)
+        RasterToPolygon(combination_temp, out_rcn_fc, 'NO_SIMPLIFY', 'Value', 'MULTIPLE_OUTER_PART')
+
+        AddField(out_rcn_fc, 'Subbasin', 'LONG')
+        AddField(out_rcn_fc, 'LANDUSE', 'TEXT', field_length=ListFields(land_use_fc, 'LANDUSE')[0].length)
+        AddField(out_rcn_fc, 'HYDGROUP', 'TEXT', field_length=ListFields(soils_fc, 'HYDGROUP')[0].length)
+        AddField(out_rcn_fc, 'RCN', 'LONG')
+        AddField(out_rcn_fc, 'Acres', 'DOUBLE')
+        with UpdateCursor(out_rcn_fc, ['gridcode', 'Subbasin', 'LANDUSE', 'HYDGROUP', 'RCN']) as cursor:
+            for row in cursor:
+                zone, land_use_code, hyd_group_code = decodeCombination(row[0], land_use_count, hyd_group_count)
+                row[1:] = [zone, land_use_codes[land_use_code], hyd_group_codes[hyd_group_code], int(table[land_use_code, hyd_group_code])]
+                cursor.updateRow(row)
+        DeleteField(out_rcn_fc, ['gridcode', 'Id'])
+        CalculateField(out_rcn_fc, 'Acres', "!shape!.getArea('PLANAR', 'ACRES')", 'PYTHON3')
+
+        return {zone: value for zone, (value, cells) in zonalMeanRCN(zones, rcn).items()}
+
+    finally:
+        env.extent, env.snapRaster, env.outputCoordinateSystem = saved_env
@@ -0,0 +1,47 @@
+from numpy import asarray, errstate, isnan, nan, stack, where
+
+AMC_CLASSES = ('I', 'II', 'III')
+INITIAL_ABSTRACTION_RATIO = 0.2
+
+
+def adjustAMC(cn):
+    ''' Curve numbers for antecedent moisture conditions I, II and III from AMC II curve numbers (NEH-4 Chapter 10).
+
+    Returns an array with a leading axis of length 3.'''
+    cn = asarray(cn, float)
+    return stack((4.2 * cn / (10 - 0.058 * cn), cn, 23 * cn / (10 + 0.13 * cn)))
+
+
+def potentialRetention(cn):
+    ''' Potential maximum retention S (inches) for curve numbers.'''
+    with errstate(divide='ignore'):
+        return 1000 / asarray(cn, float) - 10
+
+
+def runoffDepth(precipitation, retention, ia_ratio=INITIAL_ABSTRACTION_RATIO):
+    ''' SCS runoff Q (inches) for storm depths and retentions that broadcast against each other; zero where P <= Ia.'''
+    initial_abstraction = ia_ratio * retention
+    excess = asarray(precipitation, float) - initial_abstraction
+    with errstate(divide='ignore', invalid='ignore'):
+        q = where(excess > 0, excess**2 / (excess + retention), 0.0)
+    return where(isnan(excess), nan, q)
+
+
+def stormRunoff(cn, storm_depths, ia_ratio=INITIAL_ABSTRACTION_RATIO):
+    ''' S, Ia and Q for every AMC class and storm depth in one broadcast over an array of AMC II curve numbers.
+
+    Returns (cn, s, ia, q) where cn, s and ia have shape (3,) + cn.shape and q has shape (3, storms) + cn.shape;
+    NaN curve numbers (NoData) give NaN results.'''
+    cn = adjustAMC(cn)
+    retention = potentialRetention(cn)
+    storms = asarray(storm_depths, float).reshape((1, -1) + (1,) * (cn.ndim - 1))
+    q = runoffDepth(storms, retention[:, None], ia_ratio)
+    return cn, retention, ia_ratio * retention, q
+
+
+def parseStormDepths(text):
+    ''' Storm depths from a semicolon or comma separated parameter string, in the order given.'''
+    depths = [float(value) for value in text.replace(',', ';').split(';') if value.strip()]
+    if not depths or min(depths) <= 0:
+        raise ValueError('Storm depths must be positive numbers')
+    return depths
@@ -0,0 +1,56 @@
+from os import path
+from uuid import uuid4
+
+from arcpy import Exists
+from arcpy.management import Delete
+
+
+def scratchName(workspace, base):
+    ''' Path in a workspace for a temporary dataset, unique to this call.'''
+    return path.join(workspace, f"{base}_{uuid4().hex[:8]}")
+
+
+class ScratchManager:
+    ''' Hands out unique names for temporary datasets in memory or the scratch geodatabase and deletes the ones
+    that were created with one Delete call on cleanup() or when leaving a with block.
+
+    Names carry a token unique to the run, so concurrent runs never touch each other's scratch data.'''
+
+    def __init__(self, scratch_gdb='memory'):
+        self.scratch_gdb = scratch_gdb
+        self.token = uuid4().hex[:8]
+        self.names = []
+
+    def name(self, base, in_gdb=False):
+        ''' Return and track a temporary dataset path in memory, or in the scratch geodatabase with in_gdb.'''
+        temp_path = path.join(self.scratch_gdb if in_gdb else 'memory', f"{base}_{self.token}")
+        self.track(temp_path)
+        return temp_path
+
+    def track(self, temp_path):
+        ''' Track a temporary dataset created outside of name(). Returns the path.'''
+        if temp_path not in self.names:
+            self.names.append(temp_path)
+        return temp_path
+
+    def cleanup(self):
+        ''' Delete the tracked datasets that exist. Returns the number deleted.'''
+        created = [temp_path for temp_path in self.names if Exists(temp_path)]
+        self.names = []
+        if not created:
+            return 0
+        try:
+            Delete(created)
+        except:
+            for temp_path in created:
+                try:
+                    Delete(temp_path)
+                except:
+                    pass
+        return len(created)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.cleanup()
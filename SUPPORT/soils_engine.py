@@ -0,0 +1,50 @@
+from numpy import array, char, isin, where
+
+# Hydrologic group assigned to map units by their MUNAME
+MAPUNIT_GROUPS = {'Water': 'W', 'Pit': 'P', 'Urban': 'D'}
+
+
+def textColumn(values):
+    ''' String array of text field values with NULL as '' and surrounding spaces removed.'''
+    return char.strip(array([value or '' for value in values], dtype=str))
+
+
+def normalizeHydroGroups(hydro_groups, valid_groups, munames=None, fill_empty=None):
+    ''' Normalize a hydrologic group column in one pass and classify its records.
+
+    Values are upper-cased. With munames, map units named in MAPUNIT_GROUPS take that group. With fill_empty,
+    values still empty take it. Returns the normalized column and a report of record masks: 'empty' (before
+    filling), 'dual' (e.g. 'B/D'), 'invalid' (not in valid_groups), and 'mapunit' (set from MUNAME).'''
+    groups = char.upper(hydro_groups).astype(object)
+    mapunit = array([False] * len(groups), dtype=bool)
+    if munames is not None:
+        for muname, group in MAPUNIT_GROUPS.items():
+            matched = munames == muname
+            groups[matched] = group
+            mapunit |= matched
+
+    empty = groups == ''
+    if fill_empty is not None:
+        groups[empty] = fill_empty
+
+    groups = groups.astype(str)
+    return groups, {
+        'empty': empty,
+        'dual': char.find(groups, '/') > -1,
+        'invalid': ~(groups == '') & ~isin(groups, list(valid_groups)),
+        'mapunit': mapunit,
+    }
+
+
+def drainedGroups(hydro_groups, drained):
+    ''' Resolve dual hydrologic groups (e.g. 'B/D') to their drained group where drained is True and to 'D' elsewhere.'''
+    dual = char.find(hydro_groups, '/') > -1
+    return where(dual & drained, hydro_groups.astype('<U1'), where(dual, 'D', hydro_groups)).astype(hydro_groups.dtype)
+
+
+def changedRows(old_columns, new_columns):
+    ''' Indices of the rows that differ in any of a list of column pairs.'''
+    changed = array([False] * len(old_columns[0]), dtype=bool)
+    for old, new in zip(old_columns, new_columns):
+        changed |= old != new
+    return changed.nonzero()[0]
@@ -0,0 +1,85 @@
+from os import path
+
+from arcpy import Describe, ListFields, SpatialReference
+from arcpy.analysis import Clip
+from arcpy.da import InsertCursor, SearchCursor, UpdateCursor
+from arcpy.management import AddField, CreateFeatureclass, Delete
+
+from scratch_manager import scratchName
+from soils_engine import textColumn
+from soils_store import SoilsStore
+
+MAPUNIT_FIELDS = [('MUKEY', 30), ('MUSYM', 6), ('MUNAME', 175), ('HYDGROUP', 20)]
+
+
+def buildSoilsStore(in_soils, store_path, hydro_field='HYDGROUP'):
+    ''' Load a soils feature class with MUKEY and a hydrologic group field, plus MUSYM and MUNAME where present,
+    into a local soils store. Returns the number of polygons stored.'''
+    desc = Describe(in_soils)
+    field_names = [field.name.upper() for field in ListFields(in_soils)]
+    read_fields = ['MUKEY', hydro_field] + [name for name in ['MUSYM', 'MUNAME'] if name in field_names] + ['SHAPE@']
+    mapunits = {}
+
+    def polygons(cursor):
+        for row in cursor:
+            values = dict(zip(read_fields, row))
+            mukey = values['MUKEY']
+            mapunits[mukey] = (mukey, values.get('MUSYM'), values.get('MUNAME'), values[hydro_field])
+            extent = values['SHAPE@'].extent
+            yield mukey, extent.XMin, extent.YMin, extent.XMax, extent.YMax, bytes(values['SHAPE@'].WKB)
+
+    with SoilsStore.create(store_path, desc.spatialReference.exportToString(), desc.catalogPath) as store:
+        with SearchCursor(in_soils, read_fields) as cursor:
+            count = store.addPolygons(polygons(cursor))
+        store.addMapunits(mapunits.values())
+    return count
+
+
+def extractSoils(store_path, clip_fc, out_fc):
+    ''' Clip soils from a local soils store to the clip features, reading only the polygons whose extents intersect
+    the clip features' extent. Returns the number of candidate polygons.'''
+    candidates_temp = scratchName('memory', 'Soils_Store_Candidates')
+    with SoilsStore(store_path) as store:
+        spatial_reference = SpatialReference()
+        spatial_reference.loadFromString(store.metadata('spatial_reference'))
+        extent = Describe(clip_fc).extent.projectAs(spatial_reference)
+        rows = store.query(extent.XMin, extent.YMin, extent.XMax, extent.YMax)
+
+    try:
+        CreateFeatureclass('memory', path.basename(candidates_temp), 'POLYGON', spatial_reference=spatial_reference)
+        for name, length in MAPUNIT_FIELDS:
+            AddField(candidates_temp, name, 'TEXT', field_length=length)
+        with InsertCursor(candidates_temp, [name for name, length in MAPUNIT_FIELDS] + ['SHAPE@WKB']) as cursor:
+            for row in rows:
+                cursor.insertRow(row)
+        Clip(candidates_temp, clip_fc, out_fc)
+    finally:
+        try:
+            Delete(candidates_temp)
+        except:
+            pass
+    return len(rows)
+
+
+def readTextColumns(table, fields):
+    ''' Read text fields of a table in one cursor pass. Returns the object IDs and a {field: string array} of the
+    values with NULL as ''.'''
+    with SearchCursor(table, ['OID@'] + fields) as cursor:
+        rows = [row for row in cursor]
+    columns = list(zip(*rows)) if rows else [[]] * (len(fields) + 1)
+    return list(columns[0]), {field: textColumn(column) for field, column in zip(fields, columns[1:])}
+
+
+def updateRows(table, fields, updates):
+    ''' Write {object ID: [values of fields]} in one cursor pass, updating only the listed rows. Returns the number
+    of rows updated.'''
+    if not updates:
+        return 0
+    count = 0
+    with UpdateCursor(table, ['OID@'] + fields) as cursor:
+        for row in cursor:
+            values = updates.get(row[0])
+            if values is not None:
+                cursor.updateRow([row[0]] + list(values))
+                count += 1
+    return count
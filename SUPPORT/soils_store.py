@@ -0,0 +1,83 @@
+from os import path, remove
+from sqlite3 import connect
+
+SCHEMA = (
+    'CREATE TABLE metadata (key TEXT PRIMARY KEY, value TEXT)',
+    'CREATE TABLE mapunits (mukey TEXT PRIMARY KEY, musym TEXT, muname TEXT, hydgroup TEXT)',
+    'CREATE TABLE polygons (id INTEGER PRIMARY KEY, mukey TEXT, shape BLOB)',
+    'CREATE VIRTUAL TABLE polygons_rtree USING rtree(id, xmin, xmax, ymin, ymax)',
+)
+INSERT_BATCH = 10000
+# File name of the store in the SUPPORT folder used by the soil and land use tools
+STORE_NAME = 'Soils_Store.sqlite'
+
+
+class SoilsStore:
+    ''' Local SQLite store of soil map unit polygons (WKB) with an R-tree over their extents and a map unit table
+    holding MUSYM, MUNAME and the hydrologic group, queried by bounding box.'''
+
+    def __init__(self, store_path):
+        self.store_path = store_path
+        self.connection = connect(store_path)
+
+    @classmethod
+    def create(cls, store_path, spatial_reference, source):
+        ''' Create an empty store, replacing an existing file. spatial_reference is the WKT of the stored shapes.'''
+        if path.exists(store_path):
+            remove(store_path)
+        store = cls(store_path)
+        with store.connection:
+            for statement in SCHEMA:
+                store.connection.execute(statement)
+            store.connection.executemany('INSERT INTO metadata VALUES (?, ?)',
+                                         [('spatial_reference', spatial_reference), ('source', source)])
+        return store
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def metadata(self, key):
+        row = self.connection.execute('SELECT value FROM metadata WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def addMapunits(self, records):
+        ''' Add or replace (mukey, musym, muname, hydgroup) map unit records.'''
+        with self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO mapunits VALUES (?, ?, ?, ?)', records)
+
+    def addPolygons(self, records):
+        ''' Add (mukey, xmin, ymin, xmax, ymax, wkb) polygon records in batches. Returns the number added.'''
+        count = 0
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) == INSERT_BATCH:
+                count += self._insertPolygons(batch)
+                batch = []
+        return count + self._insertPolygons(batch)
+
+    def _insertPolygons(self, batch):
+        with self.connection:
+            cursor = self.connection.cursor()
+            for mukey, xmin, ymin, xmax, ymax, shape in batch:
+                cursor.execute('INSERT INTO polygons (mukey, shape) VALUES (?, ?)', (mukey, shape))
+                cursor.execute('INSERT INTO polygons_rtree VALUES (?, ?, ?, ?, ?)', (cursor.lastrowid, xmin, xmax, ymin, ymax))
+        return len(batch)
+
+    def query(self, xmin, ymin, xmax, ymax):
+        ''' Return (mukey, musym, muname, hydgroup, wkb) for polygons whose extent intersects a bounding box.'''
+        return self.connection.execute(
+            'SELECT p.mukey, m.musym, m.muname, m.hydgroup, p.shape FROM polygons_rtree r '
+            'JOIN polygons p ON p.id = r.id LEFT JOIN mapunits m ON m.mukey = p.mukey '
+            'WHERE r.xmax >= ? AND r.xmin <= ? AND r.ymax >= ? AND r.ymin <= ? ORDER BY p.id',
+            (xmin, xmax, ymin, ymax)).fetchall()
+
+    def extent(self):
+        ''' Return the (xmin, ymin, xmax, ymax) extent of all stored polygons.'''
+        return self.connection.execute('SELECT min(xmin), min(ymin), max(xmax), max(ymax) FROM polygons_rtree').fetchone()
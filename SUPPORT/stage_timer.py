@@ -0,0 +1,112 @@
+from functools import wraps
+from json import dumps
+from time import perf_counter, process_time, strftime
+from tracemalloc import get_traced_memory, is_tracing, reset_peak, start, stop
+
+try:
+    from psutil import Process
+except ImportError:
+    Process = None
+
+
+class StageTimer:
+    ''' Time the stages of a tool run and append the run as one JSON line to a perf log.
+
+    Each stage records wall and CPU seconds, the process RSS at its end and, on Windows, the peak working set of the
+    process (when psutil is available) and the rows and columns of a raster. tracemalloc slows NumPy and arcpy work
+    many times over, so it is off by default; with trace_memory the run records the peak memory traced during each
+    stage instead of its times, and is marked as a memory run. stage() ends the previous stage
+    and starts the next, so it can stand in for SetProgressorLabel; set_label is called with each stage label.
+    raster_size(raster) returns (rows, columns) or None for the raster given to a stage or, by default, the timer.
+    on_finish is called with no arguments at the end of finish(), e.g. to release resources held for the run.'''
+
+    def __init__(self, tool_name, perf_log_path, set_label=None, raster_size=None, raster=None, trace_memory=False,
+                 on_finish=None):
+        self.tool_name = tool_name
+        self.perf_log_path = perf_log_path
+        self.set_label = set_label
+        self.raster_size = raster_size
+        self.raster = raster
+        self.stages = []
+        self.current = None
+        self.started = strftime('%Y-%m-%dT%H:%M:%S')
+        self.start_wall = perf_counter()
+        self.start_cpu = process_time()
+        self.trace_memory = trace_memory
+        self.on_finish = on_finish
+        self.owns_trace = trace_memory and not is_tracing()
+        if self.owns_trace:
+            start()
+        self.process = Process() if Process is not None else None
+
+    def stage(self, label, raster=None):
+        ''' End the current stage and start a new one. Returns the timer, which ends the stage on leaving a with block.'''
+        self.end()
+        if self.set_label:
+            self.set_label(label)
+        if self.trace_memory:
+            reset_peak()
+        self.current = {'stage': label.strip(), 'raster': raster, 'wall': perf_counter(), 'cpu': process_time()}
+        return self
+
+    def end(self):
+        ''' End the current stage, if any.'''
+        if self.current is None:
+            return
+        stage, self.current = self.current, None
+        timed = not self.trace_memory
+        memory = self.process.memory_info() if self.process else None
+        peak_wset = getattr(memory, 'peak_wset', None)
+        record = {
+            'stage': stage['stage'],
+            'wall_s': round(perf_counter() - stage['wall'], 4) if timed else None,
+            'cpu_s': round(process_time() - stage['cpu'], 4) if timed else None,
+            'peak_traced_mb': None if timed else round(get_traced_memory()[1] / 1048576, 2),
+            'rss_mb': round(memory.rss / 1048576, 2) if memory else None,
+            'peak_rss_mb': round(peak_wset / 1048576, 2) if peak_wset else None,
+        }
+        raster = stage['raster'] if stage['raster'] is not None else self.raster
+        size = self.raster_size(raster) if self.raster_size and raster is not None else None
+        if size:
+            record['rows'], record['columns'] = size
+            record['cells'] = size[0] * size[1]
+        self.stages.append(record)
+
+    def timed(self, label, raster=None):
+        ''' Decorator that runs a function as its own stage.'''
+        def decorator(function):
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.stage(label, raster):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def finish(self):
+        ''' End the current stage and append the run record to the perf log. Returns the record.'''
+        self.end()
+        record = {
+            'tool': self.tool_name,
+            'started': self.started,
+            'wall_s': None if self.trace_memory else round(perf_counter() - self.start_wall, 4),
+            'cpu_s': None if self.trace_memory else round(process_time() - self.start_cpu, 4),
+            'memory_traced': self.trace_memory,
+            'stages': self.stages,
+        }
+        if self.owns_trace:
+            stop()
+            self.owns_trace = False
+        try:
+            with open(self.perf_log_path, 'a') as f:
+                f.write(dumps(record) + '\n')
+        except OSError:
+            pass
+        if self.on_finish:
+            self.on_finish()
+        return record
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.end()
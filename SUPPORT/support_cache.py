@@ -0,0 +1,84 @@
+from glob import glob
+from hashlib import sha1
+from os import environ, makedirs, path, remove, replace, scandir
+from pickle import dump, HIGHEST_PROTOCOL, load
+from tempfile import gettempdir
+
+DEFAULT_CACHE_DIR = path.join(environ.get('LOCALAPPDATA', gettempdir()), 'NRCS_Engineering_Tools', 'Support_Cache')
+
+
+def gdbStamp(gdb_path):
+    ''' Modification stamp of a file geodatabase folder from the count, total size and latest change of its files.
+
+    Lock files come and go as the geodatabase is opened and do not change its contents, so they are skipped.'''
+    count = size = latest = 0
+    with scandir(gdb_path) as entries:
+        for entry in entries:
+            if entry.is_file() and not entry.name.lower().endswith('.lock'):
+                stat = entry.stat()
+                count += 1
+                size += stat.st_size
+                latest = max(latest, stat.st_mtime_ns)
+    return f"{count}-{size}-{latest}"
+
+
+class SupportCache:
+    ''' Compiled snapshot of Support.gdb table rows, keyed by the geodatabase's modification stamp.
+
+    Rows are read once through reader(table_path, fields) and kept in one pickle per stamp, so later runs load
+    them without opening a cursor. The stamp is checked on every read, so a cache kept for a whole session picks
+    up edits to Support.gdb: a changed stamp drops the rows in memory and the stale snapshot is replaced.'''
+
+    def __init__(self, gdb_path, reader, cache_dir=DEFAULT_CACHE_DIR):
+        self.gdb_path = gdb_path
+        self.reader = reader
+        self.cache_dir = cache_dir
+        self.prefix = sha1(path.normcase(path.abspath(gdb_path)).encode('utf-8')).hexdigest()[:16]
+        self.snapshot_path = None
+        self.tables = None
+
+    def _refresh(self):
+        snapshot_path = path.join(self.cache_dir, f"{self.prefix}_{gdbStamp(self.gdb_path)}.pickle")
+        if snapshot_path != self.snapshot_path:
+            self.snapshot_path = snapshot_path
+            self.tables = self._load()
+
+    def _load(self):
+        try:
+            with open(self.snapshot_path, 'rb') as f:
+                return load(f)
+        except (OSError, EOFError, ValueError):
+            return {}
+
+    def _save(self):
+        makedirs(self.cache_dir, exist_ok=True)
+        temp_path = f"{self.snapshot_path}.tmp"
+        with open(temp_path, 'wb') as f:
+            dump(self.tables, f, HIGHEST_PROTOCOL)
+        replace(temp_path, self.snapshot_path)
+        for stale_path in glob(path.join(self.cache_dir, f"{self.prefix}_*.pickle")):
+            if stale_path != self.snapshot_path:
+                try:
+                    remove(stale_path)
+                except OSError:
+                    pass
+
+    def rows(self, table_name, fields):
+        ''' Return the rows of a table as a list of tuples of the given fields.'''
+        self._refresh()
+        key = f"{table_name}|{','.join(fields)}"
+        if key not in self.tables:
+            self.tables[key] = [tuple(row) for row in self.reader(path.join(self.gdb_path, table_name), fields)]
+            self._save()
+        return self.tables[key]
+
+    def lookup(self, table_name, key_fields, value_field):
+        ''' Return a {key: value} dictionary of a table; keys of several fields are tuples.'''
+        rows = self.rows(table_name, list(key_fields) + [value_field])
+        if len(key_fields) == 1:
+            return {row[0]: row[1] for row in rows}
+        return {row[:-1]: row[-1] for row in rows}
+
+    def values(self, table_name, field):
+        ''' Return the distinct values of one field in table order.'''
+        return list(dict.fromkeys(row[0] for row in self.rows(table_name, [field])))
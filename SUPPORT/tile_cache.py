@@ -0,0 +1,154 @@
+from contextlib import contextmanager
+from hashlib import sha1
+from json import dump, load
+from math import floor
+from os import close, environ, getpid, makedirs, O_CREAT, O_EXCL, O_WRONLY, open as os_open, path, remove, replace
+from tempfile import gettempdir
+from time import sleep, time
+
+DEFAULT_CACHE_DIR = path.join(environ.get('LOCALAPPDATA', gettempdir()), 'NRCS_Engineering_Tools', 'DEM_Cache')
+DEFAULT_MAX_BYTES = 5 * 1024**3
+TILE_SIZE_METERS = 1000
+TILE_SIZE_DEGREES = 0.01
+# A lock on the index older than this is left from a run that died and is broken
+LOCK_STALE_SECONDS = 60
+
+
+def tileSize(meters_per_unit=None):
+    ''' Return the tile edge length in source units; geographic sources (no meters per unit) use degrees.'''
+    if not meters_per_unit:
+        return TILE_SIZE_DEGREES
+    return TILE_SIZE_METERS / meters_per_unit
+
+
+def snapExtentToTiles(xmin, ymin, xmax, ymax, tile_size):
+    ''' Return (column, row) indices of the tile grid cells covering an extent.'''
+    first_col, last_col = floor(xmin / tile_size), floor(xmax / tile_size)
+    first_row, last_row = floor(ymin / tile_size), floor(ymax / tile_size)
+    return [(col, row) for row in range(first_row, last_row + 1) for col in range(first_col, last_col + 1)]
+
+
+def tileExtent(tile, tile_size):
+    ''' Return the (xmin, ymin, xmax, ymax) extent of a tile grid cell.'''
+    col, row = tile
+    return col * tile_size, row * tile_size, (col + 1) * tile_size, (row + 1) * tile_size
+
+
+def tileKey(source_id, tile, tile_size, sr_id):
+    ''' Build the cache key for a tile from its source, grid position and spatial reference.
+
+    Tiles are clipped at the source resolution, so the output cell size is not part of the key.'''
+    key = f"{source_id}|{tile[0]}|{tile[1]}|{tile_size!r}|{sr_id}"
+    return sha1(key.encode('utf-8')).hexdigest()
+
+
+class TileCache:
+    ''' On-disk cache of clipped source raster tiles with LRU eviction by total size.
+
+    Several runs can share a cache. Each keeps its own changes to the index and merges them into the index on disk
+    under a lock file, so one run never overwrites the tiles another has added.'''
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_path = path.join(cache_dir, 'index.json')
+        self.lock_path = f"{self.index_path}.lock"
+        makedirs(cache_dir, exist_ok=True)
+        self.entries = self._readIndex()
+        self.changed = {}
+        self.removed = set()
+
+    def _readIndex(self):
+        try:
+            with open(self.index_path) as f:
+                return load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @contextmanager
+    def _indexLock(self):
+        while True:
+            try:
+                close(os_open(self.lock_path, O_CREAT | O_EXCL | O_WRONLY))
+                break
+            except FileExistsError:
+                try:
+                    if time() - path.getmtime(self.lock_path) > LOCK_STALE_SECONDS:
+                        remove(self.lock_path)
+                        continue
+                except OSError:
+                    continue
+                sleep(0.05)
+        try:
+            yield
+        finally:
+            try:
+                remove(self.lock_path)
+            except OSError:
+                pass
+
+    def _writeIndex(self, protected=()):
+        ''' Merge this cache's changes into the index on disk, evict over the size limit and write it atomically.'''
+        with self._indexLock():
+            entries = self._readIndex()
+            for key in self.removed:
+                if not path.exists(self.tilePath(key)):
+                    entries.pop(key, None)
+            entries.update(self.changed)
+            self.entries = entries
+            self.changed = {}
+            self.removed = set()
+            self.evict(protected)
+            temp_path = f"{self.index_path}.{getpid()}.tmp"
+            with open(temp_path, 'w') as f:
+                dump(self.entries, f)
+            replace(temp_path, self.index_path)
+
+    def tilePath(self, key):
+        ''' Return the file path a tile with the given key is stored at.'''
+        return path.join(self.cache_dir, f"{key}.tif")
+
+    def get(self, key):
+        ''' Return the cached tile path and mark it recently used, or None on a miss.'''
+        entry = self.entries.get(key)
+        tile_path = self.tilePath(key)
+        if entry is None or not path.exists(tile_path):
+            if self.entries.pop(key, None) is not None:
+                self.removed.add(key)
+            return None
+        entry['last_used'] = time()
+        self.changed[key] = entry
+        self._writeIndex()
+        return tile_path
+
+    def put(self, key, source_id, extent, sr_id, protected=()):
+        ''' Register a tile written to tilePath(key), then evict least recently used tiles over the size limit.'''
+        tile_path = self.tilePath(key)
+        self.changed[key] = {
+            'source': source_id,
+            'extent': list(extent),
+            'sr': sr_id,
+            'bytes': path.getsize(tile_path) if path.exists(tile_path) else 0,
+            'last_used': time()
+        }
+        self._writeIndex(protected=set(protected) | {key})
+        return tile_path
+
+    def totalBytes(self):
+        return sum(entry['bytes'] for entry in self.entries.values())
+
+    def evict(self, protected=()):
+        ''' Remove least recently used tiles until the cache fits within max_bytes. Runs under the index lock.'''
+        total = self.totalBytes()
+        for key, entry in sorted(self.entries.items(), key=lambda item: item[1]['last_used']):
+            if total <= self.max_bytes:
+                break
+            if key in protected:
+                continue
+            for file_path in (self.tilePath(key), f"{self.tilePath(key)}.aux.xml", f"{self.tilePath(key)}.ovr"):
+                try:
+                    remove(file_path)
+                except OSError:
+                    pass
+            total -= entry['bytes']
+            del self.entries[key]
@@ -1,10 +1,36 @@
-from os import path
+from atexit import register
+from os import environ, path
 from sys import exc_info
 from traceback import format_exception
 
-from arcpy import AddError, AddMessage, AddWarning, GetActivePortalURL, GetSigninToken, ListFields, ListPortalURLs
-from arcpy.da import Walk
+from arcpy import AddError, AddMessage, AddWarning, Describe, Exists, GetActivePortalURL, GetSigninToken, ListFields, \
+    ListPortalURLs, SetProgressorLabel
+from arcpy.da import SearchCursor
 from arcpy.management import Delete, DeleteField
+from arcpy.mp import ArcGISProject
+
+from project_log import ProjectLog
+from stage_timer import StageTimer
+from support_cache import SupportCache
+
+### Processing Options ###
+# Project log text is buffered and written at most every LOG_FLUSH_SECONDS by a background thread
+LOG_FLUSH_SECONDS = 1.0
+# Stage timings of each tool run are appended to {project}_perf.jsonl with the process RSS. tracemalloc slows runs many
+# times over, so peak memory is traced only when PERF_TRACE_MEMORY is True or this environment variable is 1, and a
+# traced run records memory in place of times
+PERF_TRACE_MEMORY = False
+TRACE_MEMORY_VARIABLE = 'ENGTOOLS_TRACE_MEMORY'
+# Tools run without ArcGIS Pro (e.g. from batch_runner.py) when this environment variable is 1: the CURRENT project
+# is not required and map operations are skipped
+HEADLESS_VARIABLE = 'ENGTOOLS_HEADLESS'
+# Tools reuse outputs whose inputs and parameters are unchanged since they were made (see provenance.py) unless
+# REUSE_CURRENT_OUTPUTS is False or this environment variable is 1
+REUSE_CURRENT_OUTPUTS = True
+FORCE_VARIABLE = 'ENGTOOLS_FORCE'
+
+_project_logs = {}
+_support_caches = {}
 
 
 def addLyrxByConnectionProperties(map, lyr_name_list, lyrx_layer, gdb_path, visible=True):
@@ -22,11 +48,38 @@ def addLyrxByConnectionProperties(map, lyr_name_list, lyrx_layer, gdb_path, visi
             lyr.visible = visible
 
 
+class HeadlessMap:
+    ''' Stand-in for the Engineering map in headless runs: it holds no layers and ignores changes.'''
+
+    def listLayers(self, wildcard=None):
+        return []
+
+    def listTables(self, wildcard=None):
+        return []
+
+    def addDataFromPath(self, data_path, *args, **kwargs):
+        return None
+
+    def addLayer(self, layer, *args, **kwargs):
+        return []
+
+    def moveLayer(self, *args, **kwargs):
+        pass
+
+    def removeLayer(self, layer):
+        pass
+
+    def removeTable(self, table):
+        pass
+
+
 def AddMsgAndPrint(msg, severity=0, log_file_path=None):
     ''' Log messages to text file and ESRI tool messages dialog.'''
     if log_file_path:
-        with open(log_file_path, 'a+') as f:
-            f.write(f"{msg}\n")
+        log = projectLog(log_file_path)
+        log.write(f"{msg}\n")
+        if severity == 2:
+            log.flush()
     if severity == 0:
         AddMessage(msg)
     elif severity == 1:
@@ -44,6 +97,14 @@ def deleteScratchLayers(scratchLayers):
             continue
 
 
+def engineeringProject():
+    ''' Return the CURRENT ArcGIS Pro project and its Engineering map, or (None, HeadlessMap()) in headless runs.'''
+    if isHeadless():
+        return None, HeadlessMap()
+    aprx = ArcGISProject('CURRENT')
+    return aprx, aprx.listMaps('Engineering')[0]
+
+
 def errorMsg(tool_name):
     ''' Return exception details for logging, ignore sys.exit exceptions.'''
     exc_type, exc_value, exc_traceback = exc_info()
@@ -97,6 +158,60 @@ def getPortalTokenInfo(portalURL):
         return False
 
 
+def readTableRows(table_path, fields):
+    ''' Read the given fields of a table into a list of row tuples.'''
+    with SearchCursor(table_path, fields) as cursor:
+        return [tuple(row) for row in cursor]
+
+
+def supportTables(support_gdb):
+    ''' Return the compiled table cache of a Support.gdb, created once per session.'''
+    if support_gdb not in _support_caches:
+        _support_caches[support_gdb] = SupportCache(support_gdb, readTableRows)
+    return _support_caches[support_gdb]
+
+
+def isHeadless():
+    ''' True when tools are run without ArcGIS Pro and should skip map operations.'''
+    return environ.get(HEADLESS_VARIABLE) == '1'
+
+
+def projectLog(log_file_path):
+    ''' Return the buffered log of a project log file, opened once per tool run. Tools close it with
+    closeProjectLogs when they finish, which stageTimer runs do from finish().'''
+    if log_file_path not in _project_logs:
+        _project_logs[log_file_path] = ProjectLog(log_file_path, flush_seconds=LOG_FLUSH_SECONDS, background=True)
+    return _project_logs[log_file_path]
+
+
+@register
+def closeProjectLogs():
+    ''' Flush and close every open project log.'''
+    for log in _project_logs.values():
+        log.close()
+    _project_logs.clear()
+
+
+def rasterSize(raster):
+    ''' Return the (rows, columns) of a raster, or None if it does not exist yet.'''
+    try:
+        if isinstance(raster, str) and not Exists(raster):
+            return None
+        desc = Describe(raster)
+        return desc.height, desc.width
+    except:
+        return None
+
+
+def stageTimer(tool_name, project_workspace, raster=None):
+    ''' Return a StageTimer for a tool run that sets the progressor label of each stage, appends the run to the
+    project's perf log and closes the project logs on finish(). Stages report the size of raster unless given
+    their own.'''
+    perf_log_path = path.join(project_workspace, f"{path.basename(project_workspace)}_perf.jsonl")
+    trace_memory = PERF_TRACE_MEMORY or environ.get(TRACE_MEMORY_VARIABLE) == '1'
+    return StageTimer(tool_name, perf_log_path, SetProgressorLabel, rasterSize, raster, trace_memory, closeProjectLogs)
+
+
 def removeMapLayers(map, map_layers):
     ''' Remove layers from the active map for a given list of layer names.'''
     for lyr in map.listLayers():
@@ -108,16 +223,6 @@ def removeMapLayers(map, map_layers):
             continue
 
 
-def emptyScratchGDB(gdb_path):
-    ''' Delete everything in a given geodatabase.'''
-    gdb_contents = []
-    for dirpath, dirnames, filenames in Walk(gdb_path):
-        for filename in filenames:
-            gdb_contents.append(path.join(dirpath, filename))
-    for fc in gdb_contents:
-        Delete(fc)
-
-
 def deleteESRIAddedFields(feature_path):
     ''' Delete fields added by ESRI to digitized Feature Set (tool parameter type)'''
     try:
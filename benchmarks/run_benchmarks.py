@@ -0,0 +1,198 @@
+''' Benchmark the NumPy engines in SUPPORT on synthetic DEMs.
+
+Each stage runs on every surface and size requested and reports wall seconds and DEM cells per second, best of
+--repeat runs with memory tracing off, and the peak memory traced by tracemalloc in one further run that is not
+timed. Results are compared with a stored baseline of cells per second, and --save-baseline records the current
+results as the new baseline.
+
+    python benchmarks/run_benchmarks.py --sizes 256 1024 --stages null_gap_fill contours
+'''
+import os
+import sys
+from argparse import ArgumentParser
+from json import dump, load
+
+from numpy import abs as np_abs, arange, indices, linspace, nan, nanmax, nanmedian, nanmin, pad, repeat, \
+    tile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), 'SUPPORT'))
+
+from contour_engine import contourTile
+from dem_processing import fillNullGaps, focalMean3x3, labelRegions
+from earthwork import cutFillBlock
+from point_sampler import samplePoints
+from rcn_engine import zonalMeanRCN
+from runoff_engine import stormRunoff
+from stage_timer import StageTimer
+from surfaces import SURFACES, punchHoles
+
+SIZES = (256, 512, 1024, 2048, 4096, 8192)
+DEFAULT_SIZES = (256, 1024, 2048)
+DEFAULT_BASELINE = os.path.join(HERE, 'baseline.json')
+
+# Cells on a side of the square zones used for zonal statistics
+ZONE_CELLS = 128
+# Transects sampled for profile sampling, each with one point per column
+TRANSECTS = 64
+# Contour levels across the DEM range
+CONTOUR_LEVELS = 20
+
+
+def _nullGapFill(dem):
+    return (punchHoles(dem), 50), fillNullGaps
+
+
+def _regionLabeling(dem):
+    return (dem < nanmedian(dem),), labelRegions
+
+
+def _zonalStats(dem):
+    rows, cols = indices(dem.shape)
+    zones = (rows // ZONE_CELLS) * (dem.shape[1] // ZONE_CELLS + 1) + cols // ZONE_CELLS
+    return (zones, dem), zonalMeanRCN
+
+
+def _profileSampling(dem):
+    size = dem.shape[0]
+    x = tile(linspace(0.5, size - 0.5, size), TRANSECTS)
+    y = repeat(linspace(0.5, size - 0.5, TRANSECTS), size)
+    return (dem, x, y, 0.0, float(size), 1.0, 1.0, 'BILINEAR'), samplePoints
+
+
+def _contours(dem):
+    return (dem, max((float(nanmax(dem)) - float(nanmin(dem))) / CONTOUR_LEVELS, 0.1)), contourTile
+
+
+def _focalMean(dem):
+    # One NoData halo row above and below, as at the edges of a raster
+    return (pad(dem, ((1, 1), (0, 0)), constant_values=nan),), focalMean3x3
+
+
+def _cutFill(dem):
+    size = dem.shape[1]
+    distance = np_abs(arange(size) - size / 2.0)[None, :].repeat(dem.shape[0], 0)
+    return (dem, distance, float(nanmedian(dem)), 20.0, 3.0), cutFillBlock
+
+
+def _runoff(dem):
+    low, high = float(nanmin(dem)), float(nanmax(dem))
+    cn = 60.0 + 35.0 * (dem - low) / max(high - low, 1e-6)
+    return (cn, [1.0, 2.0, 5.0]), stormRunoff
+
+
+# Stage name: function of a DEM returning (arguments, function to time)
+STAGES = {
+    'null_gap_fill': _nullGapFill,
+    'region_labeling': _regionLabeling,
+    'zonal_stats': _zonalStats,
+    'profile_sampling': _profileSampling,
+    'contours': _contours,
+    'focal_mean': _focalMean,
+    'cut_fill': _cutFill,
+    'runoff': _runoff,
+}
+
+
+def _runStage(surface, size, stage, function, arguments, perf_log_path, trace_memory=False):
+    timer = StageTimer(f"benchmark {surface} {size}", perf_log_path, trace_memory=trace_memory)
+    with timer.stage(stage):
+        function(*arguments)
+    return timer.finish()['stages'][0]
+
+
+def benchmarkStage(surface, size, stage, dem, repeats, perf_log_path, trace_memory=True):
+    ''' Time one stage on a DEM, best of repeats, then with trace_memory run it once more under tracemalloc for its
+    peak traced memory, which tracing would distort the times of. Returns the fastest stage record with cells, cells
+    per second and peak_traced_mb.'''
+    arguments, function = STAGES[stage](dem)
+    best = None
+    for run in range(repeats):
+        record = _runStage(surface, size, stage, function, arguments, perf_log_path)
+        if best is None or record['wall_s'] < best['wall_s']:
+            best = record
+    if trace_memory:
+        best['peak_traced_mb'] = _runStage(surface, size, stage, function, arguments, perf_log_path,
+                                           True)['peak_traced_mb']
+    best['cells'] = dem.size
+    best['cells_per_sec'] = round(dem.size / max(best['wall_s'], 1e-9))
+    return best
+
+
+def loadBaseline(baseline_path):
+    ''' {surface/size/stage: cells per second} from a baseline file, or {} when there is none.'''
+    if not os.path.exists(baseline_path):
+        return {}
+    with open(baseline_path) as f:
+        return load(f)
+
+
+def runBenchmarks(sizes, surfaces, stages, repeats=3, baseline=None, tolerance=0.8, perf_log_path=os.devnull,
+                  trace_memory=True):
+    ''' Run every stage on every surface and size. Returns (results, regressions) where results maps
+    surface/size/stage to its record and regressions lists the keys slower than tolerance times the baseline.'''
+    baseline = baseline or {}
+    results = {}
+    regressions = []
+    print(f"{'surface':<20}{'size':>6}  {'stage':<18}{'wall s':>9}{'cells/s':>14}{'peak MB':>10}  vs base")
+    for surface in surfaces:
+        for size in sizes:
+            dem = SURFACES[surface](size)
+            for stage in stages:
+                key = f"{surface}/{size}/{stage}"
+                record = results[key] = benchmarkStage(surface, size, stage, dem, repeats, perf_log_path,
+                                                               trace_memory)
+                ratio = ''
+                if key in baseline:
+                    record['ratio'] = round(record['cells_per_sec'] / baseline[key], 3)
+                    ratio = f"{record['ratio']:.2f}"
+                    if record['ratio'] < tolerance:
+                        regressions.append(key)
+                        ratio += ' REGRESSION'
+                peak = record['peak_traced_mb']
+                print(f"{surface:<20}{size:>6}  {stage:<18}{record['wall_s']:>9.4f}{record['cells_per_sec']:>14,}"
+                      f"{peak if peak is not None else '':>10}  {ratio}")
+            del dem
+    return results, regressions
+
+
+def main(argv=None):
+    parser = ArgumentParser(description='Benchmark the NumPy engines on synthetic DEMs.')
+    parser.add_argument('--sizes', nargs='+', type=int, default=DEFAULT_SIZES, choices=SIZES, metavar='SIZE',
+                        help=f"DEM sizes in cells on a side, from {', '.join(map(str, SIZES))}")
+    parser.add_argument('--surfaces', nargs='+', default=list(SURFACES), choices=list(SURFACES))
+    parser.add_argument('--stages', nargs='+', default=list(STAGES), choices=list(STAGES))
+    parser.add_argument('--repeat', type=int, default=3, help='runs of each stage; the fastest is reported')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='baseline file of cells per second')
+    parser.add_argument('--save-baseline', action='store_true', help='write these results to the baseline file')
+    parser.add_argument('--tolerance', type=float, default=0.8,
+                        help='fraction of baseline cells per second below which a stage is a regression')
+    parser.add_argument('--fail-on-regression', action='store_true', help='exit with status 1 on any regression')
+    parser.add_argument('--output', help='JSON lines file to append each run to, timed and traced')
+    parser.add_argument('--no-memory', action='store_true', help='skip the traced run that measures peak memory')
+    args = parser.parse_args(argv)
+
+    baseline = {} if args.save_baseline else loadBaseline(args.baseline)
+    results, regressions = runBenchmarks(args.sizes, args.surfaces, args.stages, max(args.repeat, 1), baseline,
+                                         args.tolerance, args.output or os.devnull, not args.no_memory)
+
+    if args.save_baseline:
+        saved = loadBaseline(args.baseline)
+        saved.update({key: record['cells_per_sec'] for key, record in results.items()})
+        with open(args.baseline, 'w') as f:
+            dump(saved, f, indent=2, sort_keys=True)
+        print(f"\nSaved {len(results)} results to {args.baseline}")
+    elif not baseline:
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to record one")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) below {args.tolerance:.0%} of baseline:")
+        for key in regressions:
+            print(f"\t{key}")
+        if args.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+from numpy import arange, float32, floor, hypot, indices, maximum, nan, ogrid, zeros
+from numpy.random import default_rng
+
+
+def tiltedPlane(size, slope_x=0.02, slope_y=0.01, base=900.0):
+    ''' Plane rising to the east and north by slope (rise over run) per cell.'''
+    rows, cols = ogrid[:size, :size]
+    return (base + cols * slope_x + (size - 1 - rows) * slope_y).astype(float32)
+
+
+def cone(size, height=None, base=900.0):
+    ''' Cone peaking at the center of the grid.'''
+    height = height or 0.1 * size
+    rows, cols = ogrid[:size, :size]
+    center = (size - 1) / 2.0
+    return (base + height * maximum(1.0 - hypot(rows - center, cols - center) / center, 0)).astype(float32)
+
+
+def nestedDepressions(size, levels=4, seed=0, base=900.0):
+    ''' Bowl holding depressions within depressions: each level adds pits a quarter the width of the last.'''
+    rng = default_rng(seed)
+    rows, cols = ogrid[:size, :size]
+    center = (size - 1) / 2.0
+    surface = base + 0.05 * size * (hypot(rows - center, cols - center) / center) ** 2
+    radius = size / 4.0
+    for level in range(levels):
+        count = 4 ** level
+        depth = 0.02 * size / (level + 1)
+        for row, col in rng.uniform(radius, size - radius, (count, 2)):
+            # Only the window around each pit changes
+            r0, r1 = int(row - radius), int(row + radius) + 1
+            c0, c1 = int(col - radius), int(col + radius) + 1
+            distance = hypot(rows[r0:r1] - row, cols[:, c0:c1] - col) / radius
+            surface[r0:r1, c0:c1] -= depth * maximum(1.0 - distance ** 2, 0)
+        radius /= 4.0
+        if radius < 2:
+            break
+    return surface.astype(float32)
+
+
+def _valueNoise(size, cells, rng):
+    ''' Random values on a cells x cells lattice bilinearly interpolated to size x size.'''
+    lattice = rng.random((cells + 1, cells + 1))
+    position = arange(size) * (cells / float(size))
+    first = floor(position).astype(int)
+    weight = (position - first)[:, None]
+    rows = lattice[first] * (1 - weight) + lattice[first + 1] * weight
+    weight = weight.T
+    return rows[:, first] * (1 - weight) + rows[:, first + 1] * weight
+
+
+def fractalNoise(size, octaves=8, persistence=0.5, seed=0, base=900.0):
+    ''' Sum of value noise octaves, each twice the frequency and persistence times the amplitude of the last.'''
+    rng = default_rng(seed)
+    surface = zeros((size, size))
+    amplitude = 0.05 * size
+    for octave in range(octaves):
+        cells = 2 ** (octave + 1)
+        if cells > size:
+            break
+        surface += amplitude * _valueNoise(size, cells, rng)
+        amplitude *= persistence
+    return (base + surface).astype(float32)
+
+
+def terraces(size, step=None, embankment=None, slope=0.05, base=900.0):
+    ''' Hillside cut into level terraces of step feet, each closed by an embankment ridge along its lower edge.'''
+    step = step or max(size * slope / 8.0, 1.0)
+    embankment = embankment or step / 4.0
+    rows = indices((size, size))[0]
+    hillside = base + (size - 1 - rows) * slope
+    level = floor((hillside - base) / step)
+    # Embankments occupy the two rows at the downhill edge of each terrace
+    ridge = (hillside - base - level * step) / slope < 2
+    return (base + level * step + ridge * embankment).astype(float32)
+
+
+def punchHoles(surface, fraction=0.01, hole_size=16, seed=0):
+    ''' Copy of a surface with square NoData holes covering about fraction of its cells.'''
+    rng = default_rng(seed)
+    holed = surface.copy()
+    size = surface.shape[0]
+    hole_size = min(hole_size, size // 8)
+    count = max(int(fraction * surface.size / hole_size ** 2), 1)
+    for row, col in rng.integers(1, size - hole_size - 1, (count, 2)):
+        holed[row:row + hole_size, col:col + hole_size] = nan
+    return holed
+
+
+SURFACES = {
+    'tilted_plane': tiltedPlane,
+    'cone': cone,
+    'nested_depressions': nestedDepressions,
+    'fractal_noise': fractalNoise,
+    'terraces': terraces,
+}